@@ -0,0 +1,253 @@
+"""Benchmarks `process_url`, the learn -> compress -> score -> save ->
+filter -> post path of every scraped url, against a fake LLM, an in-memory
+MongoDB and a local webhook sink"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import llm_browser.main as pipeline
+from llm_browser.src import database, utils
+from llm_browser.src.llm import compress
+from llm_browser.src.llm.fake import FakeChatModel
+from llm_browser.src.memory_mongo import MemoryMongoClient
+from llm_browser.src.tracing import percentile, tracer
+from llm_browser.src.utils import post_response, set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+# the span recording each stage
+STAGES = {
+    "compress": "compress",
+    "score": "llm.score",
+    "save": "mongo.write",
+    "filter": "llm.filter",
+    "post": "discord.post",
+}
+
+
+@contextmanager
+def webhook_sink():
+    """Runs a local HTTP server that accepts and counts webhook posts
+
+    Returns
+    ---
+    A tuple of the webhook url and a list that receives the posted payloads
+    """
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            received.append(self.rfile.read(length))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        yield f"http://{host}:{port}/webhook", received
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_results(n_results: int, n_roles: int) -> list[dict]:
+    """Creates synthetic scraping results shaped like the output of
+    `run_sync`/`run_async`"""
+    description = (
+        "We are looking for a data engineer to build and maintain batch "
+        "and streaming pipelines using Python, SQL, Spark and Airflow. "
+    ) * 20
+
+    return [
+        {
+            "roles": [
+                {
+                    "title": f"Data Engineer {r}",
+                    "company": f"Company {i}-{r}",
+                    "location": "Remote",
+                    "description": description,
+                }
+                for r in range(n_roles)
+            ],
+            "url": f"https://example.com/jobs?page={i}",
+            "title": f"benchmark search {i}",
+            "run_id": f"bench-{i:05d}",
+            "created_at": time.strftime("%Y-%m-%d %H%M%S"),
+        }
+        for i in range(n_results)
+    ]
+
+
+def summarise(spans: list[dict], elapsed: float, n: int) -> dict:
+    """Summarises the latencies of each stage. Throughput is the number of
+    operations completed per second of wall time."""
+    timings, errors = defaultdict(list), defaultdict(int)
+    for span in spans:
+        for stage, name in STAGES.items():
+            if span["name"] != name:
+                continue
+            if span["status"] == "error":
+                errors[stage] += 1
+            else:
+                timings[stage].append(span["duration"])
+
+    stages = {}
+    for stage in STAGES:
+        values = timings[stage]
+        stages[stage] = {
+            "ops": len(values),
+            "errors": errors[stage],
+            "ops_per_sec": len(values) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+
+    return {
+        "results": n,
+        "elapsed_sec": elapsed,
+        "results_per_sec": n / elapsed if elapsed else 0.0,
+        "stages": stages,
+    }
+
+
+def run_benchmark(
+    model: FakeChatModel,
+    n_results: int = 20,
+    n_roles: int = 10,
+    concurrency: int = 1,
+) -> dict:
+    """Benchmarks the processing of synthetic results by `process_url`. The
+    pause between results that keeps real providers under their rate limit
+    is skipped, the `rpm` of the fake model paces the requests instead.
+
+    Args
+    ---
+    - model: the fake model used for scoring and filtering
+    - n_results: number of scraping results to process
+    - n_roles: number of roles in each result
+    - concurrency: number of results processed in parallel
+
+    Returns
+    ---
+    A report with the throughput and latency percentiles of each stage
+    """
+    client = MemoryMongoClient()
+    prompts = {
+        "resume": "Data engineer with 5 years of Python, SQL and Airflow.",
+        "resume_prompt": "Score each role out of 10 against the resume.",
+        "filter_prompt": "Keep only the roles that scored 7 or more.",
+    }
+    results = make_results(n_results, n_roles)
+    spans = []
+    lock = threading.Lock()
+
+    def post_to_sink(content: str, webhook: str, title: str) -> None:
+        post_response(content=content, webhook=sink, title=title)
+
+    def process(result: dict) -> None:
+        try:
+            pipeline.process_url(
+                url_content=(result["url"], result["title"], "benchmark"),
+                results=[result],
+                run_id=result["run_id"],
+                content=prompts,
+            )
+        except Exception as e:
+            logger.debug(f"{result['url']} failed: {e}")
+        finally:
+            # the spans of the run are kept rather than exported
+            with lock:
+                spans.extend(tracer.spans(result["run_id"]))
+            tracer.clear(result["run_id"])
+
+    with (
+        webhook_sink() as (sink, received),
+        patch.object(database, "get_mongodb_client", return_value=client),
+        patch.object(compress, "get_mongodb_client", return_value=client),
+        patch.object(utils, "post_response", post_to_sink),
+        patch.object(pipeline, "text_llm", model),
+        patch.object(pipeline, "vision_model", "benchmark"),
+        patch.dict(pipeline.models, benchmark=model),
+        patch.object(pipeline, "save_metrics", lambda run_id: None),
+        patch.object(pipeline, "sleep", lambda seconds: None),
+    ):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(process, results))
+        elapsed = time.perf_counter() - start
+
+    report = summarise(spans, elapsed, n_results)
+    report["webhook_posts"] = len(received)
+    return report
+
+
+def print_report(report: dict) -> None:
+    """Prints a benchmark report as a table"""
+    print(
+        f"{report['results']} results in {report['elapsed_sec']:.2f}s "
+        f"({report['results_per_sec']:.2f} results/s, "
+        f"{report['webhook_posts']} webhook posts)"
+    )
+    header = f"{'stage':<8}{'ops':>6}{'errors':>8}{'ops/s':>10}"
+    header += f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    for stage, s in report["stages"].items():
+        print(
+            f"{stage:<8}{s['ops']:>6}{s['errors']:>8}{s['ops_per_sec']:>10.2f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmarks the processing pipeline")
+    parser.add_argument("--results", type=int, default=20)
+    parser.add_argument("--roles", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--completion-tokens", type=int, default=256)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="path to save the report", type=str)
+    args = parser.parse_args()
+
+    fake_model = FakeChatModel(
+        latency=args.latency,
+        jitter=args.jitter,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rpm=args.rpm,
+        seed=args.seed,
+    )
+
+    report = run_benchmark(
+        model=fake_model,
+        n_results=args.results,
+        n_roles=args.roles,
+        concurrency=args.concurrency,
+    )
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -1,27 +1,77 @@
 """Uses an LLM model to autonomously browse the Internet"""
 
 import asyncio
-import json
 import logging
 import os
+import socket
+from collections import Counter, deque
 from datetime import datetime
+from pathlib import Path
 from time import sleep
 from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from playwright.async_api import BrowserContext, async_playwright
-from playwright.sync_api import BrowserContext as SBrowserContext
-from playwright.sync_api import sync_playwright
 
 from llm_browser.src.browser.core import browse_content
-from llm_browser.src.browser.scrapers import fetch_google, fetch_linkedin
-from llm_browser.src.configs.config import RateLimit, browser_args
+from llm_browser.src.browser.display import (
+    close_browser,
+    launch_browser,
+    resource_report,
+)
+from llm_browser.src.browser.engine import loop_runner
+from llm_browser.src.browser.har import (
+    RECORD,
+    REPLAY,
+    context_options,
+    har_dir,
+    route_har,
+)
+from llm_browser.src.browser.lifecycle import ManagedContext, track_memory
+from llm_browser.src.browser.politeness import (
+    BlockedError,
+    max_block_attempts,
+    politeness,
+)
+from llm_browser.src.browser.pool import run_sharded, scrape_workers
+from llm_browser.src.browser.replay import (
+    load_steps,
+    record_steps,
+    replay,
+    replay_browse,
+    replay_stats,
+)
+from llm_browser.src.browser.scrapers import (
+    iter_google,
+    iter_linkedin_async,
+    save_login_state_async,
+)
+from llm_browser.src.browser.timeouts import timeouts
+from llm_browser.src.checkpoint import Checkpoint
+from llm_browser.src.configs.config import (
+    RateLimit,
+    linkedin_state,
+)
 from llm_browser.src.database import get_mongodb_client, save_to_db
+from llm_browser.src.llm.compress import (
+    compress_roles,
+    compress_roles_enabled,
+    learn_roles,
+)
 from llm_browser.src.llm.models import models
-from llm_browser.src.llm.query import filter_query, query_llm
-from llm_browser.src.tasks import TaskType
+from llm_browser.src.llm.query import filter_query, parse_roles, query_llm
+from llm_browser.src.llm.router import build_router
+from llm_browser.src.profiles import (
+    get_profiles,
+    relevance_matrix,
+    select_pairs,
+)
+from llm_browser.src.scheduler import Scheduler, fetch_fingerprints
+from llm_browser.src.tasks import Stage, TaskType
+from llm_browser.src.tracing import tracer
 from llm_browser.src.utils import set_logging
+from llm_browser.src.work_queue import Heartbeat, LeaseLost, WorkQueue
 
 load_dotenv(override=True)
 
@@ -33,8 +83,40 @@ text_model = os.environ.get("TEXT_MODEL")
 vision_model = os.environ.get("VISION_MODEL")
 db_name = os.environ.get("_MONGO_DB")
 context_name = os.environ.get("CONTEXT_NAME")
+metrics_format = os.environ.get("METRICS_FORMAT", "json")
 rate_limit = RateLimit()
 
+# routes text requests across providers when LLM_ROUTES is set
+text_llm = build_router(models) or models.get(text_model)
+
+
+def get_prompts() -> dict:
+    """Retrieves the prompts and the resume from the database
+
+    Returns
+    ---
+    - A dictionary with the resume and the prompts
+    """
+
+    client = get_mongodb_client()
+
+    with client:
+        db = client[db_name]
+        prompts = db["prompts"]
+        resumes = db["resumes"]
+
+        resume = resumes.find_one({"type": "data engineer"})["resume"]
+        resume_prompt = prompts.find_one({"type": "compare_roles"})["prompt"]
+        filter_prompt = prompts.find_one({"type": "filter_roles"})["prompt"]
+        main_prompt = prompts.find_one({"type": "browse"})["prompt"]
+
+    return {
+        "resume": resume,
+        "resume_prompt": resume_prompt,
+        "filter_prompt": filter_prompt,
+        "main_prompt": main_prompt,
+    }
+
 
 def get_information() -> dict:
     """Retrieves information from the database including urls, prompts, tasks,
@@ -49,19 +131,12 @@ def get_information() -> dict:
 
     with client:
         db = client[db_name]
-        prompts = db["prompts"]
         context = db[context_name]
-        resumes = db["resumes"]
 
         counts_ = context.estimated_document_count()
         logger.info(f"retrieved {counts_} tasks")
         docs = context.find()
 
-        resume = resumes.find_one({"type": "data engineer"})["resume"]
-        resume_prompt = prompts.find_one({"type": "compare_roles"})["prompt"]
-        filter_prompt = prompts.find_one({"type": "filter_roles"})["prompt"]
-        main_prompt = prompts.find_one({"type": "browse"})["prompt"]
-
         sync_urls: list[tuple] = []
         async_urls: list[tuple] = []
 
@@ -77,25 +152,23 @@ def get_information() -> dict:
     return {
         "sync_urls": sync_urls,
         "async_urls": async_urls,
-        "resume": resume,
-        "resume_prompt": resume_prompt,
-        "filter_prompt": filter_prompt,
-        "main_prompt": main_prompt,
+        **get_prompts(),
     }
 
 
-def run_sync(
+async def run_linkedin(
     url_content: tuple,
-    browser_context: SBrowserContext,
+    browser_context: BrowserContext,
     roles_limit: int = None,
+    run_id: str = None,
 ) -> list[dict]:
-    """Given a url, runs the synchronous instance of the browser on the
-    urls.
+    """Given a LinkedIn url, scrapes its roles when logged in.
 
     Args
     ---
-    - content: a list of urls to access synchronously as well as their titles and task names.
-    - browser_context: a synchronous instance of the Playwright browser
+    - url_content: the url, title and task name
+    - browser_context: an asynchronous instance of the Playwright browser
+    - run_id: identifies the run, generated if not provided
 
     Returns
     ---
@@ -104,31 +177,59 @@ def run_sync(
 
     result = []
     url, title, _ = url_content
-    run_id = uuid4().hex
+    run_id = run_id or uuid4().hex
     created_at = datetime.now(tz=ZoneInfo(tz)).strftime("%Y-%m-%d %H%M%S")
     if url.startswith("https://www.linkedin"):
+        # roles are collected as they are yielded so that a failure keeps
+        # the roles scraped before it
+        roles, partial = [], False
         try:
-            roles = fetch_linkedin(url, browser_context, limit=roles_limit)
+            with tracer.span("scrape", url=url), track_memory(browser_context):
+                async for role in iter_linkedin_async(
+                    url, browser_context, limit=roles_limit
+                ):
+                    roles.append(role)
+        except Exception as e:
+            if isinstance(e, BlockedError) and not roles:
+                # nothing to keep, the task is requeued
+                raise
+            logger.exception(f"error with {url}: {e}")
+            partial = True
+        if roles:
             result.append(
                 {
                     "roles": roles,
                     "title": title,
+                    "url": url,
                     "run_id": run_id,
                     "created_at": created_at,
+                    "partial": partial,
                 }
             )
             logger.info(f"retrieved {len(roles)} roles from {url}")
-        except Exception as e:
-            logger.exception(f"error with {url}: {e}")
 
     return result
 
 
+def run_sync(
+    url_content: tuple,
+    browser_context: BrowserContext,
+    roles_limit: int = None,
+    run_id: str = None,
+) -> list[dict]:
+    """Synchronous version of `run_linkedin` used by the pool workers, whose
+    browser contexts belong to the scraping loop"""
+    return loop_runner.run(
+        run_linkedin(url_content, browser_context, roles_limit, run_id)
+    )
+
+
 async def run_async(
     url_content: tuple,
     browser_context: BrowserContext,
     main_prompt: str,
     roles_limit: int = None,
+    run_id: str = None,
 ) -> list[dict]:
     """Given a list of urls, runs an ansynchronous instance of the browser on the
     urls.
@@ -138,6 +239,7 @@ async def run_async(
     - content: a list of urls to browse asynchronously as well as their titles
     and task names.
     - browser_context: an asynchronous instance of a Playwright browser.
+    - run_id: identifies the run, generated if not provided
 
     Returns
     ---
@@ -146,7 +248,7 @@ async def run_async(
 
     result = []
     url, title, task = url_content
-    run_id = uuid4().hex
+    run_id = run_id or uuid4().hex
     created_at = datetime.now(tz=ZoneInfo(tz)).strftime("%Y-%m-%d %H%M%S")
 
     try:
@@ -157,19 +259,41 @@ async def run_async(
     if task_type == TaskType.BROWSE:
         browsing_prompt = main_prompt + "\n\nURL to navigate: " + url
 
-        agent_history = await browse_content(
-            prompt=browsing_prompt,
-            model=models.get(vision_model),
-        )
+        # replay the actions of a previous agent run before running the
+        # agent. The steps are read and written outside of the loop.
+        steps = None
+        if replay_browse:
+            steps = await asyncio.to_thread(load_steps, url)
+        roles = None
+        if steps is not None:
+            roles = await replay(
+                url,
+                steps,
+                context=browser_context,
+                prompt=browsing_prompt,
+                model=text_llm,
+            )
 
-        final_result = agent_history.final_result()
-        alternate_result = agent_history.action_results()[-2].model_dump_json()
+        if roles is None:
+            with tracer.span("scrape", url=url):
+                agent_history = await browse_content(
+                    prompt=browsing_prompt,
+                    model=models.get(vision_model),
+                    url=url,
+                )
+
+            # a malformed result is repaired rather than browsed again. The
+            # repair is a blocking LLM call, it runs outside of the loop.
+            roles = await asyncio.to_thread(
+                parse_roles, agent_history.final_result(), model=text_llm
+            )
+            await asyncio.to_thread(record_steps, url, agent_history)
 
-        roles = json.loads(final_result)
         result.append(
             {
                 "roles": roles,
                 "title": title,
+                "url": url,
                 "run_id": run_id,
                 "created_at": created_at,
             }
@@ -177,82 +301,345 @@ async def run_async(
 
     if task_type == TaskType.SCRAPE:
         if url.startswith("https://www.google"):
+            roles, partial = [], False
             try:
-                roles = await fetch_google(
-                    url, context=browser_context, limit=roles_limit
-                )
+                with (
+                    tracer.span("scrape", url=url),
+                    track_memory(browser_context),
+                ):
+                    async for role in iter_google(
+                        url, context=browser_context, limit=roles_limit
+                    ):
+                        roles.append(role)
+            except Exception as e:
+                if isinstance(e, BlockedError) and not roles:
+                    raise
+                logger.exception(f"error with {url}: {e}")
+                partial = True
+            if roles:
                 result.append(
                     {
                         "roles": roles,
                         "title": title,
+                        "url": url,
                         "run_id": run_id,
                         "created_at": created_at,
+                        "partial": partial,
                     }
                 )
                 logger.info(f"retrieved {len(roles)} roles from {url}")
-            except Exception as e:
-                logger.exception(f"error with {url}: {e}")
 
     return result
 
 
-def process_results(results: list[dict], prompts: dict) -> None:
+def scrape_url(
+    url_content: tuple,
+    main_prompt: str,
+    roles_limit: int = None,
+    run_id: str = None,
+    har_mode: str = None,
+    har_dir: Path = har_dir,
+) -> list[dict]:
+    """Launches a browser on the scraping loop and scrapes a url
+
+    Args
+    ---
+    - url_content: the url, title and task name
+    - main_prompt: the prompt used by the browsing agent
+    - roles_limit: maximum number of roles to scrape
+    - run_id: identifies the run
+    - har_mode: `record` to save the traffic of the url to a HAR archive,
+    `replay` to serve it from the archive without any network access
+    - har_dir: the directory of the HAR archives
+
+    Returns
+    ---
+    - Data scraped from the url
+    """
+    url = url_content[0]
+    linkedin = url.startswith("https://www.linkedin")
+    har_options = context_options(url, har_mode, har_dir)
+    if linkedin and linkedin_state.exists():
+        har_options["storage_state"] = linkedin_state
+
+    async def run() -> list[dict]:
+        async with async_playwright() as p:
+            with tracer.span("browser.launch"):
+                browser = await launch_browser(p, url)
+
+                async def setup(context: BrowserContext) -> None:
+                    await route_har(context, url, har_mode, har_dir)
+
+                context = await ManagedContext(
+                    browser, setup=setup, **har_options
+                ).start()
+            try:
+                if not linkedin:
+                    return await run_async(
+                        main_prompt=main_prompt,
+                        browser_context=context,
+                        url_content=url_content,
+                        roles_limit=roles_limit,
+                        run_id=run_id,
+                    )
+                results = await run_linkedin(
+                    url_content=url_content,
+                    browser_context=context,
+                    roles_limit=roles_limit,
+                    run_id=run_id,
+                )
+                if har_mode != REPLAY:
+                    await save_login_state_async(context)
+                return results
+            finally:
+                # the HAR archive is written when its context closes
+                await context.close()
+                await close_browser(browser)
+
+    return loop_runner.run(run())
+
+
+def process_results(
+    results: list[dict],
+    prompts: dict,
+    checkpoint: Checkpoint = None,
+    heartbeat: Heartbeat = None,
+) -> None:
     """Interacts with an LLM models to process the provided results.
 
     Args
     ---
     - results: the content to be analysed by the LLM
-    - prompts: the prompt to guide the LLM
+    - prompts: the prompt to guide the LLM. When it holds `profiles`, the
+    roles are scored against each profile's resume instead of `resume`.
+    - checkpoint: records completed stages and skips those already completed
+    - heartbeat: the lease of the queue task, saving and posting stop with
+    `LeaseLost` once it is lost
 
     Returns
     ---
     LLM response in markdown format is posted to a channel or save to the db
     """
-    resume = prompts["resume"]
     filter_prompt = prompts["filter_prompt"]
     resume_prompt = prompts["resume_prompt"]
+    profiles = prompts.get("profiles")
 
     delay = (1 / rate_limit.gemini_2_0) + rate_limit.min_delay
 
-    for result in results:
-        roles = result["roles"]
-        response = query_llm(
-            data={**{"roles": roles}, **{"resume": resume}},
-            prompt=resume_prompt,
-            model=models.get(text_model),
-        )
+    def done(key: str, stage: Stage) -> bool:
+        return checkpoint is not None and checkpoint.done(key, stage)
+
+    def mark(key: str, stage: Stage, **data) -> None:
+        if checkpoint is not None:
+            checkpoint.mark(key, stage, **data)
+
+    def check_lease() -> None:
+        if heartbeat is not None:
+            heartbeat.check()
+
+    def score(
+        key: str,
+        result: dict,
+        roles: list[dict],
+        resume: str,
+        profile: dict = None,
+    ) -> None:
+        """Scores roles against a resume, saves and posts the response"""
+        progress = checkpoint.get(key) if checkpoint else {}
+        title = result["title"]
+        if profile is not None:
+            title = f"{title} - {profile['type']}"
+
+        if done(key, Stage.SCORED):
+            response = progress["response"]
+        else:
+            response = query_llm(
+                data={**{"roles": roles}, **{"resume": resume}},
+                prompt=resume_prompt,
+                model=text_llm,
+            )
+            mark(key, Stage.SCORED, response=response)
 
-        logger.info("saving results to database...")
-        save_to_db(
-            fp=None,
-            key=None,
-            collection="results",
-            data={
+        check_lease()
+        if not done(key, Stage.SAVED):
+            logger.info("saving results to database...")
+            data = {
                 "run_id": result["run_id"],
                 "created_at": result["created_at"],
                 "models": {
                     "vision_model": models.get(vision_model).model,
-                    "text_model": models.get(text_model).model,
+                    "text_model": text_llm.model,
                 },
                 "title": result["title"],
                 "result": response,
-            },
-        )
+            }
+            if profile is not None:
+                data["profile"] = profile["type"]
+            save_to_db(fp=None, key=None, collection="results", data=data)
+            mark(key, Stage.SAVED)
 
+        check_lease()
         logger.info("posting to channel...")
         filter_query(
             data=response,
             prompt=filter_prompt,
-            model=models.get(text_model),
-            title=result["title"],
+            model=text_llm,
+            title=title,
+            webhook=profile["webhook"] if profile else None,
         )
+        mark(key, Stage.POSTED)
 
         sleep(delay)
 
+    for result in results:
+        url = result.get("url")
+
+        if done(url, Stage.POSTED):
+            logger.info(f"skipping {url}, already processed")
+            continue
+
+        roles = compressed = result["roles"]
+        if compress_roles_enabled:
+            # learnt from and compressed once per scrape, then shared by
+            # every profile
+            learn_roles(roles)
+            compressed = compress_roles(roles)
+        if profiles is None:
+            score(url, result, compressed, prompts["resume"])
+            continue
+
+        # only send the roles most similar to each resume to the llm
+        matrix = relevance_matrix(roles, [p["resume"] for p in profiles])
+        selected = select_pairs(matrix)
+        for profile, indices in zip(profiles, selected):
+            key = f"{url}#{profile['type']}"
+            if done(key, Stage.POSTED):
+                continue
+            if not indices:
+                logger.info(f"no roles of {url} match {profile['type']}")
+                continue
+            logger.info(
+                f"{len(indices)} of {len(roles)} roles of {url} match "
+                f"{profile['type']}"
+            )
+            score(
+                key,
+                result,
+                [compressed[i] for i in indices],
+                profile["resume"],
+                profile,
+            )
+        mark(url, Stage.POSTED)
+
 
-def main(urls_limit: int | None = None, roles_limit: int = None) -> None:
+def save_metrics(run_id: str) -> None:
+    """Exports the metrics of a run and stores their summary in the database
+    next to the results of the run
+
+    Args
+    ---
+    - run_id: the run whose spans to summarise
+    """
+    try:
+        tracer.export(run_id, fmt=metrics_format)
+        save_to_db(
+            fp=None,
+            key=None,
+            collection="run_metrics",
+            data=tracer.summary(run_id),
+        )
+    except Exception as e:
+        logger.exception(f"error saving metrics for {run_id=}: {e}")
+    finally:
+        tracer.clear(run_id)
+
+
+def is_partial(results: list[dict]) -> bool:
+    """Whether a scrape failed halfway, leaving its results incomplete"""
+    return any(result.get("partial") for result in results)
+
+
+def retry_delay(url: str, attempts: int) -> int:
+    """Seconds before a url is retried: a linear backoff, or longer while
+    its domain cools down"""
+    cooldown = politeness.for_url(url).cooldown()
+    return int(max(cooldown, 60 * attempts))
+
+
+def process_url(
+    url_content: tuple,
+    results: list[dict],
+    run_id: str,
+    content: dict,
+    checkpoint: Checkpoint = None,
+    heartbeat: Heartbeat = None,
+) -> None:
+    """Checkpoints the scraping results of a url, processes them with the LLM
+    and saves the metrics of the run. Partial results are scored but not
+    checkpointed, so that a resumed run scrapes the url again.
+
+    Args
+    ---
+    - url_content: the url, title and task that was scraped
+    - results: the scraping results of the url
+    - run_id: the run the results belong to
+    - content: the prompts and resume returned by `get_information`
+    - checkpoint: the progress of the current run, if checkpointed
+    - heartbeat: the lease of the queue task the url belongs to, if any
+    """
+    url = url_content[0]
+    if is_partial(results):
+        logger.warning(f"{url} was scraped partially, it is not checkpointed")
+        checkpoint = None
+    with tracer.run(run_id):
+        if (
+            results
+            and checkpoint is not None
+            and not checkpoint.done(url, Stage.SCRAPED)
+        ):
+            checkpoint.mark(url, Stage.SCRAPED, results=results)
+
+        process_results(
+            results=results,
+            prompts=content,
+            checkpoint=checkpoint,
+            heartbeat=heartbeat,
+        )
+    save_metrics(run_id)
+
+
+def main(
+    urls_limit: int | None = None,
+    roles_limit: int = None,
+    resume: str = None,
+    workers: int = scrape_workers,
+    har_mode: str = None,
+    har_dir: Path = har_dir,
+    profiles: list[str] = None,
+) -> None:
+    """Scrapes the urls, scores their roles and posts the results
+
+    Args
+    ---
+    - urls_limit: maximum number of sync and async urls to process
+    - roles_limit: maximum number of roles to scrape per url
+    - resume: run_id of an interrupted run to resume
+    - workers: number of processes scraping the sync urls
+    - har_mode: `record` or `replay` the traffic of each url, see
+    `scrape_url`
+    - har_dir: the directory of the HAR archives
+    - profiles: the resume types to score the roles against, every resume
+    if empty. Only the default resume is used if None.
+    """
     # retrieve the necessary information
     content = get_information()
+    if profiles is not None:
+        content["profiles"] = get_profiles(profiles or None)
+
+    checkpoint = Checkpoint(
+        run_id=resume or uuid4().hex, resume=resume is not None
+    )
+    logger.info(f"checkpointing under run_id={checkpoint.run_id}")
 
     # retrieve the urls to browse
     if urls_limit is not None:
@@ -263,43 +650,343 @@ def main(urls_limit: int | None = None, roles_limit: int = None) -> None:
         sync_urls = content["sync_urls"]
         async_urls = content["async_urls"]
 
+    def pending(urls: list[tuple]) -> list[dict]:
+        """Processes urls scraped by an interrupted run and returns the jobs
+        of those still to be scraped"""
+        jobs = []
+        for url in urls:
+            if checkpoint.done(url[0], Stage.POSTED):
+                logger.info(f"skipping {url[0]}, already processed")
+                continue
+
+            results = checkpoint.results(url[0])
+            if results is not None:
+                run_id = results[0]["run_id"]
+                process_url(url, results, run_id, content, checkpoint)
+                continue
+
+            jobs.append(
+                {
+                    "url_content": url,
+                    "roles_limit": roles_limit,
+                    "run_id": uuid4().hex,
+                }
+            )
+        return jobs
+
     # run sync browser
-    for url in sync_urls:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False, args=browser_args)
-            context = browser.new_context()
-            results_sync = run_sync(
-                url_content=url,
-                browser_context=context,
-                roles_limit=roles_limit,
+    sync_jobs = pending(sync_urls)
+
+    if har_mode is not None and workers > 1:
+        # the workers share one context across urls, HARs are kept per url
+        logger.info(f"{har_mode}ing HAR archives, sharding is disabled")
+        workers = 1
+
+    if workers > 1 and len(sync_jobs) > 1:
+        # partially scraped urls are retried, the last attempt is scored
+        for job, results_sync, spans in run_sharded(
+            run_sync, sync_jobs, workers=workers, retry=is_partial
+        ):
+            tracer.extend(job["run_id"], spans)
+
+            # process sync results with llm as they arrive
+            process_url(
+                job["url_content"],
+                results_sync,
+                job["run_id"],
+                content,
+                checkpoint,
             )
+        sync_jobs = []
+
+    # run sync jobs not sharded, then async browser. Blocked and partially
+    # scraped urls are retried after the others, once their domain cooled
+    # down. The last attempt scores what it found.
+    jobs = deque(sync_jobs + pending(async_urls))
+    attempts = Counter()
+    while jobs:
+        job = jobs.popleft()
+        url = job["url_content"][0]
+        try:
+            with tracer.run(job["run_id"]):
+                results = scrape_url(
+                    main_prompt=content["main_prompt"],
+                    har_mode=har_mode,
+                    har_dir=har_dir,
+                    **job,
+                )
+        except BlockedError as e:
+            attempts[url] += 1
+            if attempts[url] < max_block_attempts:
+                logger.warning(f"{e}, requeueing")
+                jobs.append(job)
+            else:
+                logger.error(f"{e}, giving up until the run is resumed")
+            continue
+
+        if is_partial(results):
+            attempts[url] += 1
+            if attempts[url] < max_block_attempts:
+                logger.warning(f"{url} was scraped partially, requeueing")
+                jobs.append(job)
+                continue
+
+        # process results with llm
+        process_url(
+            job["url_content"], results, job["run_id"], content, checkpoint
+        )
 
-        # process sync results with llm
-        process_results(results=results_sync, prompts=content)
+    logger.info(f"browser resources by mode: {resource_report()}")
+    logger.info(f"politeness by domain: {politeness.report()}")
+    if replay_browse and async_urls:
+        logger.info(f"replays of agent runs: {replay_stats()}")
+    timeouts.save()
+    checkpoint.close()
+    logger.info("~~~ TASK COMPLETED!!! ~~~")
 
-    # run async browser
-    async def run(url_content: tuple) -> list[dict]:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=False, args=browser_args
-            )
-            context = await browser.new_context()
-            results = await run_async(
-                main_prompt=content["main_prompt"],
-                browser_context=context,
-                url_content=url_content,
-                roles_limit=roles_limit,
+
+def enqueue_tasks() -> str:
+    """Adds every task of the context collection to the work queue
+
+    Returns
+    ---
+    - The batch_id that the workers checkpoint the tasks under
+    """
+    content = get_information()
+    batch_id = uuid4().hex
+    with WorkQueue() as queue:
+        queue.enqueue(content["sync_urls"] + content["async_urls"], batch_id)
+    return batch_id
+
+
+def run_worker(
+    roles_limit: int = None,
+    poll_interval: int = 30,
+    exit_when_empty: bool = False,
+) -> None:
+    """Claims tasks from the work queue and runs them until stopped. Any
+    number of workers can run on any number of hosts.
+
+    Args
+    ---
+    - roles_limit: maximum number of roles to scrape per url
+    - poll_interval: seconds to wait when no task is available
+    - exit_when_empty: whether to stop once no task is left, including
+    tasks waiting out a backoff and tasks leased by other workers
+    """
+    content = get_prompts()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"starting worker {worker_id}")
+
+    with WorkQueue() as queue:
+        while True:
+            task = queue.claim(worker_id)
+            if task is None:
+                if exit_when_empty and not queue.unfinished():
+                    break
+                sleep(poll_interval)
+                continue
+
+            url_content = (task["url"], task["title"], task["task"])
+            logger.info(f"claimed {task['url']} (attempt {task['attempts']})")
+
+            # reuse the stages completed by previous attempts
+            checkpoint = Checkpoint(
+                run_id=task["batch_id"], resume=True, urls=[task["url"]]
             )
-        return results
 
-    for url in async_urls:
-        results_async = asyncio.run(run(url_content=url))
+            with checkpoint, Heartbeat(queue, task) as heartbeat:
+                try:
+                    results = checkpoint.results(task["url"])
+                    run_id = results[0]["run_id"] if results else uuid4().hex
+                    if results is None:
+                        with tracer.run(run_id):
+                            results = scrape_url(
+                                url_content=url_content,
+                                main_prompt=content["main_prompt"],
+                                roles_limit=roles_limit,
+                                run_id=run_id,
+                            )
+                    if not results:
+                        raise RuntimeError("no results were scraped")
+                    if (
+                        is_partial(results)
+                        and task["attempts"] < queue.max_attempts
+                    ):
+                        # retried in full, the last attempt scores what it
+                        # found
+                        logger.warning(
+                            f"{task['url']} was scraped partially, requeueing"
+                        )
+                        queue.fail(
+                            task,
+                            error="partial scrape",
+                            delay=retry_delay(task["url"], task["attempts"]),
+                        )
+                        continue
+                    process_url(
+                        url_content,
+                        results,
+                        run_id,
+                        content,
+                        checkpoint,
+                        heartbeat,
+                    )
+                    heartbeat.check()
+                    queue.complete(task)
+                except LeaseLost as e:
+                    # the task is another worker's now
+                    logger.warning(f"{e}, stopping")
+                except BlockedError as e:
+                    # retried once the domain cooled down, by any worker
+                    logger.warning(f"{e}, requeueing {task['url']}")
+                    queue.fail(
+                        task,
+                        error=str(e),
+                        delay=retry_delay(task["url"], task["attempts"]),
+                    )
+                except Exception as e:
+                    logger.exception(f"error with {task['url']}: {e}")
+                    queue.fail(task, error=str(e), delay=60 * task["attempts"])
+                finally:
+                    timeouts.save()
+
+    logger.info(f"worker {worker_id} stopped")
+
+
+def run_daemon(roles_limit: int = None) -> None:
+    """Runs every task on its own interval until stopped. Before scraping, the
+    listing of a due task is fingerprinted and the task is skipped if the
+    listing did not change since it last ran.
 
-        # process async results with llm
-        process_results(results=results_async, prompts=content)
+    Args
+    ---
+    - roles_limit: maximum number of roles to scrape per url
+    """
+    content = get_prompts()
+    scheduler = Scheduler()
+
+    while True:
+        scheduler.refresh()
+        due = scheduler.due()
+        fingerprints = (
+            fetch_fingerprints([t["url"] for t in due]) if due else {}
+        )
 
-    logger.info("~~~ TASK COMPLETED!!! ~~~")
+        for task in due:
+            url = task["url"]
+            fingerprint = fingerprints.get(url)
+            if (
+                fingerprint is not None
+                and fingerprint == scheduler.fingerprint(url)
+            ):
+                logger.info(f"skipping {url}, listing unchanged")
+                scheduler.record(url, fingerprint, changed=False)
+                continue
+
+            url_content = (url, task["title"], task["task"])
+            run_id = uuid4().hex
+            try:
+                with tracer.run(run_id):
+                    results = scrape_url(
+                        url_content=url_content,
+                        main_prompt=content["main_prompt"],
+                        roles_limit=roles_limit,
+                        run_id=run_id,
+                    )
+                process_url(url_content, results, run_id, content)
+                # a partial scrape runs again even if the listing is unchanged
+                if is_partial(results):
+                    fingerprint = None
+                scheduler.record(url, fingerprint, changed=bool(results))
+            except Exception as e:
+                logger.exception(f"error with {url}: {e}")
+                scheduler.record(url, None, changed=False)
+
+        timeouts.save()
+        wait = scheduler.seconds_until_next()
+        logger.info(f"next task due in {wait / 60:.1f} minutes")
+        sleep(wait)
 
 
 if __name__ == "__main__":
-    main()
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Uses an LLM to browse the Internet")
+    parser.add_argument("--urls-limit", help="urls to process", type=int)
+    parser.add_argument("--roles-limit", help="roles per url", type=int)
+    parser.add_argument(
+        "--resume", help="run_id of an interrupted run to resume", type=str
+    )
+    parser.add_argument(
+        "--workers",
+        help="processes scraping LinkedIn urls",
+        type=int,
+        default=scrape_workers,
+    )
+    parser.add_argument(
+        "--profiles",
+        help="score against these resume types, or every resume if none given",
+        metavar="TYPE",
+        nargs="*",
+    )
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument(
+        "--record-har",
+        help="record the traffic of each url to a HAR archive in DIR",
+        metavar="DIR",
+        nargs="?",
+        const=str(har_dir),
+    )
+    har.add_argument(
+        "--replay-har",
+        help="replay the traffic of each url from the HAR archives in DIR",
+        metavar="DIR",
+        nargs="?",
+        const=str(har_dir),
+    )
+    parser.add_argument(
+        "--enqueue",
+        help="add the tasks to the work queue and exit",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--worker",
+        help="process tasks from the work queue",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--daemon",
+        help="run each task on its own interval until stopped",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--exit-when-empty",
+        help="stop the worker once the queue is empty",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    if args.enqueue:
+        enqueue_tasks()
+    elif args.daemon:
+        run_daemon(roles_limit=args.roles_limit)
+    elif args.worker:
+        run_worker(
+            roles_limit=args.roles_limit,
+            exit_when_empty=args.exit_when_empty,
+        )
+    else:
+        main(
+            urls_limit=args.urls_limit,
+            roles_limit=args.roles_limit,
+            resume=args.resume,
+            workers=args.workers,
+            har_mode=(
+                RECORD
+                if args.record_har
+                else REPLAY if args.replay_har else None
+            ),
+            har_dir=Path(args.record_har or args.replay_har or har_dir),
+            profiles=args.profiles,
+        )
@@ -1,13 +1,37 @@
 """Playwright setup, basic browser context/page creation, Agent class from browser_use"""
 
+import asyncio
+import functools
 import logging
 import os
 
 from browser_use import Agent, Browser, BrowserConfig
 from dotenv import load_dotenv
+from playwright.async_api import Browser as PlaywrightBrowser
+from playwright.async_api import Playwright
 from playwright.sync_api import sync_playwright
 
+from llm_browser.src.browser.display import (
+    HEADLESS,
+    STEALTH_ARGS,
+    XVFB,
+    browser_cdp_mode,
+    browser_cdp_url,
+    browser_mode,
+    resolve_mode,
+    virtual_display,
+)
+from llm_browser.src.browser.payload import (
+    ReducedBrowserContext,
+    ReducedMessageManager,
+)
+from llm_browser.src.browser.perf import (
+    capture_perf,
+    finish_capture,
+    start_capture,
+)
 from llm_browser.src.configs.config import browser_args
+from llm_browser.src.tracing import tracer
 from llm_browser.src.utils import set_logging
 
 load_dotenv()
@@ -15,31 +39,119 @@ load_dotenv()
 set_logging()
 logger = logging.getLogger(__name__)
 
-headless = bool(int(os.environ.get("HEADLESS"), 0))
-browser = Browser(config=BrowserConfig(headless=headless))
+
+class AgentBrowser(Browser):
+    """The browser_use browser of the agent, launched in a display mode. In
+    the `xvfb` mode the virtual display is passed through the environment of
+    the launch, as `launch_options` does, rather than set in `os.environ`
+    where it would change the mode of every later launch.
+
+    Args
+    ---
+    - mode: the resolved mode of the browser
+    - cdp_url: the endpoint of a pre-warmed browser to attach to instead
+    """
+
+    def __init__(self, mode: str, cdp_url: str = None):
+        self.mode = mode
+        super().__init__(
+            config=BrowserConfig(
+                headless=mode == HEADLESS,
+                extra_chromium_args=STEALTH_ARGS if mode == HEADLESS else [],
+                cdp_url=cdp_url,
+            )
+        )
+
+    async def _setup_standard_browser(
+        self, playwright: Playwright
+    ) -> PlaywrightBrowser:
+        if self.mode != XVFB:
+            return await super()._setup_standard_browser(playwright)
+
+        # waits for the server outside of the loop
+        display = await asyncio.to_thread(virtual_display.start)
+        chromium = playwright.chromium
+        chromium.launch = functools.partial(
+            chromium.launch, env={**os.environ, "DISPLAY": display}
+        )
+        try:
+            return await super()._setup_standard_browser(playwright)
+        finally:
+            del chromium.launch
+
+
+# the agent's browser is launched by browser_use, on the virtual display when
+# it runs headed, unless the pre-warmed browser runs in its mode
+agent_mode = resolve_mode(os.environ.get("AGENT_BROWSER_MODE") or browser_mode)
+agent_cdp_url = (
+    browser_cdp_url if agent_mode == resolve_mode(browser_cdp_mode) else None
+)
+browser = AgentBrowser(agent_mode, agent_cdp_url)
 max_input_tokens = int(os.environ.get("MAX_INPUT_TOKENS", 120000))
 
 
 async def browse_content(
-    prompt, model, browser=browser, max_input_tokens=max_input_tokens
+    prompt,
+    model,
+    browser=browser,
+    max_input_tokens=max_input_tokens,
+    url: str = None,
+    capture_perf: bool = capture_perf,
 ):
-    """Browse content using the agent"""
+    """Browse content using the agent
+
+    Args
+    ---
+    - prompt: the task given to the agent
+    - model: the LangChain vision model driving the agent
+    - url: the url being browsed, used to key performance data
+    - capture_perf: whether to record the performance of the agent's page
+    """
+    context = ReducedBrowserContext(browser=browser)
     agent = Agent(
         task=prompt,
         llm=model,
         browser=browser,
+        browser_context=context,
         max_input_tokens=max_input_tokens,
     )
+    # the agent builds its own message manager, only its class is swapped
+    agent.message_manager.__class__ = ReducedMessageManager
+
+    try:
+        counters = None
+        if capture_perf:
+            page = await context.get_current_page()
+            counters = await start_capture(page)
+
+        logger.info(f"Using agent: {agent.model_name}")
+        with tracer.span("agent.run", model=agent.model_name):
+            result = await agent.run()
+            tracer.set_attributes(
+                steps=len(result.history),
+                input_tokens=result.total_input_tokens(),
+                **context.stats,
+            )
+
+        if counters is not None:
+            page = await context.get_current_page()
+            await finish_capture(page, url or page.url, counters)
+    finally:
+        await context.close()
 
-    logger.info(f"Using agent: {agent.model_name}")
-    result = await agent.run()
     return result
 
 
-def setup_browser_instance(headless: bool = False):
-    """Create a browser instance"""
+def setup_browser_instance(
+    headless: bool = False, cdp_url: str = browser_cdp_url
+):
+    """Create a browser instance, attached to the pre-warmed browser when
+    `cdp_url` is set"""
 
     p = sync_playwright().start()
-    browser = p.chromium.launch(headless=headless, args=browser_args)
+    if cdp_url:
+        browser = p.chromium.connect_over_cdp(cdp_url)
+    else:
+        browser = p.chromium.launch(headless=headless, args=browser_args)
 
     return browser, p
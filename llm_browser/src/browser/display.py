@@ -0,0 +1,536 @@
+"""Chooses how browsers are displayed: stealth headless, headed on a managed
+Xvfb virtual display, or headed on the desktop. A per-domain policy picks the
+mode of each url, and the CPU and memory used by the browsers of each mode
+are recorded."""
+
+import asyncio
+import atexit
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+from urllib.parse import urlparse
+
+import psutil
+from playwright.async_api import Browser, BrowserContext, Error, Playwright
+
+from llm_browser.src.configs.config import browser_args
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+HEADLESS = "headless"
+XVFB = "xvfb"
+HEADED = "headed"
+MODES = (HEADLESS, XVFB, HEADED)
+
+
+def _default_mode() -> str:
+    mode = os.environ.get("BROWSER_MODE")
+    if mode is None and os.environ.get("HEADLESS") is not None:
+        # the older HEADLESS flag
+        mode = HEADLESS if int(os.environ["HEADLESS"]) else HEADED
+    return mode or HEADLESS
+
+
+browser_mode = _default_mode()
+# e.g. linkedin.com=xvfb,google.com=headless
+browser_mode_policy = os.environ.get("BROWSER_MODE_POLICY", "")
+xvfb_screen = os.environ.get("XVFB_SCREEN", "1920x1080x24")
+sample_interval = float(os.environ.get("RESOURCE_SAMPLE_INTERVAL", 1.0))
+# a pre-warmed browser served by `python -m llm_browser.src.browser.server`
+browser_cdp_url = os.environ.get("BROWSER_CDP_URL")
+browser_cdp_mode = os.environ.get("BROWSER_CDP_MODE") or browser_mode
+
+STEALTH_ARGS = ["--headless=new", "--window-size=1920,1080"]
+
+# keeps the properties that differ between headless and headed Chrome
+# consistent with the user agent, locale and screen of the context
+STEALTH_INIT_SCRIPT = """
+Object.defineProperty(Navigator.prototype, 'webdriver', {get: () => undefined});
+Object.defineProperty(Navigator.prototype, 'languages', {get: () => ['en-US', 'en']});
+Object.defineProperty(Navigator.prototype, 'platform', {get: () => 'Linux x86_64'});
+if (navigator.plugins.length === 0) {
+  const plugins = ['PDF Viewer', 'Chrome PDF Viewer', 'Chromium PDF Viewer']
+    .map(name => ({name, filename: 'internal-pdf-viewer', description: 'Portable Document Format'}));
+  Object.defineProperty(Navigator.prototype, 'plugins', {get: () => plugins});
+}
+window.chrome = window.chrome || {runtime: {}, app: {isInstalled: false}};
+const query = navigator.permissions && navigator.permissions.query;
+if (query) {
+  navigator.permissions.query = params => params && params.name === 'notifications'
+    ? Promise.resolve({state: Notification.permission, onchange: null})
+    : query.call(navigator.permissions, params);
+}
+const getParameter = WebGLRenderingContext.prototype.getParameter;
+WebGLRenderingContext.prototype.getParameter = function (p) {
+  if (p === 37445) return 'Google Inc. (Intel)';
+  if (p === 37446) return 'ANGLE (Intel, Mesa Intel(R) UHD Graphics 620, OpenGL 4.6)';
+  return getParameter.call(this, p);
+};
+"""
+
+
+def parse_policy(policy: str) -> dict[str, str]:
+    """Parses a `domain=mode` comma separated policy"""
+    rules = {}
+    for rule in policy.split(","):
+        if not rule.strip():
+            continue
+        domain, _, mode = rule.partition("=")
+        mode = mode.strip().lower()
+        if mode not in MODES:
+            raise ValueError(f"unknown browser mode {mode!r} in {rule!r}")
+        rules[domain.strip().lower()] = mode
+    return rules
+
+
+def mode_for(
+    url: str = None,
+    policy: str = browser_mode_policy,
+    default: str = browser_mode,
+) -> str:
+    """Returns the mode of a url from the most specific matching domain of
+    the policy, or the default mode"""
+    rules = parse_policy(policy)
+    host = (urlparse(url).hostname or "") if url else ""
+    matches = [
+        domain
+        for domain in rules
+        if host == domain or host.endswith("." + domain)
+    ]
+    if not matches:
+        return default
+    return rules[max(matches, key=len)]
+
+
+class VirtualDisplay:
+    """An Xvfb server shared by the headed browsers of the process. It is
+    started on first use and stopped at exit.
+
+    Args
+    ---
+    - screen: the `WIDTHxHEIGHTxDEPTH` of the screen
+    """
+
+    def __init__(self, screen: str = xvfb_screen):
+        self.screen = screen
+        self.process: subprocess.Popen = None
+        self.display: str = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("Xvfb") is not None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid if self.process is not None else None
+
+    def start(self) -> str:
+        """Starts the server unless it is running
+
+        Returns
+        ---
+        The value of `DISPLAY` for the browsers
+        """
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                return self.display
+
+            # Xvfb picks a free display and writes its number once ready
+            read_fd, write_fd = os.pipe()
+            self.process = subprocess.Popen(
+                [
+                    "Xvfb",
+                    "-displayfd",
+                    str(write_fd),
+                    "-screen",
+                    "0",
+                    self.screen,
+                    "-nolisten",
+                    "tcp",
+                ],
+                pass_fds=(write_fd,),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            os.close(write_fd)
+            with os.fdopen(read_fd) as f:
+                number = f.readline().strip()
+            if not number:
+                self.process = None
+                raise RuntimeError("Xvfb failed to start")
+
+            self.display = f":{number}"
+            atexit.register(self.stop)
+            logger.info(f"started Xvfb on display {self.display}")
+            return self.display
+
+    def stop(self) -> None:
+        with self._lock:
+            if self.process is None:
+                return
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+            logger.info(f"stopped Xvfb on display {self.display}")
+
+
+virtual_display = VirtualDisplay()
+
+
+def resolve_mode(mode: str) -> str:
+    """Falls back to a mode the host supports. Headed browsers without a
+    desktop run on the virtual display, and without Xvfb on stealth
+    headless."""
+    if mode not in MODES:
+        raise ValueError(f"unknown browser mode {mode!r}, expected {MODES}")
+
+    desktop = bool(os.environ.get("DISPLAY")) or sys.platform != "linux"
+    if mode == HEADED and not desktop:
+        mode = XVFB
+    if mode == XVFB and not virtual_display.available():
+        fallback = HEADED if desktop else HEADLESS
+        logger.warning(f"Xvfb is not installed, using {fallback} mode")
+        mode = fallback
+    return mode
+
+
+def launch_options(mode: str, args: list[str] = browser_args) -> dict:
+    """Returns the `chromium.launch` options of a resolved mode"""
+    if mode == HEADLESS:
+        # the new headless mode runs the full browser rather than the
+        # headless shell, which sites detect from its missing features
+        return {
+            "headless": True,
+            "channel": "chromium",
+            "args": [
+                a
+                for a in args
+                if not a.startswith("--window-size")
+                and a != "--enable-automation"
+            ]
+            + STEALTH_ARGS,
+            "ignore_default_args": ["--enable-automation"],
+        }
+    if mode == XVFB:
+        display = virtual_display.start()
+        return {
+            "headless": False,
+            "args": args,
+            "env": {**os.environ, "DISPLAY": display},
+        }
+    return {"headless": False, "args": args}
+
+
+def user_agent(version: str) -> str:
+    """The user agent of headed Chrome on Linux, which headless Chrome
+    reports as `HeadlessChrome`"""
+    return (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like "
+        f"Gecko) Chrome/{version} Safari/537.36"
+    )
+
+
+def stealth_context_options(version: str) -> dict:
+    """Returns `new_context` options consistent with the stealth script"""
+    return {
+        "user_agent": user_agent(version),
+        "locale": "en-US",
+        "extra_http_headers": {"Accept-Language": "en-US,en;q=0.9"},
+        "viewport": {"width": 1280, "height": 720},
+        "screen": {"width": 1920, "height": 1080},
+    }
+
+
+class ProcessUsage:
+    """Samples the CPU time and memory of a browser's process tree
+
+    Args
+    ---
+    - pids: the processes started by the launch
+    """
+
+    def __init__(self, pids: set[int]):
+        self.roots = []
+        for pid in pids:
+            try:
+                self.roots.append(psutil.Process(pid))
+            except psutil.Error:
+                continue
+        self.cpu: dict[int, float] = {}
+        # cpu seconds spent before the session, for browsers attached to
+        self.baseline = 0.0
+        self.peak_rss = 0
+        self.started = time.monotonic()
+
+    def processes(self) -> set[psutil.Process]:
+        """The live processes of the tree"""
+        processes = set(self.roots)
+        for root in self.roots:
+            try:
+                processes.update(root.children(recursive=True))
+            except psutil.Error:
+                continue
+        return processes
+
+    def sample(self) -> None:
+        rss = 0
+        for process in self.processes():
+            try:
+                with process.oneshot():
+                    times = process.cpu_times()
+                    rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+            # processes that exit keep their last cpu time
+            self.cpu[process.pid] = times.user + times.system
+        self.peak_rss = max(self.peak_rss, rss)
+
+    async def poll(self, interval: float = sample_interval) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(interval)
+
+    def summary(self) -> dict:
+        return {
+            "cpu_sec": round(sum(self.cpu.values()) - self.baseline, 3),
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+            "wall_sec": round(time.monotonic() - self.started, 3),
+        }
+
+
+def _child_pids() -> set[int]:
+    return {p.pid for p in psutil.Process().children(recursive=True)}
+
+
+def listening_pid(cdp_url: str) -> Optional[int]:
+    """The pid of the local process listening on the port of a CDP endpoint,
+    None for remote endpoints or when it cannot be found"""
+    parsed = urlparse(cdp_url)
+    if parsed.hostname not in ("127.0.0.1", "localhost", "::1"):
+        return None
+    try:
+        connections = psutil.net_connections(kind="tcp")
+    except (psutil.Error, OSError):
+        return None
+    for conn in connections:
+        if (
+            conn.status == psutil.CONN_LISTEN
+            and conn.laddr.port == parsed.port
+            and conn.pid is not None
+        ):
+            return conn.pid
+    return None
+
+
+# the open browsers with their mode, usage and sampler
+_sessions: dict[Browser, dict] = {}
+_usage: dict[str, dict] = defaultdict(
+    lambda: {"sessions": 0, "cpu_sec": 0.0, "wall_sec": 0.0, "peak_rss_mb": 0}
+)
+_usage_lock = threading.Lock()
+
+
+async def connect_browser(
+    p: Playwright, url: str, mode: str, cdp_url: str
+) -> Browser:
+    """Attaches to the pre-warmed browser at `cdp_url`
+
+    Returns
+    ---
+    The browser, or None when it is unavailable
+    """
+    try:
+        browser = await p.chromium.connect_over_cdp(cdp_url)
+    except Error as e:
+        logger.warning(f"no browser at {cdp_url}, launching one: {e}")
+        return None
+
+    # the browser's processes are sampled like those of a launched browser
+    # when it runs on this host
+    pid = listening_pid(cdp_url)
+    usage = ProcessUsage({pid} if pid is not None else set())
+    usage.sample()
+    usage.baseline = sum(usage.cpu.values())
+    _sessions[browser] = {
+        "mode": mode,
+        "connected": True,
+        "url": url,
+        "usage": usage,
+        "run_id": tracer.run_id,
+        "start": time.time(),
+        "sampler": asyncio.create_task(usage.poll()) if pid else None,
+    }
+    if pid is None:
+        logger.warning(
+            f"no local process serves {cdp_url}, its memory is not sampled "
+            "and contexts are not recycled on renderer memory"
+        )
+    logger.info(f"connected to the {mode} browser at {cdp_url}")
+    return browser
+
+
+async def launch_browser(
+    p: Playwright,
+    url: str = None,
+    mode: str = None,
+    args: list[str] = browser_args,
+    cdp_url: str = browser_cdp_url,
+) -> Browser:
+    """Launches Chromium in the mode of a url and starts recording its
+    resource usage. Browsers are closed with `close_browser`.
+
+    Args
+    ---
+    - p: the Playwright instance
+    - url: the url the browser is for, used to look up the policy
+    - mode: `headless`, `xvfb` or `headed`, overrides the policy
+    - args: the command line arguments of the browser
+    - cdp_url: the endpoint of a pre-warmed browser, used instead of
+    launching one when the url's mode is `BROWSER_CDP_MODE`
+    """
+    mode = resolve_mode(mode or mode_for(url))
+    if cdp_url and mode == resolve_mode(browser_cdp_mode):
+        browser = await connect_browser(p, url, mode, cdp_url)
+        if browser is not None:
+            return browser
+
+    if mode == XVFB:
+        # waits for the server outside of the loop
+        await asyncio.to_thread(virtual_display.start)
+
+    before = _child_pids()
+    browser = await p.chromium.launch(**launch_options(mode, args))
+    usage = ProcessUsage(_child_pids() - before)
+    _sessions[browser] = {
+        "mode": mode,
+        "connected": False,
+        "url": url,
+        "usage": usage,
+        "run_id": tracer.run_id,
+        "start": time.time(),
+        "sampler": asyncio.create_task(usage.poll()),
+    }
+    logger.info(f"launched browser in {mode} mode")
+    return browser
+
+
+def browser_processes(browser: Browser) -> set[psutil.Process]:
+    """The processes of a browser launched by `launch_browser`"""
+    session = _sessions.get(browser)
+    return session["usage"].processes() if session else set()
+
+
+def browser_mode_of(browser: Browser) -> str:
+    session = _sessions.get(browser)
+    return session["mode"] if session else None
+
+
+async def new_context(browser: Browser, **kwargs) -> BrowserContext:
+    """Creates a context. Contexts of stealth headless browsers present a
+    consistent headed fingerprint; `kwargs` take precedence."""
+    if browser_mode_of(browser) != HEADLESS:
+        return await browser.new_context(**kwargs)
+
+    context = await browser.new_context(
+        **{**stealth_context_options(browser.version), **kwargs}
+    )
+    await context.add_init_script(STEALTH_INIT_SCRIPT)
+    return context
+
+
+async def close_browser(browser: Browser) -> dict:
+    """Closes a browser and records its resource usage in a
+    `browser.<mode>` span. Pre-warmed browsers are disconnected from, which
+    closes the contexts created by the run, and recorded as `browser.cdp`.
+
+    Returns
+    ---
+    The CPU seconds, peak memory and lifetime of the browser
+    """
+    session = _sessions.pop(browser, None)
+    if session is None:
+        await browser.close()
+        return {}
+
+    if session["sampler"] is not None:
+        session["sampler"].cancel()
+    session["usage"].sample()
+    await browser.close()
+    summary = session["usage"].summary()
+
+    mode = "cdp" if session["connected"] else session["mode"]
+    with _usage_lock:
+        totals = _usage[mode]
+        totals["sessions"] += 1
+        totals["cpu_sec"] += summary["cpu_sec"]
+        totals["wall_sec"] += summary["wall_sec"]
+        totals["peak_rss_mb"] = max(
+            totals["peak_rss_mb"], summary["peak_rss_mb"]
+        )
+
+    if session["run_id"] is not None:
+        record = {
+            "name": f"browser.{mode}",
+            "start": session["start"],
+            "duration": summary["wall_sec"],
+            "status": "ok",
+            "attributes": {"url": session["url"], "mode": mode, **summary},
+        }
+        tracer.extend(session["run_id"], [record])
+    logger.info(f"{mode} browser used {summary}")
+    return summary
+
+
+def resource_report() -> dict:
+    """Summarises the resources used by the browsers of each mode in this
+    process, including the shared Xvfb server"""
+    with _usage_lock:
+        report = {mode: dict(usage) for mode, usage in _usage.items()}
+
+    if virtual_display.pid is not None:
+        usage = ProcessUsage({virtual_display.pid})
+        usage.sample()
+        report["xvfb_server"] = {
+            "cpu_sec": round(sum(usage.cpu.values()), 3),
+            "rss_mb": round(usage.peak_rss / 2**20, 1),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    from argparse import ArgumentParser
+
+    from playwright.async_api import async_playwright
+
+    parser = ArgumentParser(description="Compares the browser modes on a url")
+    parser.add_argument("--url", help="the page to load", type=str)
+    parser.add_argument(
+        "--modes", help="modes to compare", nargs="+", default=list(MODES)
+    )
+    args = parser.parse_args()
+
+    async def compare() -> None:
+        async with async_playwright() as p:
+            for mode in args.modes:
+                browser = await launch_browser(p, args.url, mode=mode)
+                context = await new_context(browser)
+                page = await context.new_page()
+                await page.goto(args.url, wait_until="networkidle")
+                await close_browser(browser)
+
+    asyncio.run(compare())
+    print(json.dumps(resource_report(), indent=2))
@@ -0,0 +1,192 @@
+"""Runs the async scrapers from synchronous code. One event loop runs in a
+background thread and the sync entry points submit coroutines to it, so that
+sync and async callers share a single scraping engine."""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+from playwright.async_api import BrowserContext, async_playwright
+
+from llm_browser.src.browser.display import (
+    close_browser,
+    launch_browser,
+    new_context,
+)
+from llm_browser.src.configs.config import browser_args
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def _in_context(ctx: contextvars.Context, coro: Awaitable[T]) -> T:
+    # runs the coroutine with the caller's context so that the tracer's run
+    # and spans carry over to the loop thread
+    return await asyncio.get_running_loop().create_task(coro, context=ctx)
+
+
+async def _next(iterator: AsyncIterator):
+    try:
+        return await anext(iterator)
+    except StopAsyncIteration:
+        return _DONE
+
+
+async def _aclose(iterator: AsyncIterator) -> None:
+    # a step cancelled by a timeout or an interrupt is still unwinding in the
+    # generator, which cannot be closed until it finishes
+    while getattr(iterator, "ag_running", False):
+        await asyncio.sleep(0.01)
+    await iterator.aclose()
+
+
+class LoopRunner:
+    """An event loop running in a daemon thread. Coroutines submitted from
+    any number of threads run concurrently on it.
+
+    Args
+    ---
+    - name: the name of the loop's thread
+    """
+
+    def __init__(self, name: str = "scraping-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The loop, started on first use"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name=self.name, daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Awaitable[T], timeout: float = None) -> T:
+        """Runs a coroutine on the loop and waits for its result
+
+        Args
+        ---
+        - coro: the coroutine
+        - timeout: seconds after which the coroutine is cancelled and a
+        `TimeoutError` is raised
+
+        Returns
+        ---
+        The result of the coroutine
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("await the coroutine on the scraping loop")
+
+        ctx = contextvars.copy_context()
+        future = asyncio.run_coroutine_threadsafe(
+            _in_context(ctx, coro), self.loop
+        )
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # cancels the coroutine on timeouts and interrupts
+            future.cancel()
+            raise
+
+    def iterate(
+        self, iterator: AsyncIterator[T], timeout: float = None
+    ) -> Iterator[T]:
+        """Iterates an async iterator from synchronous code. Items are
+        yielded as soon as the loop produces them.
+
+        Args
+        ---
+        - iterator: the async iterator, e.g. an async generator
+        - timeout: seconds the whole iteration may take
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                remaining = None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                item = self.run(_next(iterator), remaining)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            # lets the generator run its cleanup when the caller stops early
+            if hasattr(iterator, "aclose"):
+                self.run(_aclose(iterator))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+
+loop_runner = LoopRunner()
+
+
+class SyncBrowser:
+    """A Playwright browser driven by the scraping loop for synchronous
+    callers. Its contexts and pages are async objects, passed to the sync
+    scrapers or awaited with `loop_runner.run`.
+
+    Args
+    ---
+    - url: the url the browser is for, used to look up the display policy
+    - mode: `headless`, `xvfb` or `headed`, overrides the policy
+    - args: the command line arguments of the browser
+    - runner: the loop the browser runs on
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        mode: str = None,
+        args: list[str] = browser_args,
+        runner: LoopRunner = loop_runner,
+    ):
+        self.url = url
+        self.mode = mode
+        self.args = args
+        self.runner = runner
+        self.playwright = None
+        self.browser = None
+
+    def start(self) -> "SyncBrowser":
+        self.playwright = self.runner.run(async_playwright().start())
+        self.browser = self.runner.run(
+            launch_browser(self.playwright, self.url, self.mode, self.args)
+        )
+        return self
+
+    def new_context(self, **kwargs) -> BrowserContext:
+        return self.runner.run(new_context(self.browser, **kwargs))
+
+    def close(self) -> None:
+        if self.browser is not None:
+            self.runner.run(close_browser(self.browser))
+        if self.playwright is not None:
+            self.runner.run(self.playwright.stop())
+        self.browser = self.playwright = None
+
+    def __enter__(self) -> "SyncBrowser":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
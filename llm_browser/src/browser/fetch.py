@@ -0,0 +1,296 @@
+"""Fetches public job pages over HTTP without a browser. Public LinkedIn
+searches and job postings are server-rendered, so a pooled HTTP client and an
+HTML parser read them in a fraction of the time and memory of a browser.
+Pages that need JavaScript or show a challenge raise `NeedsBrowser` so that
+the caller falls back to Playwright."""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+from llm_browser.src.browser import selectors
+from llm_browser.src.browser.display import user_agent
+from llm_browser.src.browser.politeness import (
+    THROTTLED,
+    BlockedError,
+    Politeness,
+    politeness,
+    request_slot,
+    retry_after,
+)
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+http_first = bool(int(os.environ.get("HTTP_FIRST", 1)))
+http_max_connections = int(os.environ.get("HTTP_MAX_CONNECTIONS", 20))
+http_retries = int(os.environ.get("HTTP_RETRIES", 3))
+http_timeout = float(os.environ.get("HTTP_TIMEOUT", 15))
+
+# the version of the Chromium shipped with the pinned Playwright
+CHROME_VERSION = "133.0.0.0"
+
+# statuses and markers of pages that only a browser gets past. LinkedIn
+# answers bots with a 999.
+CHALLENGE_STATUSES = {401, 403, 999}
+CHALLENGE_URL = re.compile(r"authwall|checkpoint|/login|/signup")
+CHALLENGE_MARKERS = (
+    "g-recaptcha",
+    "h-captcha",
+    "challenge-platform",
+    "cf-chl",
+)
+
+
+class NeedsBrowser(Exception):
+    """Raised when a page cannot be read without a browser"""
+
+
+class _Challenged(BlockedError):
+    """Raised inside a request slot on a challenge status so that the domain
+    backs off, then caught to return the page"""
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def check_page(response: httpx.Response) -> None:
+    """Raises `NeedsBrowser` when a response is a challenge or a login wall"""
+    url = str(response.url)
+    if response.status_code in CHALLENGE_STATUSES:
+        raise NeedsBrowser(f"{response.status_code} from {url}")
+    if CHALLENGE_URL.search(urlparse(url).path):
+        raise NeedsBrowser(f"redirected to {url}")
+    head = response.text[:20000]
+    if any(marker in head for marker in CHALLENGE_MARKERS):
+        raise NeedsBrowser(f"challenge on {url}")
+
+
+class HttpFetcher:
+    """A pooled async HTTP client that keeps connections alive, negotiates
+    HTTP/2 when `h2` is installed and decompresses responses. Requests are
+    paced by the politeness controllers and retried on network errors and
+    5xx responses.
+
+    Args
+    ---
+    - max_connections: the size of the connection pool
+    - retries: attempts after the first one
+    - timeout: seconds a request may take
+    - controllers: the politeness controllers pacing the requests
+    """
+
+    def __init__(
+        self,
+        max_connections: int = http_max_connections,
+        retries: int = http_retries,
+        timeout: float = http_timeout,
+        controllers: Politeness = politeness,
+    ):
+        self.max_connections = max_connections
+        self.retries = retries
+        self.timeout = timeout
+        self.controllers = controllers
+        self._client: httpx.AsyncClient = None
+        self._loop: asyncio.AbstractEventLoop = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The client of the running loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                http2=http2_available(),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={
+                    "User-Agent": user_agent(CHROME_VERSION),
+                    "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+                    "Accept-Language": "en-US,en;q=0.9",
+                },
+            )
+            self._loop = loop
+        return self._client
+
+    async def get(self, url: str) -> httpx.Response:
+        """Gets a url, retrying network errors and 5xx responses with
+        exponential backoff. A 429 raises a `BlockedError` straight away, and
+        a challenge status backs off the domain before it is returned."""
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2**attempt)
+            try:
+                async with request_slot(url, self.controllers):
+                    response = await self.client.get(url)
+                    if response.status_code == 429:
+                        raise BlockedError(
+                            url, THROTTLED, retry_after(response.headers)
+                        )
+                    if response.status_code in CHALLENGE_STATUSES:
+                        raise _Challenged(url, THROTTLED)
+            except _Challenged:
+                return response
+            except httpx.TransportError as e:
+                error = e
+                logger.warning(f"attempt {attempt + 1} on {url} failed: {e}")
+                continue
+            if response.status_code < 500:
+                return response
+            error = httpx.HTTPStatusError(
+                f"{response.status_code} from {url}",
+                request=response.request,
+                response=response,
+            )
+            logger.warning(f"attempt {attempt + 1} on {url}: {error}")
+        raise error
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+http_fetcher = HttpFetcher()
+
+
+def _text(soup: BeautifulSoup, selector: str) -> str:
+    element = soup.select_one(selector)
+    return element.get_text(" ", strip=True) if element else "N/A"
+
+
+def parse_cards(html: str) -> list[dict]:
+    """Parses the cards of a public LinkedIn search page or of a page of the
+    guest api
+
+    Returns
+    ---
+    The job id, title, company and location of each card
+    """
+    soup = BeautifulSoup(html, "lxml")
+    cards = []
+    for card in soup.select(selectors.LINKEDIN_PUBLIC_CARD):
+        cards.append(
+            {
+                "id": card["data-entity-urn"].rsplit(":", 1)[-1],
+                "title": _text(card, selectors.LINKEDIN_PUBLIC_TITLE),
+                "company": _text(card, selectors.LINKEDIN_PUBLIC_COMPANY),
+                "location": _text(card, selectors.LINKEDIN_PUBLIC_LOCATION),
+            }
+        )
+    return cards
+
+
+def parse_description(html: str) -> str:
+    soup = BeautifulSoup(html, "lxml")
+    element = soup.select_one(selectors.LINKEDIN_PUBLIC_DESCRIPTION)
+    return element.get_text("\n", strip=True) if element else ""
+
+
+def results_url(url: str, start: int) -> str:
+    """The guest api url of the results of a public search from `start`"""
+    parsed = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k != "start"]
+    query = urlencode(query + [("start", start)])
+    return (
+        f"{parsed.scheme}://{parsed.netloc}"
+        f"/jobs-guest/jobs/api/seeMoreJobPostings/search?{query}"
+    )
+
+
+def posting_url(url: str, job_id: str) -> str:
+    """The guest api url of a job posting, on the origin of a search"""
+    parsed = urlparse(url)
+    return (
+        f"{parsed.scheme}://{parsed.netloc}"
+        f"/jobs-guest/jobs/api/jobPosting/{job_id}"
+    )
+
+
+async def fetch_description(
+    url: str, card: dict, fetcher: HttpFetcher
+) -> Optional[str]:
+    try:
+        response = await fetcher.get(posting_url(url, card["id"]))
+        check_page(response)
+    except (httpx.HTTPError, NeedsBrowser) as e:
+        logger.warning(f"no description for {card['title']}: {e}")
+        return ""
+    return parse_description(response.text)
+
+
+async def fetch_linkedin_public(
+    url: str,
+    limit: int = None,
+    max_pages: int = 20,
+    fetcher: HttpFetcher = http_fetcher,
+) -> list[dict]:
+    """Scrapes a public LinkedIn job search over HTTP. The search page lists
+    the first jobs, the guest api the following ones and each posting's
+    description.
+
+    Args
+    ---
+    - url: the job search url
+    - limit: maximum number of roles
+    - max_pages: maximum number of guest api result pages
+    - fetcher: the HTTP client
+
+    Returns
+    ---
+    The title, company, location and description of each role
+    """
+    with tracer.span("fetch.http", url=url):
+        response = await fetcher.get(url)
+        check_page(response)
+        response.raise_for_status()
+        cards = parse_cards(response.text)
+        if not cards:
+            raise NeedsBrowser(f"no server-rendered jobs on {url}")
+
+        seen = {card["id"] for card in cards}
+        for _ in range(max_pages):
+            if limit is not None and len(cards) >= limit:
+                break
+            response = await fetcher.get(results_url(url, len(cards)))
+            if response.status_code != 200:
+                break
+            new = [
+                c for c in parse_cards(response.text) if c["id"] not in seen
+            ]
+            if not new:
+                break
+            seen.update(c["id"] for c in new)
+            cards.extend(new)
+
+        cards = cards[:limit]
+        descriptions = await asyncio.gather(
+            *(fetch_description(url, c, fetcher) for c in cards)
+        )
+        tracer.set_attributes(count=len(cards))
+
+    roles = [
+        {
+            "title": card["title"],
+            "company": card["company"],
+            "location": card["location"],
+            "description": description,
+        }
+        for card, description in zip(cards, descriptions)
+    ]
+    logger.info(f"fetched {len(roles)} roles from {url} over HTTP")
+    return roles
@@ -1,69 +1,173 @@
+import asyncio
 import logging
+from pathlib import Path
+from typing import Iterator
 
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+from lxml import etree
+from playwright.async_api import async_playwright
 
+from llm_browser.src.browser.engine import loop_runner
 from llm_browser.src.configs.config import results_dir
+from llm_browser.src.tracing import tracer
 from llm_browser.src.utils import set_logging
 
 set_logging()
 logger = logging.getLogger(__name__)
 
+PARAGRAPH_CLASS = "paragraph-root"
+NAME_CLASS = "name"
+TIMESTAMP_CLASS = "sc-871c1b8d-0"
+MESSAGE_CLASS = "transcript-sentence"
 
-def extract_transcript(url: str):
-    """Extracts the Fireflies transcript
+# size of the html chunks fed to the parser
+CHUNK_SIZE = 64 * 1024
 
-    Args
-    ---
-    url: of the Fireflies transcript
-    """
 
+def transcript_path(url: str) -> Path:
+    """Returns the file a transcript is saved to"""
     meeting_name = url.split("::")[0].split("/")[-1]
-    file_name = f"{meeting_name}.txt"
-    file_path = results_dir / file_name
+    return results_dir / f"{meeting_name}.txt"
+
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
-        page.goto(url)
-        page.wait_for_selector(".paragraph-root")
-        html = page.content()
-        browser.close()
+def _has_class(element, name: str) -> bool:
+    return name in (element.get("class") or "").split()
 
-    soup = BeautifulSoup(html, "html.parser")
-    paragraphs = soup.find_all("div", class_="paragraph-root")
 
-    markdown_output = []
+def _find_text(element, tag: str, name: str) -> str | None:
+    for child in element.iter(tag):
+        if _has_class(child, name):
+            return "".join(child.itertext()).strip()
+    return None
 
-    for para in paragraphs:
-        # Extract name
-        name_span = para.find("span", class_="name")
-        name = name_span.text.strip() if name_span else "Unknown"
 
-        # Extract timestamp
-        timestamp_span = para.find("span", class_="sc-871c1b8d-0")
-        timestamp = timestamp_span.text.strip() if timestamp_span else "00:00"
+def iter_paragraphs(html: str) -> Iterator[tuple[str, str, str]]:
+    """Parses the paragraphs of a transcript page incrementally with lxml.
+    Each paragraph is released once parsed so that long meetings are never
+    held in memory as a tree.
 
-        # Extract message
-        message_div = para.find("div", class_="transcript-sentence")
-        message = message_div.text.strip() if message_div else ""
+    Returns
+    ---
+    Tuples of the speaker, timestamp and message of each paragraph
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag="div")
 
-        # Format the line
-        markdown_line = f"{name} - {timestamp}\n{message}\n\n"
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start : start + CHUNK_SIZE])
+        for _, element in parser.read_events():
+            if not _has_class(element, PARAGRAPH_CLASS):
+                continue
+            yield (
+                _find_text(element, "span", NAME_CLASS) or "Unknown",
+                _find_text(element, "span", TIMESTAMP_CLASS) or "00:00",
+                _find_text(element, "div", MESSAGE_CLASS) or "",
+            )
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
 
-        markdown_output.append(markdown_line)
+    parser.close()
 
+
+def write_transcript(html: str, file_path: Path) -> int:
+    """Streams the paragraphs of a transcript page to a file
+
+    Returns
+    ---
+    The number of paragraphs written
+    """
+    count = 0
     with open(file_path, "w") as f:
-        f.writelines(markdown_output)
+        for name, timestamp, message in iter_paragraphs(html):
+            f.write(f"{name} - {timestamp}\n{message}\n\n")
+            count += 1
+    return count
+
+
+def extract_transcript(url: str, timeout: float = None) -> Path:
+    """Extracts the Fireflies transcript
 
-    logger.info(f"transcript saved to {file_path.resolve()}")
+    Args
+    ---
+    url: of the Fireflies transcript
+    timeout: seconds after which the extraction is cancelled
+
+    Returns
+    ---
+    The file the transcript was saved to
+    """
+    saved = loop_runner.run(
+        extract_transcripts([url], concurrency=1), timeout=timeout
+    )
+    if url not in saved:
+        raise RuntimeError(f"could not extract the transcript of {url}")
+    return saved[url]
+
+
+async def extract_transcripts(
+    urls: list[str], concurrency: int = 4
+) -> dict[str, Path]:
+    """Extracts many Fireflies transcripts concurrently over one browser
+
+    Args
+    ---
+    - urls: of the Fireflies transcripts
+    - concurrency: maximum number of pages loading at once
+
+    Returns
+    ---
+    The file each transcript was saved to
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    saved = {}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        context = await browser.new_context()
+
+        async def extract(url: str) -> None:
+            async with semaphore:
+                page = await context.new_page()
+                try:
+                    with tracer.span("navigate", url=url):
+                        await page.goto(url)
+                        await page.wait_for_selector(f".{PARAGRAPH_CLASS}")
+                    html = await page.content()
+                except Exception as e:
+                    logger.exception(f"error loading {url}: {e}")
+                    return
+                finally:
+                    await page.close()
+
+            # parse outside of the event loop so other pages keep loading
+            file_path = transcript_path(url)
+            count = await asyncio.to_thread(write_transcript, html, file_path)
+            saved[url] = file_path
+            logger.info(f"{count} paragraphs saved to {file_path.resolve()}")
+
+        await asyncio.gather(*(extract(url) for url in urls))
+        await browser.close()
+
+    return saved
 
 
 if __name__ == "__main__":
     from argparse import ArgumentParser
 
     parser = ArgumentParser(description="Extracts the Fireflies transcript")
-    parser.add_argument("--url", help="url to the transcript", type=str)
+    parser.add_argument(
+        "--url", help="urls to the transcripts", type=str, nargs="+"
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="maximum number of transcripts loading at once",
+        type=int,
+        default=4,
+    )
     args = parser.parse_args()
 
-    extract_transcript(url=args.url)
+    if len(args.url) == 1:
+        extract_transcript(url=args.url[0])
+    else:
+        asyncio.run(
+            extract_transcripts(args.url, concurrency=args.concurrency)
+        )
@@ -0,0 +1,67 @@
+"""Records the network traffic of browser contexts to HAR files and replays
+it so that runs can be repeated offline"""
+
+import logging
+import os
+from pathlib import Path
+
+from playwright.async_api import BrowserContext
+
+from llm_browser.src.configs.config import results_dir
+from llm_browser.src.utils import set_logging, url_key
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+har_dir = Path(os.environ.get("HAR_DIR") or results_dir / "har")
+
+
+def har_path(url: str, directory: Path = har_dir) -> Path:
+    """Returns the HAR archive of a url. Archives are zipped so that response
+    bodies are stored as separate files rather than base64 in the json."""
+    return Path(directory) / f"{url_key(url)}.zip"
+
+
+def context_options(
+    url: str, mode: str = None, directory: Path = har_dir
+) -> dict:
+    """Returns the `new_context` options that record the traffic of a url
+
+    Args
+    ---
+    - url: the url the context scrapes
+    - mode: `record`, `replay` or None
+    - directory: the directory of the HAR archives
+    """
+    if mode != RECORD:
+        return {}
+
+    path = har_path(url, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"recording traffic of {url} to {path}")
+    return {"record_har_path": str(path), "record_har_mode": "full"}
+
+
+def _replay_path(url: str, directory: Path) -> Path:
+    path = har_path(url, directory)
+    if not path.exists():
+        raise FileNotFoundError(f"no HAR recorded for {url} in {directory}")
+    logger.info(f"replaying traffic of {url} from {path}")
+    return path
+
+
+async def route_har(
+    context: BrowserContext,
+    url: str,
+    mode: str = None,
+    directory: Path = har_dir,
+) -> None:
+    """Serves the requests of a context from the HAR recorded for a url.
+    Requests missing from the recording are aborted so that replays never
+    reach the network."""
+    if mode == REPLAY:
+        path = _replay_path(url, directory)
+        await context.route_from_har(path, not_found="abort")
@@ -0,0 +1,205 @@
+"""Bounds the memory of long scrapes. A managed context stands in for a
+Playwright browser context: it counts the navigations of its pages, samples
+the memory of the browser's renderers and replaces itself with a fresh
+context, carrying the cookies and local storage over, once either crosses
+its limit."""
+
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional
+
+import psutil
+from playwright.async_api import Browser, BrowserContext, Page
+
+from llm_browser.src.browser.display import (
+    browser_processes,
+    new_context,
+    sample_interval,
+)
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+max_navigations = int(os.environ.get("CONTEXT_MAX_NAVIGATIONS", 200))
+max_renderer_rss_mb = int(os.environ.get("RENDERER_MAX_RSS_MB", 1500))
+
+
+def renderer_rss(processes: set[psutil.Process]) -> int:
+    """Sums the resident memory of the renderer processes, in bytes"""
+    rss = 0
+    for process in processes:
+        try:
+            with process.oneshot():
+                if "--type=renderer" not in process.cmdline():
+                    continue
+                rss += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return rss
+
+
+class ManagedContext:
+    """A browser context that is recycled after `max_navigations`
+    navigations or once the renderers of its browser use more than
+    `max_rss_mb`. Scrapers check `needs_recycle` and call `reopen` where a
+    page can be reopened from its url without losing their place.
+    Attributes of the current Playwright context are available on the
+    managed context.
+
+    Args
+    ---
+    - browser: the browser to create the contexts in
+    - max_navigations: navigations after which the context is recycled
+    - max_rss_mb: renderer memory after which the context is recycled
+    - setup: an async function called with each new context, e.g. to route
+    requests from a HAR archive
+    - options: the `new_context` options of every context
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        max_navigations: Optional[int] = max_navigations,
+        max_rss_mb: Optional[int] = max_renderer_rss_mb,
+        setup: Callable[[BrowserContext], Awaitable] = None,
+        **options,
+    ):
+        self.browser = browser
+        self.max_navigations = max_navigations
+        self.max_rss_mb = max_rss_mb
+        self.setup = setup
+        self.options = options
+        self.context: BrowserContext = None
+        self.navigations = 0
+        self.total_navigations = 0
+        self.recycles = 0
+        self.rss = self.peak_rss = 0
+        self._sampler: asyncio.Task = None
+
+        if "record_har_path" in options:
+            # a new context would start a new archive at the same path
+            logger.info("recording a HAR archive, contexts are not recycled")
+            self.max_navigations = self.max_rss_mb = None
+
+    def __getattr__(self, name: str):
+        if name == "context":
+            raise AttributeError(name)
+        return getattr(self.context, name)
+
+    async def _open(self, storage_state: dict = None) -> None:
+        options = dict(self.options)
+        if storage_state is not None:
+            options["storage_state"] = storage_state
+        self.context = await new_context(self.browser, **options)
+        if self.setup is not None:
+            await self.setup(self.context)
+        self.navigations = 0
+
+    async def start(self) -> "ManagedContext":
+        await self._open()
+        self._sampler = asyncio.create_task(self._poll())
+        return self
+
+    async def _poll(self, interval: float = sample_interval) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(interval)
+
+    def sample(self) -> int:
+        """Measures the renderer memory of the browser, in bytes"""
+        self.rss = renderer_rss(browser_processes(self.browser))
+        self.peak_rss = max(self.peak_rss, self.rss)
+        return self.rss
+
+    def _on_navigated(self, page: Page):
+        def on_navigated(frame) -> None:
+            if frame == page.main_frame:
+                self.navigations += 1
+                self.total_navigations += 1
+
+        return on_navigated
+
+    async def new_page(self) -> Page:
+        page = await self.context.new_page()
+        page.on("framenavigated", self._on_navigated(page))
+        return page
+
+    def needs_recycle(self) -> bool:
+        if self.max_navigations and self.navigations >= self.max_navigations:
+            return True
+        if self.max_rss_mb and self.sample() > self.max_rss_mb * 2**20:
+            return True
+        return False
+
+    async def recycle(self) -> None:
+        """Replaces the context with a new one holding the same session"""
+        state = await self.context.storage_state()
+        logger.info(
+            f"recycling context after {self.navigations} navigations at "
+            f"{self.rss / 2**20:.0f} MB of renderer memory"
+        )
+        await self.context.close()
+        await self._open(storage_state=state)
+        self.recycles += 1
+
+    async def reopen(
+        self, page: Page, navigate: Callable[[Page, str], Awaitable]
+    ) -> Page:
+        """Recycles the context and opens the url of a page in the new one
+
+        Args
+        ---
+        - page: the page to reopen, closed with the old context
+        - navigate: the scraper's navigation, called as
+        `navigate(page, url)`, so that the reload is paced and checked for
+        blocks like any other
+
+        Returns
+        ---
+        The page to continue with
+        """
+        url = page.url
+        await self.recycle()
+        page = await self.new_page()
+        try:
+            await navigate(page, url)
+        except BaseException:
+            # the caller still holds the old page, this one would leak
+            await page.close()
+            raise
+        return page
+
+    def reset_peak(self) -> None:
+        """Starts measuring the peak memory of a new task"""
+        self.peak_rss = self.sample()
+
+    def report(self) -> dict:
+        return {
+            "navigations": self.total_navigations,
+            "recycles": self.recycles,
+            "peak_renderer_rss_mb": round(self.peak_rss / 2**20, 1),
+        }
+
+    async def close(self) -> None:
+        if self._sampler is not None:
+            self._sampler.cancel()
+        if self.context is not None:
+            await self.context.close()
+
+
+@contextmanager
+def track_memory(context) -> Iterator[None]:
+    """Records the navigations, recycles and peak renderer memory of a task
+    on the current span. Contexts that are not managed are ignored."""
+    if not isinstance(context, ManagedContext):
+        yield
+        return
+    context.reset_peak()
+    try:
+        yield
+    finally:
+        tracer.set_attributes(**context.report())
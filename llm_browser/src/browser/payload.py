@@ -0,0 +1,268 @@
+"""Reduces the screenshots and DOM sent to the vision model at each step of
+the browsing agent"""
+
+import base64
+import hashlib
+import io
+import logging
+import os
+
+from browser_use.agent.message_manager.service import MessageManager
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+from PIL import Image
+
+from llm_browser.src.configs.config import PayloadConfig
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import estimate_tokens, set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+payload_config = PayloadConfig(
+    screenshot_scale=float(os.environ.get("SCREENSHOT_SCALE", 0.6)),
+    screenshot_format=os.environ.get("SCREENSHOT_FORMAT", "png"),
+    screenshot_quality=int(os.environ.get("SCREENSHOT_QUALITY", 60)),
+    clip_viewport=bool(int(os.environ.get("CLIP_VIEWPORT", 1))),
+    viewport_expansion=(
+        int(os.environ["DOM_VIEWPORT_EXPANSION"])
+        if os.environ.get("DOM_VIEWPORT_EXPANSION")
+        else None
+    ),
+    prune_dom=bool(int(os.environ.get("PRUNE_DOM", 1))),
+    max_text_chars=int(os.environ.get("DOM_MAX_TEXT_CHARS", 300)),
+    dedupe_state=bool(int(os.environ.get("DEDUPE_STATE", 1))),
+)
+
+# elements whose content is never useful to the model
+IRRELEVANT_TAGS = {"script", "style", "noscript", "svg", "template", "iframe"}
+
+# pixels per image token, as used by the vision model providers
+PIXELS_PER_TOKEN = 750
+
+
+def image_tokens(screenshot: str) -> tuple[int, int, int]:
+    """Estimates the tokens of a base64 encoded screenshot
+
+    Returns
+    ---
+    A tuple of the width, height and estimated tokens of the image
+    """
+    with Image.open(io.BytesIO(base64.b64decode(screenshot))) as img:
+        width, height = img.size
+    return width, height, width * height // PIXELS_PER_TOKEN
+
+
+def media_type(screenshot: str) -> str:
+    """The media type of a base64 encoded screenshot, JPEG or PNG"""
+    return "image/jpeg" if screenshot.startswith("/9j/") else "image/png"
+
+
+def downscale(screenshot: bytes, scale: float, fmt: str, quality: int) -> str:
+    """Resizes and re-encodes a screenshot
+
+    Args
+    ---
+    - screenshot: the raw image
+    - scale: the factor applied to both sides, 1 keeps the size
+    - fmt: `png` or `jpeg`
+    - quality: the JPEG quality (1-100)
+
+    Returns
+    ---
+    The base64 encoded image
+    """
+    with Image.open(io.BytesIO(screenshot)) as img:
+        if scale < 1:
+            size = (
+                max(1, int(img.width * scale)),
+                max(1, int(img.height * scale)),
+            )
+            img = img.resize(size, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if fmt == "jpeg":
+            img.convert("RGB").save(
+                buffer, format="JPEG", quality=quality, optimize=True
+            )
+        else:
+            img.save(buffer, format="PNG", optimize=True)
+
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def prune_tree(node, max_text_chars: int) -> bool:
+    """Removes hidden and irrelevant nodes from a DOM tree in place.
+    Interactive elements and their ancestors are always kept so that the
+    selector map stays valid.
+
+    Returns
+    ---
+    Whether the node itself should be kept
+    """
+    if isinstance(node, DOMTextNode):
+        if not node.is_visible or not node.text.strip():
+            return False
+        if len(node.text) > max_text_chars:
+            node.text = node.text[:max_text_chars] + "..."
+        return True
+
+    if not isinstance(node, DOMElementNode):
+        return True
+
+    node.children = [c for c in node.children if prune_tree(c, max_text_chars)]
+
+    if node.highlight_index is not None:
+        return True
+    if node.tag_name in IRRELEVANT_TAGS:
+        return any(is_interactive(c) for c in node.children)
+    return bool(node.children) or node.is_visible
+
+
+def is_interactive(node) -> bool:
+    """Whether a node is or contains an interactive element"""
+    if not isinstance(node, DOMElementNode):
+        return False
+    return node.highlight_index is not None or any(
+        is_interactive(c) for c in node.children
+    )
+
+
+def count_nodes(node) -> int:
+    if isinstance(node, DOMElementNode):
+        return 1 + sum(count_nodes(c) for c in node.children)
+    return 1
+
+
+class ReducedBrowserContext(BrowserContext):
+    """A browser context that shrinks the state handed to the agent
+
+    - screenshots are clipped to the viewport, downscaled and optionally
+    JPEG compressed
+    - hidden, empty and irrelevant DOM nodes are pruned and long texts are
+    truncated
+    - the screenshot is dropped when the page is unchanged since the last
+    step, as the model has already seen it
+
+    The size of every step's payload is logged and recorded in an
+    `agent.state` span.
+
+    Args
+    ---
+    - browser: the browser_use browser
+    - payload: the reductions to apply
+    """
+
+    def __init__(
+        self,
+        browser,
+        config: BrowserContextConfig = None,
+        payload: PayloadConfig = payload_config,
+    ):
+        if config is None:
+            # browser_use's own expansion unless one is set
+            config = BrowserContextConfig()
+            if payload.viewport_expansion is not None:
+                config.viewport_expansion = payload.viewport_expansion
+        super().__init__(browser=browser, config=config)
+        self.payload = payload
+        self._last_signature = None
+        self.stats = {
+            "state_updates": 0,
+            "dom_tokens": 0,
+            "image_tokens": 0,
+            "screenshot_bytes": 0,
+            "deduped_steps": 0,
+        }
+
+    async def take_screenshot(self, full_page: bool = False) -> str:
+        page = await self.get_current_page()
+        fmt = self.payload.screenshot_format
+        options = {"full_page": full_page, "animations": "disabled"}
+
+        if self.payload.clip_viewport and page.viewport_size:
+            options.update(
+                full_page=False,
+                clip={"x": 0, "y": 0, **page.viewport_size},
+            )
+        if fmt == "jpeg" and self.payload.screenshot_scale >= 1:
+            options.update(
+                type="jpeg", quality=self.payload.screenshot_quality
+            )
+            return base64.b64encode(await page.screenshot(**options)).decode()
+
+        screenshot = await page.screenshot(**options)
+        return downscale(
+            screenshot,
+            scale=self.payload.screenshot_scale,
+            fmt=fmt,
+            quality=self.payload.screenshot_quality,
+        )
+
+    async def _update_state(self, focus_element: int = -1) -> BrowserState:
+        with tracer.span("agent.state") as span:
+            state = await super()._update_state(focus_element=focus_element)
+
+            nodes = count_nodes(state.element_tree)
+            if self.payload.prune_dom:
+                prune_tree(state.element_tree, self.payload.max_text_chars)
+
+            elements = state.element_tree.clickable_elements_to_string()
+            signature = hashlib.sha1(
+                f"{state.url}\n{elements}".encode()
+            ).hexdigest()
+            unchanged = signature == self._last_signature
+            self._last_signature = signature
+
+            if unchanged and self.payload.dedupe_state:
+                state.screenshot = None
+
+            dom_tokens = estimate_tokens(elements)
+            width = height = img_tokens = size = 0
+            if state.screenshot:
+                width, height, img_tokens = image_tokens(state.screenshot)
+                size = len(state.screenshot) * 3 // 4
+
+            self.stats["state_updates"] += 1
+            self.stats["dom_tokens"] += dom_tokens
+            self.stats["image_tokens"] += img_tokens
+            self.stats["screenshot_bytes"] += size
+            self.stats["deduped_steps"] += unchanged
+
+            span["attributes"].update(
+                url=state.url,
+                dom_nodes=nodes,
+                kept_nodes=count_nodes(state.element_tree),
+                dom_tokens=dom_tokens,
+                image_tokens=img_tokens,
+                screenshot_bytes=size,
+                unchanged=unchanged,
+            )
+            logger.info(
+                f"step {self.stats['state_updates']} payload: "
+                f"~{dom_tokens} DOM tokens, ~{img_tokens} image tokens "
+                f"({width}x{height}, {size // 1024} KB)"
+                + (", unchanged" if unchanged else "")
+            )
+        return state
+
+
+class ReducedMessageManager(MessageManager):
+    """Labels the screenshot of each state message with its media type.
+    browser_use always labels screenshots as PNG, which providers reject for
+    the JPEG screenshots of `SCREENSHOT_FORMAT=jpeg`."""
+
+    def add_state_message(
+        self, state: BrowserState, result=None, step_info=None, use_vision=True
+    ) -> None:
+        super().add_state_message(state, result, step_info, use_vision)
+        content = self.history.messages[-1].message.content
+        if not state.screenshot or not isinstance(content, list):
+            return
+        for part in content:
+            if part.get("type") == "image_url":
+                part["image_url"]["url"] = (
+                    f"data:{media_type(state.screenshot)};base64,"
+                    f"{state.screenshot}"
+                )
@@ -0,0 +1,194 @@
+"""Captures Navigation Timing, Resource Timing, request counts and JS heap
+size of scraped pages"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from playwright.async_api import Page
+
+from llm_browser.src.database import get_mongodb_client, save_to_db
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+capture_perf = bool(int(os.environ.get("CAPTURE_PERF", 0)))
+
+# the default buffer only keeps 250 resource entries
+PERF_INIT_SCRIPT = "performance.setResourceTimingBufferSize(10000);"
+
+TIMING_SCRIPT = """() => {
+    const nav = performance.getEntriesByType("navigation")[0];
+    const resources = performance.getEntriesByType("resource");
+    const byType = {};
+    let transfer = 0;
+    for (const r of resources) {
+        const t = byType[r.initiatorType] || {count: 0, bytes: 0, ms: 0};
+        t.count += 1;
+        t.bytes += r.transferSize;
+        t.ms += r.duration;
+        byType[r.initiatorType] = t;
+        transfer += r.transferSize;
+    }
+    const slowest = [...resources]
+        .sort((a, b) => b.duration - a.duration)
+        .slice(0, 5)
+        .map(r => ({name: r.name, ms: r.duration, bytes: r.transferSize}));
+    return {
+        navigation: nav ? {
+            ttfb_ms: nav.responseStart - nav.startTime,
+            dom_content_loaded_ms: nav.domContentLoadedEventEnd,
+            load_ms: nav.loadEventEnd,
+            duration_ms: nav.duration,
+            transfer_bytes: nav.transferSize,
+        } : null,
+        resources: {
+            count: resources.length,
+            transfer_bytes: transfer,
+            by_type: byType,
+            slowest: slowest,
+        },
+    };
+}"""
+
+
+def _on_request(counters: dict):
+    def handler(request):
+        counters["requests"] += 1
+
+    return handler
+
+
+def _on_response(counters: dict):
+    def handler(response):
+        counters["responses"] += 1
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            counters["response_bytes"] += int(length)
+        if response.status >= 400:
+            counters["errors"] += 1
+
+    return handler
+
+
+def _new_counters() -> dict:
+    return {"requests": 0, "responses": 0, "response_bytes": 0, "errors": 0}
+
+
+def _heap(metrics: list[dict]) -> dict:
+    values = {m["name"]: m["value"] for m in metrics}
+    return {
+        "js_heap_used_bytes": values.get("JSHeapUsedSize"),
+        "js_heap_total_bytes": values.get("JSHeapTotalSize"),
+        "dom_nodes": values.get("Nodes"),
+    }
+
+
+def _record(url: str, page_url: str, timing: dict, counters, heap) -> dict:
+    return {
+        "url": url,
+        "page_url": page_url,
+        "run_id": tracer.run_id,
+        "captured_at": datetime.now(tz=timezone.utc),
+        **timing,
+        "network": counters,
+        "memory": heap,
+    }
+
+
+async def start_capture(page: Page) -> dict:
+    """Prepares a page for performance capture. Must be called before the
+    page navigates.
+
+    Returns
+    ---
+    Request counters that are updated as the page loads
+    """
+    counters = _new_counters()
+    await page.add_init_script(PERF_INIT_SCRIPT)
+    page.on("request", _on_request(counters))
+    page.on("response", _on_response(counters))
+    return counters
+
+
+async def finish_capture(page: Page, url: str, counters: dict) -> dict:
+    """Collects the performance data of a page and saves it to the database
+
+    Args
+    ---
+    - page: the page to capture
+    - url: the url of the task the page belongs to
+    - counters: the request counters returned by `start_capture`
+    """
+    try:
+        timing = await page.evaluate(TIMING_SCRIPT)
+        cdp = await page.context.new_cdp_session(page)
+        await cdp.send("Performance.enable")
+        metrics = await cdp.send("Performance.getMetrics")
+        await cdp.detach()
+        record = _record(
+            url, page.url, timing, counters, _heap(metrics["metrics"])
+        )
+        save_to_db(fp=None, key=None, collection="page_metrics", data=record)
+        return record
+    except Exception as e:
+        logger.exception(f"error capturing performance of {url}: {e}")
+        return {}
+
+
+def page_metrics_report(days: int = 30) -> list[dict]:
+    """Aggregates the captured performance data per url
+
+    Args
+    ---
+    - days: how far back to aggregate
+
+    Returns
+    ---
+    One document per url with the average and maximum load time, page
+    weight, request count and JS heap size
+    """
+    db_name = os.environ.get("_MONGO_DB")
+    since = datetime.now(tz=timezone.utc) - timedelta(days=days)
+    client = get_mongodb_client()
+
+    with client:
+        coll = client[db_name]["page_metrics"]
+        pipeline = [
+            {"$match": {"captured_at": {"$gte": since}}},
+            {
+                "$group": {
+                    "_id": "$url",
+                    "captures": {"$sum": 1},
+                    "avg_load_ms": {"$avg": "$navigation.load_ms"},
+                    "max_load_ms": {"$max": "$navigation.load_ms"},
+                    "avg_transfer_bytes": {
+                        "$avg": "$resources.transfer_bytes"
+                    },
+                    "avg_requests": {"$avg": "$network.requests"},
+                    "avg_js_heap_bytes": {
+                        "$avg": "$memory.js_heap_used_bytes"
+                    },
+                    "max_js_heap_bytes": {
+                        "$max": "$memory.js_heap_used_bytes"
+                    },
+                }
+            },
+            {"$sort": {"avg_load_ms": -1}},
+        ]
+        return list(coll.aggregate(pipeline))
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Reports page performance per url")
+    parser.add_argument(
+        "--days", help="days to aggregate", type=int, default=30
+    )
+    args = parser.parse_args()
+
+    for row in page_metrics_report(days=args.days):
+        logger.info(row)
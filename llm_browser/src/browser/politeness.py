@@ -0,0 +1,253 @@
+"""Paces the requests made to each domain. A controller per domain sets how
+many requests may run at once and how far apart they start, backing off
+multiplicatively on captchas, 429s and slow responses and ramping up again
+additively while responses are healthy."""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+min_delay = float(os.environ.get("POLITENESS_MIN_DELAY", 1.0))
+max_delay = float(os.environ.get("POLITENESS_MAX_DELAY", 60.0))
+max_concurrency = int(os.environ.get("POLITENESS_MAX_CONCURRENCY", 4))
+slow_seconds = float(os.environ.get("POLITENESS_SLOW_SECONDS", 10.0))
+captcha_cooldown = float(os.environ.get("POLITENESS_CAPTCHA_COOLDOWN", 300))
+# times a blocked task is requeued within a run
+max_block_attempts = int(os.environ.get("BLOCKED_MAX_ATTEMPTS", 3))
+
+CAPTCHA = "captcha"
+THROTTLED = "throttled"
+SLOW = "slow"
+
+# seconds to wait for a request slot when every slot is taken
+POLL_INTERVAL = 0.1
+
+
+class BlockedError(RuntimeError):
+    """Raised when a site refuses to serve a page, so that the task fails
+    fast and is requeued rather than waiting for a human
+
+    Args
+    ---
+    - url: the url that was blocked
+    - kind: `captcha` or `throttled`
+    - retry_after: seconds the site asked us to wait, if any
+    """
+
+    def __init__(self, url: str, kind: str, retry_after: float = None):
+        super().__init__(url, kind, retry_after)
+        self.url = url
+        self.kind = kind
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        return f"{self.kind} on {self.url}"
+
+
+class CaptchaError(BlockedError):
+    def __init__(self, url: str, kind: str = CAPTCHA, retry_after=None):
+        super().__init__(url, kind, retry_after)
+
+
+def domain_of(url: str) -> str:
+    netloc = urlparse(url).netloc.lower()
+    return netloc.removeprefix("www.")
+
+
+class DomainController:
+    """Additive-increase, multiplicative-decrease pacing of one domain. It is
+    thread safe so that the pool's scheduler and the scraping loop can share
+    it.
+
+    Args
+    ---
+    - domain: the domain paced
+    - max_concurrency: the most requests allowed at once
+    - min_delay: the shortest spacing between request starts, in seconds
+    - max_delay: the longest spacing after backing off, in seconds
+    - slow_seconds: latency above which a response counts as a back off
+    - backoff: the factor the spacing grows by on a back off
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        max_concurrency: int = max_concurrency,
+        min_delay: float = min_delay,
+        max_delay: float = max_delay,
+        slow_seconds: float = slow_seconds,
+        backoff: float = 2.0,
+    ):
+        self.domain = domain
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.slow_seconds = slow_seconds
+        self.backoff = backoff
+
+        self.limit = max_concurrency
+        self.delay = min_delay
+        self.in_flight = 0
+        self.healthy_streak = 0
+        self.next_start = 0.0
+        self.cooldown_until = 0.0
+        self.counts = {"ok": 0, CAPTCHA: 0, THROTTLED: 0, SLOW: 0}
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Takes a request slot if one is free and the spacing has elapsed
+
+        Returns
+        ---
+        0 if the slot was taken, otherwise the seconds to wait before trying
+        again
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.in_flight >= self.limit:
+                return POLL_INTERVAL
+            start = max(self.next_start, self.cooldown_until)
+            if now < start:
+                return start - now
+            self.in_flight += 1
+            self.next_start = now + self.delay
+            return 0.0
+
+    def release(
+        self,
+        latency: float = None,
+        blocked: str = None,
+        retry_after: float = None,
+        ok: bool = True,
+    ) -> None:
+        """Frees a request slot and adapts the pacing to its outcome
+
+        Args
+        ---
+        - latency: seconds the request took, compared to `slow_seconds`
+        - blocked: `captcha` or `throttled` if the site refused the request
+        - retry_after: seconds the site asked us to wait
+        - ok: False for failures that say nothing about the site's load,
+        which leave the pacing unchanged
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if blocked is None and latency is not None:
+                if latency > self.slow_seconds:
+                    blocked = SLOW
+            if blocked is not None:
+                self._back_off(blocked, retry_after)
+            elif ok:
+                self._ramp_up()
+
+    def _back_off(self, kind: str, retry_after: float = None) -> None:
+        self.counts[kind] += 1
+        self.healthy_streak = 0
+        self.limit = max(1, self.limit // 2)
+        self.delay = min(self.max_delay, self.delay * self.backoff)
+
+        cooldown = retry_after or 0.0
+        if kind == CAPTCHA:
+            cooldown = max(cooldown, captcha_cooldown)
+        if cooldown:
+            self.cooldown_until = max(
+                self.cooldown_until, time.monotonic() + cooldown
+            )
+        logger.warning(
+            f"{kind} on {self.domain}: {self.limit} at once, "
+            f"{self.delay:.1f}s apart, cooling down {cooldown:.0f}s"
+        )
+
+    def _ramp_up(self) -> None:
+        self.counts["ok"] += 1
+        self.healthy_streak += 1
+        self.delay = max(self.min_delay, self.delay - self.min_delay)
+        # one more slot for every window of healthy responses
+        if self.healthy_streak >= self.limit:
+            self.healthy_streak = 0
+            self.limit = min(self.max_concurrency, self.limit + 1)
+
+    def cooldown(self) -> float:
+        """Seconds until the domain may be requested again"""
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def report(self) -> dict:
+        return {
+            "limit": self.limit,
+            "delay": round(self.delay, 2),
+            "cooldown": round(self.cooldown(), 1),
+            **self.counts,
+        }
+
+
+class Politeness:
+    """The controllers of every domain, created on first use"""
+
+    def __init__(self, **options):
+        self.options = options
+        self._controllers: dict[str, DomainController] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> DomainController:
+        domain = domain_of(url)
+        with self._lock:
+            if domain not in self._controllers:
+                self._controllers[domain] = DomainController(
+                    domain, **self.options
+                )
+            return self._controllers[domain]
+
+    def report(self) -> dict:
+        with self._lock:
+            return {d: c.report() for d, c in self._controllers.items()}
+
+
+politeness = Politeness()
+
+
+@asynccontextmanager
+async def request_slot(
+    url: str, controllers: Politeness = politeness
+) -> AsyncIterator[DomainController]:
+    """Waits for a request slot of the url's domain and releases it with the
+    outcome of the block: a `BlockedError` backs off, a timeout or a slow
+    block counts as slow and anything else ramps up"""
+    controller = controllers.for_url(url)
+    while (wait := controller.try_acquire()) > 0:
+        await asyncio.sleep(wait)
+
+    started = time.monotonic()
+    try:
+        yield controller
+    except BlockedError as e:
+        controller.release(blocked=e.kind, retry_after=e.retry_after)
+        raise
+    except (PlaywrightTimeoutError, asyncio.TimeoutError):
+        controller.release(blocked=SLOW)
+        raise
+    except BaseException:
+        controller.release(ok=False)
+        raise
+    else:
+        controller.release(latency=time.monotonic() - started)
+
+
+def retry_after(headers: dict) -> Optional[float]:
+    """Reads the seconds of a `Retry-After` header, if it has any"""
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,200 @@
+"""Process pool that shards browser work across workers that each own a
+browser. The browsers run on each worker's scraping loop and are driven
+through the synchronous scrapers."""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.util import Finalize
+from typing import Callable, Iterator
+
+import psutil
+
+from llm_browser.src.browser.engine import SyncBrowser, loop_runner
+from llm_browser.src.browser.lifecycle import ManagedContext
+from llm_browser.src.browser.politeness import (
+    BlockedError,
+    Politeness,
+    max_block_attempts,
+)
+from llm_browser.src.browser.scrapers import login_linkedin, save_login_state
+from llm_browser.src.browser.timeouts import timeouts
+from llm_browser.src.configs.config import linkedin_state
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+scrape_workers = int(os.environ.get("SCRAPE_WORKERS", 1))
+worker_memory_mb = int(os.environ.get("WORKER_MEMORY_MB", 1024))
+login_state_max_age = 12 * 60 * 60
+
+LINKEDIN = "https://www.linkedin.com/"
+
+# the browser owned by the current worker process
+_worker: dict = {}
+
+
+def worker_count(
+    requested: int, jobs: int, memory_mb: int = worker_memory_mb
+) -> int:
+    """Caps the requested number of workers by the number of jobs, CPU cores
+    and the memory available for one browser per worker"""
+    cpus = os.cpu_count() or 1
+    available_mb = psutil.virtual_memory().available // (1024 * 1024)
+    by_memory = max(1, available_mb // memory_mb)
+    count = max(1, min(requested, jobs, cpus, by_memory))
+
+    if count < requested:
+        logger.info(
+            f"using {count} of {requested} workers ({jobs=}, {cpus=}, "
+            f"{available_mb=})"
+        )
+    return count
+
+
+def ensure_login_state(mode: str = None, max_age=login_state_max_age):
+    """Logs in once and saves the session for the workers to share, unless a
+    recent session is already saved. A failed login is not saved, so that the
+    workers do not share a logged out session until it expires."""
+    if linkedin_state.exists():
+        age = time.time() - linkedin_state.stat().st_mtime
+        if age < max_age:
+            return
+
+    with SyncBrowser(LINKEDIN, mode=mode) as browser:
+        context = browser.new_context()
+        page = loop_runner.run(context.new_page())
+        if not login_linkedin(page):
+            logger.error(f"could not log in to LinkedIn from {page.url}")
+            return
+        save_login_state(context)
+
+
+def _start_worker(mode: str) -> None:
+    browser = SyncBrowser(LINKEDIN, mode=mode).start()
+    storage_state = linkedin_state if linkedin_state.exists() else None
+    context = loop_runner.run(
+        ManagedContext(browser.browser, storage_state=storage_state).start()
+    )
+    _worker.update(browser=browser, context=context)
+    Finalize(None, _stop_worker, exitpriority=10)
+    logger.info(f"worker {os.getpid()} started")
+
+
+def _stop_worker() -> None:
+    timeouts.save()
+    loop_runner.run(_worker["context"].close())
+    _worker["browser"].close()
+
+
+def _run_job(func: Callable, job: dict):
+    run_id = job.get("run_id")
+    # the context is shared across jobs, a new job starts in a fresh one once
+    # the previous jobs grew it past its limits
+    context = _worker["context"]
+    if context.needs_recycle():
+        loop_runner.run(context.recycle())
+    with tracer.run(run_id):
+        result = func(browser_context=_worker["context"], **job)
+    spans = tracer.spans(run_id)
+    tracer.clear(run_id)
+    return result, spans
+
+
+def run_sharded(
+    func: Callable,
+    jobs: list[dict],
+    workers: int = scrape_workers,
+    mode: str = None,
+    retry: Callable[[object], bool] = None,
+) -> Iterator[tuple[dict, object, list[dict]]]:
+    """Runs jobs in a pool of processes that each own a browser context.
+    Results are yielded as soon as each job completes. Jobs of a domain are
+    started at the pace of its politeness controller, and jobs that were
+    blocked or whose result should be retried are requeued up to
+    `max_block_attempts` times.
+
+    Args
+    ---
+    - func: a picklable function called as `func(browser_context, **job)`
+    - jobs: the keyword arguments of each call, including a `run_id`
+    - workers: the requested number of worker processes
+    - mode: the display mode of the workers' browsers, by default the
+    policy of LinkedIn
+    - retry: whether a result is incomplete and its job should run again.
+    The result of the last attempt is yielded whatever it is.
+
+    Returns
+    ---
+    Tuples of the job, its result and the spans recorded for it
+    """
+    workers = worker_count(workers, len(jobs))
+    ensure_login_state(mode=mode)
+
+    # paces whole jobs, the workers pace their own requests
+    controllers = Politeness()
+    queued = deque(jobs)
+    attempts = Counter()
+    running = {}
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_start_worker,
+        initargs=(mode,),
+    ) as executor:
+        while queued or running:
+            waits = []
+            for _ in range(len(queued)):
+                job = queued.popleft()
+                controller = controllers.for_url(job["url_content"][0])
+                if seconds := controller.try_acquire():
+                    queued.append(job)
+                    waits.append(seconds)
+                    continue
+                future = executor.submit(_run_job, func, job)
+                running[future] = (job, controller)
+
+            timeout = min(waits) if waits else None
+            if not running:
+                time.sleep(timeout)
+                continue
+            done, _ = wait(running, timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                job, controller = running.pop(future)
+                try:
+                    result, spans = future.result()
+                except BlockedError as e:
+                    controller.release(
+                        blocked=e.kind, retry_after=e.retry_after
+                    )
+                    attempts[job["run_id"]] += 1
+                    if attempts[job["run_id"]] < max_block_attempts:
+                        logger.warning(f"{e}, requeueing")
+                        queued.append(job)
+                    else:
+                        logger.error(f"{e}, giving up")
+                    continue
+                except Exception as e:
+                    controller.release(ok=False)
+                    logger.exception(f"error running {job}: {e}")
+                    continue
+                if retry is not None and retry(result):
+                    controller.release(ok=False)
+                    attempts[job["run_id"]] += 1
+                    if attempts[job["run_id"]] < max_block_attempts:
+                        logger.warning(
+                            f"{job['url_content'][0]} is incomplete, "
+                            "requeueing"
+                        )
+                        queued.append(job)
+                        continue
+                else:
+                    controller.release()
+                yield job, result, spans
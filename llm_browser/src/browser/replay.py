@@ -0,0 +1,229 @@
+"""Records the actions of successful browsing agent runs and replays them
+with Playwright so that later runs can skip the agent loop"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from playwright.async_api import BrowserContext
+from pymongo import ReturnDocument
+
+from llm_browser.src.browser.timeouts import timeouts
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.llm.query import parse_roles, query_llm
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+replay_browse = bool(int(os.environ.get("REPLAY_BROWSE", 1)))
+step_timeout = int(os.environ.get("REPLAY_STEP_TIMEOUT", 10000))
+max_page_chars = 60000
+
+COLLECTION = "replays"
+
+# agent actions that only read the page and need no replaying
+PASSIVE_ACTIONS = {"extract_content", "done"}
+
+
+def _to_step(name: str, params: dict, element) -> Optional[dict]:
+    """Converts an agent action to a replayable step, None if unsupported"""
+    xpath = getattr(element, "xpath", None)
+
+    if name in ("go_to_url", "open_tab"):
+        return {"action": "goto", "url": params["url"]}
+    if name == "click_element" and xpath:
+        return {"action": "click", "xpath": xpath}
+    if name == "input_text" and xpath:
+        return {"action": "fill", "xpath": xpath, "text": params["text"]}
+    if name in ("scroll_down", "scroll_up"):
+        amount = params.get("amount") or 1000
+        sign = 1 if name == "scroll_down" else -1
+        return {"action": "scroll", "amount": sign * amount}
+    if name == "send_keys":
+        return {"action": "press", "keys": params["keys"]}
+    if name == "go_back":
+        return {"action": "back"}
+    if name == "wait":
+        return {"action": "wait", "seconds": params.get("seconds", 3)}
+    return None
+
+
+def steps_from_history(agent_history) -> Optional[list[dict]]:
+    """Extracts the steps of the actions that succeeded in an agent run
+
+    Returns
+    ---
+    The steps or None if the run used an action that cannot be replayed
+    """
+    steps = []
+    for item in agent_history.history:
+        if item.model_output is None:
+            continue
+
+        elements = item.state.interacted_element or []
+        for i, (action, result) in enumerate(
+            zip(item.model_output.action, item.result)
+        ):
+            if result.error:
+                continue
+
+            for name, params in action.model_dump(exclude_none=True).items():
+                if name in PASSIVE_ACTIONS:
+                    continue
+                element = elements[i] if i < len(elements) else None
+                step = _to_step(name, params or {}, element)
+                if step is None:
+                    logger.info(f"action {name} cannot be replayed")
+                    return None
+                steps.append(step)
+    return steps
+
+
+def record_steps(url: str, agent_history) -> None:
+    """Saves the steps of a successful agent run on a url"""
+    steps = steps_from_history(agent_history)
+    if not steps:
+        return
+
+    client = get_mongodb_client()
+    with client:
+        coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+        coll.update_one(
+            {"url": url},
+            {
+                "$set": {
+                    "steps": steps,
+                    "recorded_at": datetime.now(tz=timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+    logger.info(f"recorded {len(steps)} steps for {url}")
+
+
+def load_steps(url: str) -> Optional[list[dict]]:
+    """Returns the recorded steps of a url if any"""
+    client = get_mongodb_client()
+    with client:
+        coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+        doc = coll.find_one({"url": url})
+    return doc["steps"] if doc and doc.get("steps") else None
+
+
+def _record_outcome(url: str, success: bool) -> None:
+    field = "successes" if success else "failures"
+    client = get_mongodb_client()
+    with client:
+        coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+        doc = coll.find_one_and_update(
+            {"url": url},
+            {"$inc": {field: 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    successes = doc.get("successes", 0)
+    total = successes + doc.get("failures", 0)
+    logger.info(
+        f"replay {'succeeded' if success else 'failed'} for {url} "
+        f"({successes}/{total} replays succeeded)"
+    )
+
+
+async def _run_step(page, step: dict) -> None:
+    action = step["action"]
+    if action == "goto":
+        await page.goto(step["url"], wait_until="domcontentloaded")
+    elif action == "click":
+        locator = page.locator(f"xpath={step['xpath']}")
+        with timeouts.measure(page.url, "replay", step_timeout) as timeout:
+            await locator.click(timeout=timeout)
+        await page.wait_for_load_state("domcontentloaded")
+    elif action == "fill":
+        locator = page.locator(f"xpath={step['xpath']}")
+        with timeouts.measure(page.url, "replay", step_timeout) as timeout:
+            await locator.fill(step["text"], timeout=timeout)
+    elif action == "scroll":
+        await page.mouse.wheel(0, step["amount"])
+    elif action == "press":
+        await page.keyboard.press(step["keys"])
+    elif action == "back":
+        await page.go_back(wait_until="domcontentloaded")
+    elif action == "wait":
+        await asyncio.sleep(step["seconds"])
+    else:
+        raise ValueError(f"unknown step: {step}")
+
+
+async def replay(
+    url: str,
+    steps: list[dict],
+    context: BrowserContext,
+    prompt: str,
+    model,
+) -> Optional[list[dict]]:
+    """Replays the recorded steps of a url and extracts the roles from the
+    final page with a single LLM call
+
+    Args
+    ---
+    - url: the url being browsed
+    - steps: the steps recorded for the url
+    - context: the browser context to replay in
+    - prompt: the browsing prompt, which describes the output expected
+    - model: the LangChain model extracting the roles
+
+    Returns
+    ---
+    The extracted roles, or None if a step failed and the agent must run
+    """
+    page = await context.new_page()
+    try:
+        with tracer.span("replay", url=url, steps=len(steps)):
+            if steps[0]["action"] != "goto":
+                await page.goto(url, wait_until="domcontentloaded")
+            for step in steps:
+                await _run_step(page, step)
+
+            # the LLM calls are blocking, they run outside of the loop
+            text = await page.inner_text("body")
+            response = await asyncio.to_thread(
+                query_llm,
+                data={"url": page.url, "content": text[:max_page_chars]},
+                prompt=prompt,
+                model=model,
+            )
+            roles = await asyncio.to_thread(parse_roles, response, model=model)
+            if not roles:
+                raise ValueError("no roles were extracted")
+    except Exception as e:
+        logger.warning(f"replay of {url} failed, falling back to agent: {e}")
+        await asyncio.to_thread(_record_outcome, url, success=False)
+        return None
+    finally:
+        await page.close()
+
+    await asyncio.to_thread(_record_outcome, url, success=True)
+    return roles
+
+
+def replay_stats() -> dict:
+    """Summarises how often replays succeeded across all urls, logged at the
+    end of each run"""
+    client = get_mongodb_client()
+    with client:
+        coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+        docs = list(coll.find({}, {"successes": 1, "failures": 1}))
+
+    successes = sum(d.get("successes", 0) for d in docs)
+    failures = sum(d.get("failures", 0) for d in docs)
+    total = successes + failures
+    return {
+        "urls": len(docs),
+        "successes": successes,
+        "failures": failures,
+        "success_rate": successes / total if total else 0.0,
+    }
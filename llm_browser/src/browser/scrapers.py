@@ -1,18 +1,50 @@
-"""Specific scraping logic"""
+"""Specific scraping logic. The scrapers are async; their synchronous
+versions run them on the scraping loop of `engine`."""
 
+import asyncio
+import functools
+import hashlib
 import logging
 import os
-import time
+import re
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+from urllib.parse import urlparse
 
 import requests
 from dotenv import load_dotenv
-from playwright.async_api import BrowserContext, Error, Page
-from playwright.sync_api import BrowserContext as SBrowserContext
-from playwright.sync_api import Error as SError
-from playwright.sync_api import Page as SPage
+from playwright.async_api import BrowserContext, Error, Page, async_playwright
 from tqdm import tqdm
 
-from llm_browser.src.browser.core import setup_browser_instance
+from llm_browser.src.browser import selectors
+from llm_browser.src.browser.display import (
+    close_browser,
+    launch_browser,
+    new_context,
+)
+from llm_browser.src.browser.engine import loop_runner
+from llm_browser.src.browser.fetch import (
+    NeedsBrowser,
+    fetch_linkedin_public,
+    http_first,
+)
+from llm_browser.src.browser.lifecycle import ManagedContext
+from llm_browser.src.browser.perf import (
+    capture_perf,
+    finish_capture,
+    start_capture,
+)
+from llm_browser.src.browser.politeness import (
+    THROTTLED,
+    BlockedError,
+    CaptchaError,
+    request_slot,
+    retry_after,
+)
+from llm_browser.src.browser.snapshots import save_snapshot, save_snapshots
+from llm_browser.src.browser.timeouts import timeouts
+from llm_browser.src.configs.config import linkedin_state
+from llm_browser.src.tracing import tracer
 from llm_browser.src.utils import set_logging
 
 load_dotenv()
@@ -24,6 +56,29 @@ LINKEDIN_USERNAME = os.environ.get("LINKEDIN_USERNAME")
 LINKEDIN_PASSWORD = os.environ.get("LINKEDIN_PASSWORD")
 
 
+async def close_page(page: Page) -> None:
+    """Closes a processed page so that its renderer memory is released"""
+    try:
+        await page.close()
+    except Error as e:
+        logger.warning(f"error closing {page.url}: {e}")
+
+
+async def collect(roles: AsyncIterator[dict], timeout: float = None):
+    """Collects the roles yielded by a scraper into a list
+
+    Args
+    ---
+    - roles: the async generator of a scraper
+    - timeout: seconds after which the scraper is cancelled
+    """
+
+    async def drain() -> list[dict]:
+        return [role async for role in roles]
+
+    return await asyncio.wait_for(drain(), timeout)
+
+
 async def check_captcha(page: Page):
     """Checks if a page as a captcha challenge"""
 
@@ -42,97 +97,239 @@ async def check_captcha(page: Page):
     return has_captcha
 
 
-async def fetch_google(url: str, context: BrowserContext, limit: int = None):
-    """Download and process content from a URL
+async def navigate(page: Page, url: str, **kwargs) -> None:
+    """Opens a url at the pace of its domain. A 429 raises a `BlockedError`
+    and a captcha a `CaptchaError`, so that the task is requeued instead of
+    waiting on the challenge."""
+    async with request_slot(url):
+        with (
+            tracer.span("navigate", url=url),
+            timeouts.measure(url, "navigate") as timeout,
+        ):
+            response = await page.goto(url, timeout=timeout, **kwargs)
+            if response is not None and response.status == 429:
+                headers = await response.all_headers()
+                raise BlockedError(url, THROTTLED, retry_after(headers))
+            if await check_captcha(page):
+                raise CaptchaError(url)
+
+
+async def iter_google(
+    url: str,
+    context: BrowserContext,
+    limit: int = None,
+    capture_perf: bool = capture_perf,
+    snapshot: bool = save_snapshots,
+) -> AsyncIterator[dict]:
+    """Yields the roles of a Google jobs search as each one is extracted, so
+    that callers can process them before the search is done and keep those
+    yielded before an error
 
     Args
     ---
-    prompt_content: a record containing the url, title, query, etc.
-    headless: boolean indicating whether to use a headless browser
+    - url: the search url
+    - context: the browser context to open the search in
+    - limit: maximum number of roles to extract
+    - capture_perf: whether to record the performance of the page
+    - snapshot: whether to archive the html of the listing and each job
     """
 
     page = await context.new_page()
-    await page.goto(url)
+    counters = None
+    try:
+        if capture_perf:
+            counters = await start_capture(page)
+        await navigate(page, url)
+        with timeouts.measure(url, "body") as timeout:
+            await page.wait_for_selector("body", timeout=timeout)
+
+        with tracer.span("extract.cards", url=url):
+            # scroll to load all jobs
+            max_scrolls = 20
+
+            for _ in range(max_scrolls):
+                await page.mouse.wheel(0, 10000)
+                await asyncio.sleep(2)
+                end_marker = page.get_by_text("No more jobs match your exact")
+                if await end_marker.is_visible():
+                    logger.info("Reached end of page.")
+                    break
+
+            if snapshot:
+                save_snapshot(await page.content(), url, kind="listing")
+
+            links = await page.query_selector_all(
+                selector=selectors.GOOGLE_CARD
+            )
+            entities_element = await page.query_selector_all(
+                selectors.GOOGLE_ENTITY
+            )
+            entities = []
+            for e in entities_element:
+                entities.append(await e.text_content())
+
+            if len(links) == 0:
+                logger.warning("there was an issue extracting links")
+            tracer.set_attributes(count=len(links))
+
+        limit = limit if limit is not None else len(links)
+
+        for i, (link, entity) in enumerate(zip(links[:limit], entities)):
+            role = None
+            with tracer.span("extract.card", url=url, index=i):
+                await link.click()
+                await page.wait_for_load_state()
+
+                try:
+                    job_title = await link.text_content()
+                    full_description = page.get_by_role(
+                        role="button", name="Show full description"
+                    )
+                    with timeouts.measure(url, "description", 5000) as ms:
+                        await full_description.click(timeout=ms)
+                    await page.wait_for_load_state()
+
+                    if snapshot:
+                        html = await page.content()
+                        save_snapshot(html, url, kind="detail", index=i)
+
+                    descriptions = await page.query_selector_all(
+                        selectors.GOOGLE_DESCRIPTION
+                    )
+                    current_desc = []
+                    for jd in descriptions:
+                        jd_text = await jd.text_content()
+                        if jd_text != "Report this listing":
+                            current_desc.append(jd_text)
+
+                    # the first card's description is shown before any card
+                    # is opened
+                    position = 0 if i == 0 else 1
+                    role = {
+                        "title": job_title.strip(),
+                        "company": entity.strip(),
+                        "description": current_desc[position].strip(),
+                    }
 
-    # check for captcha challenge
-    has_captcha = await check_captcha(page)
-    if has_captcha:
-        await page.pause()
+                except Exception as e:
+                    logger.exception(f"error on '{url}': {e}")
 
-    await page.wait_for_selector("body")
+            if role is not None:
+                logger.info(f"successfully retrieved '{job_title}' content")
+                yield role
+    finally:
+        if counters is not None:
+            await finish_capture(page, url, counters)
+        await close_page(page)
 
-    # scroll to load all jobs
-    max_scrolls = 20
 
-    for _ in range(max_scrolls):
-        await page.mouse.wheel(0, 10000)
-        time.sleep(2)
-        end_marker = page.get_by_text("No more jobs match your exact")
-        if await end_marker.is_visible():
-            logger.info("Reached end of page.")
-            break
+async def fetch_google(
+    url: str,
+    context: BrowserContext,
+    limit: int = None,
+    capture_perf: bool = capture_perf,
+    snapshot: bool = save_snapshots,
+    timeout: float = None,
+) -> list[dict]:
+    """Download and process content from a URL. See `iter_google`."""
+    return await collect(
+        iter_google(
+            url,
+            context,
+            limit=limit,
+            capture_perf=capture_perf,
+            snapshot=snapshot,
+        ),
+        timeout=timeout,
+    )
 
-    links = await page.query_selector_all(selector="div.tNxQIb.PUpOsf")
-    entities_element = await page.query_selector_all("div.wHYlTd.MKCbgd.a3jPc")
-    entities = []
-    for e in entities_element:
-        entities.append(await e.text_content())
 
-    if len(links) == 0:
-        logger.warning("there was an issue extracting links")
+# paths of links to jobs on careers pages and job boards
+JOB_LINK = re.compile(r"job|career|position|opening|vacanc|posting", re.I)
 
-    result = []
+# the links of a page outside its navigation, header, footer and sidebars
+LISTING_LINKS = """els => els
+    .filter(e => !e.closest('nav, header, footer, aside, [role=navigation]'))
+    .map(e => e.href)"""
 
-    limit = limit if limit is not None else len(links)
 
-    counter = 0
-    for i, (link, entity) in enumerate(zip(links, entities)):
-        await link.click()
-        await page.wait_for_load_state()
+def listing_keys(hrefs: list[str], url: str) -> list[str]:
+    """Keeps the links of a listing that point to its jobs. Query strings and
+    fragments are dropped so that tracking parameters do not change the
+    fingerprint, and links back to the page itself are ignored.
 
-        counter += 1
-        if counter > limit:
-            logger.warning(f"Exceeded {limit=}")
-            break
+    Args
+    ---
+    - hrefs: the absolute links of the page, in order
+    - url: the listing url
 
-        try:
-            job_title = await link.text_content()
-            full_description = page.get_by_role(
-                role="button", name="Show full description"
-            )
-            await full_description.click(timeout=5000)
-            await page.wait_for_load_state()
-
-            descriptions = await page.query_selector_all("div.NgUYpe")
-            current_desc = []
-            for jd in descriptions:
-                jd_text = await jd.text_content()
-                if jd_text != "Report this listing":
-                    current_desc.append(jd_text)
-
-            if i == 0:
-                result.append(
-                    {
-                        "title": job_title.strip(),
-                        "company": entity.strip(),
-                        "description": current_desc[0].strip(),
-                    }
-                )
-            else:
-                result.append(
-                    {
-                        "title": job_title.strip(),
-                        "company": entity.strip(),
-                        "description": current_desc[1].strip(),
-                    }
-                )
+    Returns
+    ---
+    The distinct links to jobs, in order
+    """
+    page = urlparse(url)
+    keys = []
+    for href in hrefs:
+        link = urlparse(href or "")
+        if link.scheme not in ("http", "https"):
+            continue
+        if link.path.rstrip("/") == page.path.rstrip("/"):
+            continue
+        key = f"{link.netloc.lower()}{link.path.rstrip('/')}"
+        if JOB_LINK.search(link.path) and key not in keys:
+            keys.append(key)
+    return keys
+
+
+async def listing_fingerprint(page: Page, url: str) -> Optional[str]:
+    """Computes a cheap fingerprint of a listing page from the ordered ids or
+    titles of its jobs, without opening any job
 
-        except Exception as e:
-            logger.exception(f"error on '{url}': {e}")
+    Args
+    ---
+    - page: the page to load the listing in
+    - url: the listing url
 
-        logger.info(f"successfully retrieved '{job_title}' content")
+    Returns
+    ---
+    A hash of the listing, or None if the listing could not be read
+    """
+    with tracer.span("fingerprint", url=url):
+        async with request_slot(url):
+            await page.goto(url, wait_until="domcontentloaded")
+
+        if url.startswith("https://www.linkedin"):
+            selector = "li[data-occludable-job-id]"
+            attribute = "data-occludable-job-id"
+        elif url.startswith("https://www.google"):
+            selector = selectors.GOOGLE_CARD
+            attribute = None
+        else:
+            selector = "a[href]"
+            attribute = "href"
 
-    return result
+        try:
+            with timeouts.measure(url, "listing", 15000) as timeout:
+                await page.wait_for_selector(selector, timeout=timeout)
+        except Error:
+            logger.warning(f"could not fingerprint {url}")
+            return None
+
+        if attribute == "href":
+            hrefs = await page.eval_on_selector_all(selector, LISTING_LINKS)
+            keys = listing_keys(hrefs, url)
+            if not keys:
+                logger.warning(f"no job links to fingerprint {url}")
+                return None
+        else:
+            elements = await page.query_selector_all(selector)
+            if attribute is None:
+                keys = [await e.text_content() for e in elements]
+            else:
+                keys = [await e.get_attribute(attribute) for e in elements]
+
+    digest = hashlib.sha1("\n".join(k or "" for k in keys).encode())
+    return digest.hexdigest()
 
 
 def query_gemini(data: dict, prompt: str, model):
@@ -180,356 +377,495 @@ def query_gemini(data: dict, prompt: str, model):
     return result
 
 
-def fetch_linkedin_logged_out(url: str, headless: bool = False):
-    """Scrape LinkedIn content"""
-
-    browser, p = setup_browser_instance()
-    browser = p.chromium.launch(headless=headless)
-    page = browser.new_page()
-    page.goto(url, wait_until="domcontentloaded")
-
-    # handle page redirects
-    if page.url != url:
-        browser.close()
-        p.stop()
-        browser, p = setup_browser_instance()
-        page = browser.new_page()
-        page.goto(url, wait_until="domcontentloaded")
+async def fetch_linkedin_logged_out_async(
+    url: str, mode: str = None, http: bool = http_first
+):
+    """Scrape LinkedIn content. The public pages are fetched over HTTP first,
+    and with a browser when they need JavaScript or show a challenge.
 
-    page.get_by_role("button", name="Dismiss").click()
-    page.wait_for_selector("ul.jobs-search__results-list")
+    Args
+    ---
+    url: the job search url
+    mode: the display mode of the browser, by default the policy of the url
+    http: whether to try fetching the pages over HTTP first
+    """
+    if http:
+        try:
+            return await fetch_linkedin_public(url)
+        except NeedsBrowser as e:
+            logger.info(f"falling back to a browser: {e}")
+
+    return await _fetch_linkedin_logged_out_browser(url, mode)
+
+
+async def _fetch_linkedin_logged_out_browser(url: str, mode: str = None):
+    async with async_playwright() as p:
+        browser = await launch_browser(p, url, mode=mode)
+        context = await new_context(browser)
+        page = await context.new_page()
+        await navigate(page, url, wait_until="domcontentloaded")
+
+        # handle page redirects
+        if page.url != url:
+            await page.close()
+            page = await context.new_page()
+            await navigate(page, url, wait_until="domcontentloaded")
+
+        await page.get_by_role("button", name="Dismiss").click()
+        with timeouts.measure(url, "listing") as timeout:
+            await page.wait_for_selector(
+                selectors.LINKEDIN_PUBLIC_LIST, timeout=timeout
+            )
 
-    # scroll to load all jobs
-    max_scrolls = 20
+        # scroll to load all jobs
+        max_scrolls = 20
 
-    for _ in range(max_scrolls):
-        page.mouse.wheel(0, 10000)
-        time.sleep(2)
+        for _ in range(max_scrolls):
+            await page.mouse.wheel(0, 10000)
+            await asyncio.sleep(2)
 
-        see_more = page.get_by_role("button", name="See more jobs")
-        if see_more.is_visible():
-            see_more.click()
-            time.sleep(2)
+            see_more = page.get_by_role("button", name="See more jobs")
+            if await see_more.is_visible():
+                await see_more.click()
+                await asyncio.sleep(2)
 
-        end_marker = page.locator(
-            'div.see-more-jobs__viewed-all:has-text("You\'ve viewed all jobs for this search")'
-        )
+            end_marker = page.locator(
+                'div.see-more-jobs__viewed-all:has-text("You\'ve viewed all jobs for this search")'
+            )
 
-        if end_marker.is_visible():
-            logger.info("Reached end of job listings.")
-            break
+            if await end_marker.is_visible():
+                logger.info("Reached end of job listings.")
+                break
 
-    # loaded jobs
-    cards = page.locator("ul.jobs-search__results-list li")
-    count = cards.count()
-    logger.info(f"Total jobs collected: {count}")
+        # loaded jobs
+        cards = page.locator(selectors.LINKEDIN_PUBLIC_LIST)
+        count = await cards.count()
+        logger.info(f"Total jobs collected: {count}")
 
-    results = []
+        results = []
 
-    for i in tqdm(range(count)):
-        card = cards.nth(i)
-        card.click()
+        for i in tqdm(range(count)):
+            card = cards.nth(i)
+            await card.click()
 
-        try:
-            page.get_by_role("button", name="Apply").wait_for(timeout=10000)
-            show_more = page.locator('button:has-text("Show more")')
-            if show_more.is_visible():
-                show_more.click()
-                # page.wait_for_timeout(1000)
-
-            job_description = (
-                page.locator("div.description__text").text_content().strip()
+            try:
+                apply = page.get_by_role("button", name="Apply")
+                with timeouts.measure(url, "apply", 10000) as timeout:
+                    await apply.wait_for(timeout=timeout)
+                show_more = page.locator('button:has-text("Show more")')
+                if await show_more.is_visible():
+                    await show_more.click()
+
+                job_description = await page.locator(
+                    selectors.LINKEDIN_PUBLIC_DESCRIPTION
+                ).text_content()
+                job_description = job_description.strip()
+
+            except Exception:
+                job_description = ""
+
+            # extract details
+            title = await card.locator(
+                selectors.LINKEDIN_PUBLIC_TITLE
+            ).text_content()
+            company = await card.locator(
+                selectors.LINKEDIN_PUBLIC_COMPANY
+            ).text_content()
+            location = await card.locator(
+                selectors.LINKEDIN_PUBLIC_LOCATION
+            ).text_content()
+
+            results.append(
+                {
+                    "title": title.strip(),
+                    "company": company.strip(),
+                    "location": location.strip(),
+                    "description": job_description,
+                }
             )
 
-        except Exception as e:
-            job_description = ""
-
-        # extract details
-        title = (
-            card.locator("h3.base-search-card__title").text_content().strip()
-        )
-        company = (
-            card.locator("h4.base-search-card__subtitle")
-            .text_content()
-            .strip()
-        )
-        location = (
-            card.locator("span.job-search-card__location")
-            .text_content()
-            .strip()
-        )
-        # url = card.locator("a.base-card__full-link").get_attribute("href")
-
-        results.append(
-            {
-                "title": title,
-                "company": company,
-                "location": location,
-                "description": job_description,
-            }
-        )
-
-    browser.close()
-    p.stop()
+        await close_browser(browser)
     return results
 
 
-def get_job_cards(page: SPage, limit: int = None):
-    """
-    Extract job details from search results.
-    """
-    res = []
+def fetch_linkedin_logged_out(
+    url: str, mode: str = None, timeout: float = None
+):
+    """Synchronous version of `fetch_linkedin_logged_out_async`"""
+    return loop_runner.run(fetch_linkedin_logged_out_async(url, mode), timeout)
 
-    job_cards_locator = "div.scaffold-layout__list > div > ul > li"
-    page.wait_for_selector(job_cards_locator)
 
-    # scroll to load all jobs
-    max_scrolls = 5
+async def iter_job_cards_async(
+    page: Page,
+    limit: int = None,
+    url: str = None,
+    page_num: int = 1,
+    snapshot: bool = save_snapshots,
+) -> AsyncIterator[dict]:
+    """
+    Yields job details from search results as each job is extracted.
 
-    for _ in range(max_scrolls):
-        page.mouse.wheel(0, 10000)
-        time.sleep(2)
-        end_marker = page.get_by_role("button", name="View next page")
-        if end_marker.is_visible():
-            logger.info("Reached end of page.")
-            break
+    Args
+    ---
+    - page: the page showing the search results
+    - limit: maximum number of jobs to extract
+    - url: the url of the task, used to key snapshots
+    - page_num: the results page, used to key snapshots
+    - snapshot: whether to archive the html of the listing and each job
+    """
+    url = url or page.url
+
+    with tracer.span("extract.cards", url=url, page=page_num):
+        job_cards_locator = selectors.LINKEDIN_CARDS
+        with timeouts.measure(url, "listing") as timeout:
+            await page.wait_for_selector(job_cards_locator, timeout=timeout)
+
+        # scroll to load all jobs
+        max_scrolls = 5
+
+        for _ in range(max_scrolls):
+            await page.mouse.wheel(0, 10000)
+            await asyncio.sleep(2)
+            end_marker = page.get_by_role("button", name="View next page")
+            if await end_marker.is_visible():
+                logger.info("Reached end of page.")
+                break
 
-    job_cards = page.locator(job_cards_locator)
-    jobs_count = job_cards.count()
-    logger.info(f"found {jobs_count} jobs")
+        job_cards = page.locator(job_cards_locator)
+        jobs_count = await job_cards.count()
+        logger.info(f"found {jobs_count} jobs")
+        tracer.set_attributes(count=jobs_count)
+        if snapshot:
+            html = await page.content()
+            save_snapshot(html, url, kind="listing", page_num=page_num)
 
     limit = limit if limit is not None else jobs_count
 
     for i in tqdm(range(limit)):
-        job_details = ".jobs-box__html-content#job-details"
-        card = job_cards.nth(i)
-        card.click()
-        page.wait_for_selector(job_details)
-        job_title = card.locator(".job-card-container__link strong")
-        company_name = card.locator(".artdeco-entity-lockup__subtitle span")
-        location_name = card.locator(".artdeco-entity-lockup__caption li span")
-        title = job_title.inner_text() if job_title else "N/A"
-        try:
-            company = company_name.inner_text() if company_name else "N/A"
-        except SError:
-            company = company_name.nth(0).inner_text()
-        except Exception as e:
-            logger.exception(e)
-        location = location_name.inner_text() if location_name else "N/A"
-        job_description_element = page.query_selector(job_details)
-        job_description = job_description_element.inner_text()
+        with tracer.span("extract.card", url=url, page=page_num, index=i):
+            job_details = selectors.LINKEDIN_DETAILS
+            card = job_cards.nth(i)
+            await card.click()
+            with timeouts.measure(url, "details") as timeout:
+                await page.wait_for_selector(job_details, timeout=timeout)
+            if snapshot:
+                html = await page.content()
+                save_snapshot(
+                    html, url, kind="detail", page_num=page_num, index=i
+                )
+            job_title = card.locator(selectors.LINKEDIN_TITLE)
+            company_name = card.locator(selectors.LINKEDIN_COMPANY)
+            location_name = card.locator(selectors.LINKEDIN_LOCATION)
+            title = await job_title.inner_text() if job_title else "N/A"
+            try:
+                company = (
+                    await company_name.inner_text() if company_name else "N/A"
+                )
+            except Error:
+                company = await company_name.nth(0).inner_text()
+            except Exception as e:
+                logger.exception(e)
+            location = (
+                await location_name.inner_text() if location_name else "N/A"
+            )
+            job_description_element = await page.query_selector(job_details)
+            job_description = await job_description_element.inner_text()
 
-        try:
-            assert len(job_description) > len("About us") * 5
-        except AssertionError:
-            time.sleep(2)
-            job_description = job_description_element.inner_text()
+            try:
+                assert len(job_description) > len("About us") * 5
+            except AssertionError:
+                await asyncio.sleep(2)
+                job_description = await job_description_element.inner_text()
 
-        res.append(
-            {
-                "title": title.strip(),
-                "company": company.strip(),
-                "location": location.strip(),
-                "description": job_description.strip(),
-            }
-        )
-    return res
+        yield {
+            "title": title.strip(),
+            "company": company.strip(),
+            "location": location.strip(),
+            "description": job_description.strip(),
+        }
 
 
-def fetch_linkedin(
-    url: str,
-    context: SBrowserContext,
-    home_page: str = "https://www.linkedin.com/",
-    login_success: str = "https://www.linkedin.com/feed/",
-    max_pages: int = 10,
+async def get_job_cards_async(
+    page: Page,
     limit: int = None,
-):
+    url: str = None,
+    page_num: int = 1,
+    snapshot: bool = save_snapshots,
+) -> list[dict]:
     """
-    Fetches LinkedIn job listings, including pagination, when logged in.
+    Extract job details from search results. See `iter_job_cards_async`.
+    """
+    return await collect(
+        iter_job_cards_async(page, limit, url, page_num, snapshot)
+    )
+
+
+async def login_linkedin_async(
+    page: Page,
+    home_page: str = "https://www.linkedin.com/",
+    login_success: str = "https://www.linkedin.com/feed/",
+) -> bool:
+    """Logs in to LinkedIn unless the session is already logged in
+
+    Returns
+    ---
+    Whether the page ended up logged in, on `login_success`
     """
-    results = []
-    page = context.new_page()
     logger.info(f"Navigating to {home_page=}")
-    page.goto(home_page, wait_until="domcontentloaded")
+    await navigate(page, home_page, wait_until="domcontentloaded")
     current_page = page.url
     if current_page == login_success:
         logger.info("Already logged in")
     else:
         try:
-            page.locator('[data-test-id="home-hero-sign-in-cta"]').click()
-            page.get_by_role("textbox", name="Email or phone").fill(
+            await page.locator(
+                '[data-test-id="home-hero-sign-in-cta"]'
+            ).click()
+            await page.get_by_role("textbox", name="Email or phone").fill(
                 LINKEDIN_USERNAME
             )
-            page.get_by_role("textbox", name="Password").fill(
+            await page.get_by_role("textbox", name="Password").fill(
                 LINKEDIN_PASSWORD
             )
-            page.get_by_role("button", name="Sign in", exact=True).click()
-            page.wait_for_url(login_success, wait_until="domcontentloaded")
+            await page.get_by_role(
+                "button", name="Sign in", exact=True
+            ).click()
+            await page.wait_for_url(
+                login_success, wait_until="domcontentloaded"
+            )
         except Exception:
-            page.goto(login_success, wait_until="domcontentloaded")
-
-    logger.info(f"Navigating to: {url=}")
-    page.goto(url, wait_until="domcontentloaded")
-
-    if limit is not None:
-        res = get_job_cards(page, limit)
-        return res
-
-    current_page_num = 1
-    while current_page_num <= max_pages:
-        logger.info(f"Processing page {current_page_num}...")
-        res = get_job_cards(page)
-        results.extend(res)
-        next_button = page.locator('button[aria-label="View next page"]')
-        if next_button.is_visible() and not next_button.is_disabled():
-            logger.info("Clicking 'Next' button to navigate to the next page.")
-            try:
-                next_button.click()
-                page.wait_for_load_state("domcontentloaded")
-                page.wait_for_selector(".job-card-container")
-                res = get_job_cards(page)
-                current_page_num += 1
-            except Exception as e:
-                logger.error(f"Error navigating to next page: {e}")
+            await navigate(page, login_success, wait_until="domcontentloaded")
+    return page.url.startswith(login_success)
+
+
+async def save_login_state_async(
+    context: BrowserContext, path: Path = linkedin_state
+):
+    """Saves the cookies and local storage of a logged in context so that
+    other contexts and processes can reuse the session"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    await context.storage_state(path=path)
+    logger.info(f"login state saved to {path}")
+
+
+async def iter_linkedin_async(
+    url: str,
+    context: BrowserContext,
+    home_page: str = "https://www.linkedin.com/",
+    login_success: str = "https://www.linkedin.com/feed/",
+    max_pages: int = 10,
+    limit: int = None,
+    capture_perf: bool = capture_perf,
+) -> AsyncIterator[dict]:
+    """
+    Yields LinkedIn job listings, including pagination, when logged in. Each
+    role is yielded as soon as it is extracted, so callers keep the roles
+    yielded before an error.
+    """
+    total = 0
+    page = await context.new_page()
+    counters = None
+    try:
+        if capture_perf:
+            counters = await start_capture(page)
+        await login_linkedin_async(
+            page, home_page=home_page, login_success=login_success
+        )
+
+        logger.info(f"Navigating to: {url=}")
+        await navigate(page, url, wait_until="domcontentloaded")
+
+        if limit is not None:
+            async for role in iter_job_cards_async(page, limit, url=url):
+                yield role
+            return
+
+        current_page_num = 1
+        while current_page_num <= max_pages:
+            logger.info(f"Processing page {current_page_num}...")
+            async for role in iter_job_cards_async(
+                page, url=url, page_num=current_page_num
+            ):
+                total += 1
+                yield role
+            next_button = page.locator('button[aria-label="View next page"]')
+            if (
+                await next_button.is_visible()
+                and not await next_button.is_disabled()
+            ):
+                logger.info(
+                    "Clicking 'Next' button to navigate to the next page."
+                )
+                try:
+                    async with request_slot(url):
+                        with tracer.span("navigate", url=url):
+                            await next_button.click()
+                            await page.wait_for_load_state("domcontentloaded")
+                            if await check_captcha(page):
+                                raise CaptchaError(url)
+                            with timeouts.measure(url, "listing") as timeout:
+                                await page.wait_for_selector(
+                                    ".job-card-container", timeout=timeout
+                                )
+                    current_page_num += 1
+                except BlockedError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error navigating to next page: {e}")
+                    break
+
+                # results pages can be reopened from their url, so the
+                # context is recycled here when it grew too large
+                if (
+                    isinstance(context, ManagedContext)
+                    and context.needs_recycle()
+                ):
+                    if counters is not None:
+                        await finish_capture(page, url, counters)
+                        counters = None
+                    page = await context.reopen(
+                        page,
+                        functools.partial(
+                            navigate, wait_until="domcontentloaded"
+                        ),
+                    )
+            else:
+                logger.info(
+                    "'Next' button not visible or disabled. End of pagination."
+                )
                 break
-        else:
+
             logger.info(
-                "'Next' button not visible or disabled. End of pagination."
+                f"Finished fetching jobs. Total jobs extracted: {total}"
             )
-            break
-
-        logger.info(
-            f"Finished fetching jobs. Total jobs extracted: {len(results)}"
-        )
-    logger.info(f"total jobs extracted: {len(results)}")
-    return results
+        logger.info(f"total jobs extracted: {total}")
+    finally:
+        if counters is not None:
+            await finish_capture(page, url, counters)
+        await close_page(page)
 
 
-async def get_job_cards_async(page: Page, limit: int = None):
+async def fetch_linkedin_async(
+    url: str,
+    context: BrowserContext,
+    home_page: str = "https://www.linkedin.com/",
+    login_success: str = "https://www.linkedin.com/feed/",
+    max_pages: int = 10,
+    limit: int = None,
+    capture_perf: bool = capture_perf,
+    timeout: float = None,
+) -> list[dict]:
     """
-    Extract job details from search results.
+    Fetches LinkedIn job listings, including pagination, when logged in. See
+    `iter_linkedin_async`.
     """
-    res = []
+    return await collect(
+        iter_linkedin_async(
+            url,
+            context,
+            home_page=home_page,
+            login_success=login_success,
+            max_pages=max_pages,
+            limit=limit,
+            capture_perf=capture_perf,
+        ),
+        timeout=timeout,
+    )
 
-    job_cards_locator = "div.scaffold-layout__list > div > ul > li"
-    await page.wait_for_selector(job_cards_locator)
 
-    # scroll to load all jobs
-    max_scrolls = 5
+# synchronous versions, the pages and contexts they are given must belong to
+# the scraping loop, e.g. be created by `engine.SyncBrowser`
 
-    for _ in range(max_scrolls):
-        await page.mouse.wheel(0, 10000)
-        time.sleep(2)
-        end_marker = page.get_by_role("button", name="View next page")
-        if await end_marker.is_visible():
-            logger.info("Reached end of page.")
-            break
 
-    job_cards = page.locator(job_cards_locator)
-    jobs_count = await job_cards.count()
-    logger.info(f"found {jobs_count} jobs")
+def iter_job_cards(
+    page: Page,
+    limit: int = None,
+    url: str = None,
+    page_num: int = 1,
+    snapshot: bool = save_snapshots,
+    timeout: float = None,
+) -> Iterator[dict]:
+    """Synchronous version of `iter_job_cards_async`"""
+    return loop_runner.iterate(
+        iter_job_cards_async(page, limit, url, page_num, snapshot), timeout
+    )
 
-    limit = limit if limit is not None else jobs_count
 
-    for i in tqdm(range(limit)):
-        job_details = ".jobs-box__html-content#job-details"
-        card = job_cards.nth(i)
-        await card.click()
-        await page.wait_for_selector(job_details)
-        job_title = card.locator(".job-card-container__link strong")
-        company_name = card.locator(".artdeco-entity-lockup__subtitle span")
-        location_name = card.locator(".artdeco-entity-lockup__caption li span")
-        title = await job_title.inner_text() if job_title else "N/A"
-        try:
-            company = (
-                await company_name.inner_text() if company_name else "N/A"
-            )
-        except Error:
-            company = await company_name.nth(0).inner_text()
-        except Exception as e:
-            logger.exception(e)
-        location = await location_name.inner_text() if location_name else "N/A"
-        job_description_element = await page.query_selector(job_details)
-        job_description = await job_description_element.inner_text()
+def get_job_cards(
+    page: Page,
+    limit: int = None,
+    url: str = None,
+    page_num: int = 1,
+    snapshot: bool = save_snapshots,
+    timeout: float = None,
+) -> list[dict]:
+    """Synchronous version of `get_job_cards_async`"""
+    return loop_runner.run(
+        get_job_cards_async(page, limit, url, page_num, snapshot), timeout
+    )
 
-        try:
-            assert len(job_description) > len("About us") * 5
-        except AssertionError:
-            time.sleep(2)
-            job_description = await job_description_element.inner_text()
 
-        res.append(
-            {
-                "title": title.strip(),
-                "company": company.strip(),
-                "location": location.strip(),
-                "description": job_description.strip(),
-            }
-        )
-    return res
+def login_linkedin(
+    page: Page,
+    home_page: str = "https://www.linkedin.com/",
+    login_success: str = "https://www.linkedin.com/feed/",
+) -> bool:
+    """Synchronous version of `login_linkedin_async`"""
+    return loop_runner.run(
+        login_linkedin_async(page, home_page, login_success)
+    )
 
 
-async def fetch_linkedin_async(
+def save_login_state(context: BrowserContext, path: Path = linkedin_state):
+    """Synchronous version of `save_login_state_async`"""
+    loop_runner.run(save_login_state_async(context, path))
+
+
+def iter_linkedin(
     url: str,
     context: BrowserContext,
     home_page: str = "https://www.linkedin.com/",
     login_success: str = "https://www.linkedin.com/feed/",
     max_pages: int = 10,
     limit: int = None,
-):
-    """
-    Fetches LinkedIn job listings, including pagination, when logged in.
-    """
-    results = []
-    page = await context.new_page()
-    logger.info(f"Navigating to {home_page=}")
-    await page.goto(home_page, wait_until="domcontentloaded")
-    current_page = page.url
-    if current_page == login_success:
-        logger.info("Already logged in")
-    else:
-        await page.locator('[data-test-id="home-hero-sign-in-cta"]').click()
-        await page.get_by_role("textbox", name="Email or phone").fill(
-            LINKEDIN_USERNAME
-        )
-        await page.get_by_role("textbox", name="Password").fill(
-            LINKEDIN_PASSWORD
-        )
-        await page.get_by_role("button", name="Sign in", exact=True).click()
-        await page.wait_for_url(login_success, wait_until="domcontentloaded")
-
-    logger.info(f"Navigating to: {url=}")
-    await page.goto(url, wait_until="domcontentloaded")
-
-    if limit is not None:
-        res = await get_job_cards_async(page, limit)
-        return res
-
-    current_page_num = 1
-    while current_page_num <= max_pages:
-        logger.info(f"Processing page {current_page_num}...")
-        res = await get_job_cards_async(page)
-        results.extend(res)
-        next_button = page.locator('button[aria-label="View next page"]')
-        if await next_button.is_visible() and not next_button.is_disabled():
-            logger.info("Clicking 'Next' button to navigate to the next page.")
-            try:
-                await next_button.click()
-                await page.wait_for_load_state("domcontentloaded")
-                await page.wait_for_selector(".job-card-container")
-                res = await get_job_cards_async(page)
-                current_page_num += 1
-            except Exception as e:
-                logger.error(f"Error navigating to next page: {e}")
-                break
-        else:
-            logger.info(
-                "'Next' button not visible or disabled. End of pagination."
-            )
-            break
+    capture_perf: bool = capture_perf,
+    timeout: float = None,
+) -> Iterator[dict]:
+    """Synchronous version of `iter_linkedin_async`"""
+    return loop_runner.iterate(
+        iter_linkedin_async(
+            url,
+            context,
+            home_page=home_page,
+            login_success=login_success,
+            max_pages=max_pages,
+            limit=limit,
+            capture_perf=capture_perf,
+        ),
+        timeout,
+    )
 
-        logger.info(
-            f"Finished fetching jobs. Total jobs extracted: {len(results)}"
-        )
-    logger.info(f"total jobs extracted: {len(results)}")
-    return results
+
+def fetch_linkedin(
+    url: str,
+    context: BrowserContext,
+    home_page: str = "https://www.linkedin.com/",
+    login_success: str = "https://www.linkedin.com/feed/",
+    max_pages: int = 10,
+    limit: int = None,
+    capture_perf: bool = capture_perf,
+    timeout: float = None,
+) -> list[dict]:
+    """Synchronous version of `fetch_linkedin_async`"""
+    return loop_runner.run(
+        fetch_linkedin_async(
+            url,
+            context,
+            home_page=home_page,
+            login_success=login_success,
+            max_pages=max_pages,
+            limit=limit,
+            capture_perf=capture_perf,
+        ),
+        timeout,
+    )
@@ -0,0 +1,23 @@
+"""CSS selectors of the scraped sites, shared by the live scrapers and the
+offline extractor"""
+
+# google jobs
+GOOGLE_CARD = "div.tNxQIb.PUpOsf"
+GOOGLE_ENTITY = "div.wHYlTd.MKCbgd.a3jPc"
+GOOGLE_DESCRIPTION = "div.NgUYpe"
+
+# linkedin jobs, logged in
+LINKEDIN_CARDS = "div.scaffold-layout__list > div > ul > li"
+LINKEDIN_TITLE = ".job-card-container__link strong"
+LINKEDIN_COMPANY = ".artdeco-entity-lockup__subtitle span"
+LINKEDIN_LOCATION = ".artdeco-entity-lockup__caption li span"
+LINKEDIN_DETAILS = ".jobs-box__html-content#job-details"
+
+# linkedin jobs, logged out. Cards of the public search page and of the guest
+# api's result pages
+LINKEDIN_PUBLIC_LIST = "ul.jobs-search__results-list li"
+LINKEDIN_PUBLIC_CARD = "[data-entity-urn*='jobPosting']"
+LINKEDIN_PUBLIC_TITLE = "h3.base-search-card__title"
+LINKEDIN_PUBLIC_COMPANY = "h4.base-search-card__subtitle"
+LINKEDIN_PUBLIC_LOCATION = "span.job-search-card__location"
+LINKEDIN_PUBLIC_DESCRIPTION = "div.description__text"
@@ -0,0 +1,186 @@
+"""Keeps a long-lived Chromium warm for the scrapers. The browser serves the
+Chrome DevTools Protocol on a local port, and runs set `BROWSER_CDP_URL` to
+attach to it instead of cold-starting their own. A supervisor restarts the
+browser when it stops answering its health checks."""
+
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import requests
+from playwright.sync_api import sync_playwright
+
+from llm_browser.src.browser.display import (
+    browser_mode,
+    launch_options,
+    resolve_mode,
+)
+from llm_browser.src.configs.config import browser_args, browser_profile
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+cdp_port = int(os.environ.get("BROWSER_CDP_PORT", 9222))
+health_interval = float(os.environ.get("BROWSER_HEALTH_INTERVAL", 10))
+
+
+def chromium_executable() -> str:
+    """The path of the Chromium installed by Playwright"""
+    with sync_playwright() as p:
+        return p.chromium.executable_path
+
+
+class BrowserSupervisor:
+    """Runs Chromium with remote debugging and restarts it when it exits or
+    fails `max_failures` health checks in a row. The profile directory keeps
+    the browser's disk cache across restarts.
+
+    Args
+    ---
+    - port: the remote debugging port, bound to localhost
+    - mode: `headless`, `xvfb` or `headed`
+    - args: the command line arguments of the browser
+    - profile_dir: the user data directory of the browser
+    - interval: seconds between health checks
+    - max_failures: failed health checks before a restart
+    """
+
+    def __init__(
+        self,
+        port: int = cdp_port,
+        mode: str = browser_mode,
+        args: list[str] = browser_args,
+        profile_dir: os.PathLike = browser_profile,
+        interval: float = health_interval,
+        max_failures: int = 3,
+    ):
+        self.port = port
+        self.mode = mode
+        self.args = args
+        self.profile_dir = profile_dir
+        self.interval = interval
+        self.max_failures = max_failures
+        self.process: subprocess.Popen = None
+        self.restarts = 0
+        self._stopped = threading.Event()
+
+    @property
+    def endpoint(self) -> str:
+        """The url given to `connect_over_cdp`"""
+        return f"http://127.0.0.1:{self.port}"
+
+    def command(self) -> tuple[list[str], dict]:
+        """Returns the command line and environment of the browser"""
+        options = launch_options(resolve_mode(self.mode), self.args)
+        command = [
+            chromium_executable(),
+            f"--remote-debugging-port={self.port}",
+            "--remote-debugging-address=127.0.0.1",
+            f"--user-data-dir={self.profile_dir}",
+            *options["args"],
+            "about:blank",
+        ]
+        return command, options.get("env")
+
+    def healthy(self, timeout: float = 2) -> bool:
+        """Whether the browser is running and answers on its endpoint"""
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            resp = requests.get(
+                f"{self.endpoint}/json/version", timeout=timeout
+            )
+            return resp.ok
+        except requests.RequestException:
+            return False
+
+    def start(self, timeout: float = 30) -> str:
+        """Starts the browser and waits until it is healthy
+
+        Returns
+        ---
+        The endpoint of the browser
+        """
+        os.makedirs(self.profile_dir, exist_ok=True)
+        command, env = self.command()
+        self.process = subprocess.Popen(
+            command,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + timeout
+        while not self.healthy():
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError(f"browser failed to start on {self.port}")
+            time.sleep(0.2)
+
+        logger.info(f"browser serving on {self.endpoint} in {self.mode} mode")
+        return self.endpoint
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+        self.restarts += 1
+
+    def watch(self) -> None:
+        """Checks the browser every `interval` seconds until `shutdown`"""
+        failures = 0
+        while not self._stopped.wait(self.interval):
+            if self.healthy():
+                failures = 0
+                continue
+
+            failures += 1
+            logger.warning(f"browser health check failed ({failures})")
+            exited = self.process is None or self.process.poll() is not None
+            if exited or failures >= self.max_failures:
+                try:
+                    self.restart()
+                    failures = 0
+                except RuntimeError as e:
+                    logger.error(e)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+
+    def serve(self) -> None:
+        """Starts the browser and supervises it until interrupted"""
+        self.start()
+        try:
+            self.watch()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        description="Serves a pre-warmed browser for BROWSER_CDP_URL"
+    )
+    parser.add_argument("--port", help="debugging port", type=int)
+    parser.add_argument("--mode", help="headless, xvfb or headed", type=str)
+    args = parser.parse_args()
+
+    supervisor = BrowserSupervisor(
+        port=args.port or cdp_port, mode=args.mode or browser_mode
+    )
+    supervisor.serve()
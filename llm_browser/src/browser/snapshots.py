@@ -0,0 +1,213 @@
+"""Archives compressed HTML snapshots of scraped pages and re-extracts roles
+from them offline, so that selector changes can be backfilled and compared
+without browsing again"""
+
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from llm_browser.src.browser import selectors
+from llm_browser.src.configs.config import snapshots_dir
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import set_logging, url_key
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+save_snapshots = bool(int(os.environ.get("SAVE_SNAPSHOTS", 0)))
+INDEX = "index.jsonl"
+
+
+def save_snapshot(
+    html: str,
+    url: str,
+    kind: str,
+    page_num: int = 1,
+    index: int = None,
+    run_id: str = None,
+    root: Path = snapshots_dir,
+) -> Path:
+    """Saves the gzipped html of a page under `<run_id>/<url key>/`
+
+    Args
+    ---
+    - html: the page content
+    - url: the url of the task the page belongs to
+    - kind: `listing` for search results, `detail` for an opened job
+    - page_num: the results page of the listing
+    - index: the position of the opened job in the listing
+    - run_id: the run, defaults to the current run of the tracer
+    - root: the archive directory
+    """
+    run_id = run_id or tracer.run_id or "adhoc"
+    name = f"{kind}-p{page_num}" + (f"-{index}" if index is not None else "")
+    fp = root / run_id / url_key(url) / f"{name}.html.gz"
+    fp.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(fp, mode="wb") as f:
+        f.write(gzip.compress(html.encode("utf-8"), compresslevel=6))
+
+    entry = {
+        "url": url,
+        "kind": kind,
+        "page": page_num,
+        "index": index,
+        "path": str(fp.relative_to(root / run_id)),
+        "captured_at": datetime.now(tz=timezone.utc).isoformat(),
+    }
+    with open(root / run_id / INDEX, mode="a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return fp
+
+
+def load_snapshot(fp: Path) -> str:
+    with gzip.open(fp, mode="rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def _text(soup: BeautifulSoup, selector: str) -> str:
+    element = soup.select_one(selector)
+    return element.get_text(" ", strip=True) if element else "N/A"
+
+
+def extract_google(listing: str, details: dict[int, str]) -> list[dict]:
+    """Extracts roles from the snapshots of a Google jobs search"""
+    soup = BeautifulSoup(listing, "lxml")
+    titles = [
+        e.get_text(strip=True) for e in soup.select(selectors.GOOGLE_CARD)
+    ]
+    entities = [
+        e.get_text(strip=True) for e in soup.select(selectors.GOOGLE_ENTITY)
+    ]
+
+    roles = []
+    for i, (title, entity) in enumerate(zip(titles, entities)):
+        if i not in details:
+            continue
+        detail = BeautifulSoup(details[i], "lxml")
+        descriptions = [
+            d.get_text(strip=True)
+            for d in detail.select(selectors.GOOGLE_DESCRIPTION)
+            if d.get_text(strip=True) != "Report this listing"
+        ]
+        # the first card's description is shown before any card is opened
+        position = 0 if i == 0 else 1
+        if len(descriptions) <= position:
+            continue
+        roles.append(
+            {
+                "title": title,
+                "company": entity,
+                "description": descriptions[position],
+            }
+        )
+    return roles
+
+
+def extract_linkedin(listing: str, details: dict[int, str]) -> list[dict]:
+    """Extracts roles from the snapshots of one LinkedIn results page"""
+    soup = BeautifulSoup(listing, "lxml")
+    roles = []
+    for i, card in enumerate(soup.select(selectors.LINKEDIN_CARDS)):
+        if i not in details:
+            continue
+        detail = BeautifulSoup(details[i], "lxml")
+        roles.append(
+            {
+                "title": _text(card, selectors.LINKEDIN_TITLE),
+                "company": _text(card, selectors.LINKEDIN_COMPANY),
+                "location": _text(card, selectors.LINKEDIN_LOCATION),
+                "description": _text(detail, selectors.LINKEDIN_DETAILS),
+            }
+        )
+    return roles
+
+
+def extract_url(url: str, run_dir: str, entries: list[dict]) -> list[dict]:
+    """Re-extracts the roles of one url from its snapshots"""
+    pages: dict[int, dict] = defaultdict(lambda: {"details": {}})
+    for entry in entries:
+        html = load_snapshot(Path(run_dir) / entry["path"])
+        if entry["kind"] == "listing":
+            pages[entry["page"]]["listing"] = html
+        else:
+            pages[entry["page"]]["details"][entry["index"]] = html
+
+    extract = (
+        extract_google
+        if url.startswith("https://www.google")
+        else extract_linkedin
+    )
+    roles = []
+    for page_num in sorted(pages):
+        page = pages[page_num]
+        if "listing" in page:
+            roles.extend(extract(page["listing"], page["details"]))
+    return roles
+
+
+def reextract(
+    run_id: str, workers: int = None, root: Path = snapshots_dir
+) -> dict[str, list[dict]]:
+    """Re-extracts the roles of every url archived for a run, spreading the
+    urls over a process pool
+
+    Args
+    ---
+    - run_id: the run whose snapshots are parsed
+    - workers: number of processes, defaults to the number of CPUs
+    - root: the archive directory
+
+    Returns
+    ---
+    The roles of each url
+    """
+    run_dir = root / run_id
+    entries = defaultdict(list)
+    with open(run_dir / INDEX) as f:
+        for line in f:
+            entry = json.loads(line)
+            entries[entry["url"]].append(entry)
+
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = {
+            executor.submit(extract_url, url, str(run_dir), items): url
+            for url, items in entries.items()
+        }
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                logger.exception(f"error extracting {url}: {e}")
+                continue
+            logger.info(f"extracted {len(results[url])} roles from {url}")
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Re-extracts roles from snapshots")
+    parser.add_argument("run_id", help="run to re-extract", type=str)
+    parser.add_argument("--workers", help="number of processes", type=int)
+    parser.add_argument("--out", help="path to save the roles", type=str)
+    args = parser.parse_args()
+
+    results = reextract(args.run_id, workers=args.workers)
+    fp = args.out or snapshots_dir / args.run_id / "reextracted.json"
+    with open(fp, mode="w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"roles saved to {Path(fp).resolve()}")
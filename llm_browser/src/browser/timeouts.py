@@ -0,0 +1,244 @@
+"""Sets the timeout of each browser wait from the latencies observed for its
+domain and action. Latencies are counted in log-spaced histograms that are
+kept in the database, so that every run and worker learns from the previous
+ones."""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from pymongo import UpdateOne
+
+from llm_browser.src.browser.politeness import domain_of
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+adaptive_timeouts = bool(int(os.environ.get("ADAPTIVE_TIMEOUTS", 1)))
+timeout_percentile = float(os.environ.get("TIMEOUT_PERCENTILE", 99))
+timeout_margin = float(os.environ.get("TIMEOUT_MARGIN", 1.5))
+timeout_min_ms = int(os.environ.get("TIMEOUT_MIN_MS", 1000))
+timeout_max_ms = int(os.environ.get("TIMEOUT_MAX_MS", 60000))
+timeout_min_samples = int(os.environ.get("TIMEOUT_MIN_SAMPLES", 20))
+
+COLLECTION = "latency"
+
+# upper bounds of the buckets in ms, 25% apart from 50ms to about 5 minutes
+BUCKETS = [round(50 * 1.25**i) for i in range(40)]
+
+# the Playwright default
+DEFAULT_TIMEOUT = 30000
+
+
+class Histogram:
+    """Counts latencies in the log-spaced `BUCKETS`. `timeouts` is how many
+    of them were waits that timed out."""
+
+    def __init__(self, counts: dict = None, timeouts: int = 0):
+        self.counts = Counter({int(k): v for k, v in (counts or {}).items()})
+        self.timeouts = timeouts
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, ms: float) -> int:
+        """Counts a latency and returns its bucket"""
+        bucket = min(bisect.bisect_left(BUCKETS, ms), len(BUCKETS) - 1)
+        self.counts[bucket] += 1
+        return bucket
+
+    def quantile(self, q: float) -> float:
+        """The upper bound of the bucket holding the q-th percentile (0-100)
+        of the latencies, in ms"""
+        if not self.counts:
+            return 0.0
+        target = self.total * q / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return BUCKETS[bucket]
+        return BUCKETS[max(self.counts)]
+
+
+class TimeoutController:
+    """Learns the latency of each (domain, action) and sets its timeout to a
+    high percentile plus a margin. Until an action has `min_samples`
+    latencies its default timeout is used.
+
+    Args
+    ---
+    - percentile: the percentile of the latencies the timeout covers
+    - margin: the factor the percentile is multiplied by
+    - min_ms: the shortest timeout
+    - max_ms: the longest timeout
+    - min_samples: latencies needed before the timeout adapts
+    - persist: whether the histograms are kept in the database
+    - enabled: whether timeouts adapt, otherwise the defaults are used
+    """
+
+    def __init__(
+        self,
+        percentile: float = timeout_percentile,
+        margin: float = timeout_margin,
+        min_ms: int = timeout_min_ms,
+        max_ms: int = timeout_max_ms,
+        min_samples: int = timeout_min_samples,
+        persist: bool = True,
+        enabled: bool = adaptive_timeouts,
+    ):
+        self.percentile = percentile
+        self.margin = margin
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.min_samples = min_samples
+        self.persist = persist
+        self.enabled = enabled
+        self.histograms: dict[str, Histogram] = {}
+        # the counts not yet saved
+        self._pending: dict[str, Histogram] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, action: str) -> str:
+        return f"{domain_of(url)}|{action}"
+
+    def load(self) -> None:
+        """Adds the histograms kept in the database to those recorded so far.
+        Any connection or configuration error leaves the defaults in use.
+        It runs once, on first use or when called at startup."""
+        self._loaded = True
+        try:
+            client = get_mongodb_client()
+            with client:
+                coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+                docs = list(coll.find())
+        except Exception as e:
+            logger.warning(f"latency histograms not loaded: {e}")
+            return
+        with self._lock:
+            for doc in docs:
+                loaded = Histogram(doc.get("counts"), doc.get("timeouts", 0))
+                histogram = self.histograms.setdefault(doc["_id"], Histogram())
+                histogram.counts.update(loaded.counts)
+                histogram.timeouts += loaded.timeouts
+        logger.info(f"loaded {len(docs)} latency histograms")
+
+    def _load(self) -> None:
+        """Starts loading the histograms in a background thread on first use,
+        so that waits never block on the database. The defaults are used
+        until they are loaded."""
+        if self._loaded or not self.persist:
+            return
+        self._loaded = True
+        threading.Thread(target=self.load, daemon=True).start()
+
+    def timeout(self, url: str, action: str, default: int) -> int:
+        """Returns the timeout in ms of an action on the domain of a url"""
+        if not self.enabled:
+            return default
+        with self._lock:
+            self._load()
+            histogram = self.histograms.get(self.key(url, action))
+            if histogram is None or histogram.total < self.min_samples:
+                return default
+            learnt = histogram.quantile(self.percentile) * self.margin
+        return int(min(self.max_ms, max(self.min_ms, learnt)))
+
+    def record(
+        self, url: str, action: str, ms: float, timed_out: bool = False
+    ) -> None:
+        """Counts the latency of an action. A wait that timed out is counted
+        as a latency of its timeout, a lower bound of the real one, so that
+        a timeout learnt too low grows back once more than `100 - percentile`
+        percent of the waits time out."""
+        key = self.key(url, action)
+        with self._lock:
+            self._load()
+            for histograms in (self.histograms, self._pending):
+                histogram = histograms.setdefault(key, Histogram())
+                histogram.add(ms)
+                if timed_out:
+                    histogram.timeouts += 1
+
+    @contextmanager
+    def measure(
+        self, url: str, action: str, default: int = DEFAULT_TIMEOUT
+    ) -> Iterator[int]:
+        """Yields the timeout of an action and records how long it took.
+        Waits that time out are recorded at their timeout."""
+        timeout = self.timeout(url, action, default)
+        started = time.monotonic()
+        try:
+            yield timeout
+        except PlaywrightTimeoutError:
+            self.record(url, action, timeout, timed_out=True)
+            raise
+        self.record(url, action, (time.monotonic() - started) * 1000)
+
+    def save(self) -> None:
+        """Adds the counts recorded since the last save to the database"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not self.persist or not pending:
+            return
+
+        operations = []
+        for key, histogram in pending.items():
+            domain, action = key.split("|", 1)
+            inc = {f"counts.{b}": n for b, n in histogram.counts.items()}
+            if histogram.timeouts:
+                inc["timeouts"] = histogram.timeouts
+            operations.append(
+                UpdateOne(
+                    {"_id": key},
+                    {
+                        "$inc": inc,
+                        "$set": {"domain": domain, "action": action},
+                    },
+                    upsert=True,
+                )
+            )
+        try:
+            client = get_mongodb_client()
+            with client:
+                coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+                coll.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"latency histograms not saved: {e}")
+
+    def report(self) -> dict:
+        """The sample count, timeouts and current timeout of every action"""
+        with self._lock:
+            items = list(self.histograms.items())
+        report = {}
+        for key, histogram in items:
+            domain, action = key.split("|", 1)
+            report[key] = {
+                "samples": histogram.total,
+                "timeouts": histogram.timeouts,
+                "p50_ms": histogram.quantile(50),
+                "timeout_ms": self.timeout(
+                    f"https://{domain}", action, DEFAULT_TIMEOUT
+                ),
+            }
+        return report
+
+
+timeouts = TimeoutController()
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(timeouts.report(), indent=2))
@@ -0,0 +1,92 @@
+"""Records the progress of a run so that an interrupted run can be resumed"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.tasks import Stage
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+COLLECTION = "checkpoints"
+
+
+class Checkpoint:
+    """Tracks the stages completed by each url of a run in the `checkpoints`
+    collection, along with the intermediate results needed to skip them.
+    One client is kept for the life of the checkpoint, close it once the run
+    is over.
+
+    Args
+    ---
+    - run_id: identifies the run of `main()`. Each url additionally keeps
+    the run_id of its results.
+    - resume: whether to load the progress previously recorded for run_id
+    - urls: only load the progress of these urls
+    """
+
+    def __init__(
+        self, run_id: str, resume: bool = False, urls: list[str] = None
+    ):
+        self.run_id = run_id
+        self.client = get_mongodb_client()
+        self.coll = self.client[os.environ.get("_MONGO_DB")][COLLECTION]
+        self._docs: dict[str, dict] = {}
+
+        if resume:
+            query = {"run_id": run_id}
+            if urls is not None:
+                query["url"] = {"$in": urls}
+            for doc in self.coll.find(query):
+                self._docs[doc["url"]] = doc
+            logger.info(f"resuming {run_id=} with {len(self._docs)} urls")
+
+    def close(self) -> None:
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, url: str) -> dict:
+        """Returns the progress recorded for a url"""
+        return self._docs.get(url, {})
+
+    def done(self, url: str, stage: Stage) -> bool:
+        """Checks whether a url has completed a stage"""
+        return stage.value in self.get(url).get("stages", {})
+
+    def results(self, url: str) -> Optional[list[dict]]:
+        """Returns the persisted scraping results of a url if any"""
+        if self.done(url, Stage.SCRAPED):
+            return self.get(url).get("results")
+        return None
+
+    def mark(self, url: str, stage: Stage, **data) -> None:
+        """Records that a url completed a stage
+
+        Args
+        ---
+        - url: the url being processed
+        - stage: the stage that completed
+        - data: intermediate results to persist with the stage
+        """
+        now = datetime.now(tz=timezone.utc)
+        doc = self._docs.setdefault(
+            url, {"run_id": self.run_id, "url": url, "stages": {}}
+        )
+        doc["stages"][stage.value] = now
+        doc.update(data)
+
+        update = {f"stages.{stage.value}": now, "updated_at": now, **data}
+        self.coll.update_one(
+            {"run_id": self.run_id, "url": url},
+            {"$set": update},
+            upsert=True,
+        )
@@ -1,10 +1,15 @@
 """Handles loading .env, environment variables, constants (browser args, paths, model names)"""
 
 from pathlib import Path
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 ROOT_DIR = Path(__file__).parent.parent
 results_dir = ROOT_DIR / "results"
+snapshots_dir = results_dir / "snapshots"
+state_dir = ROOT_DIR / "state"
+linkedin_state = state_dir / "linkedin.json"
+documents_cache = ROOT_DIR / "cache" / "documents"
+browser_profile = ROOT_DIR / "cache" / "browser"
 
 browser_args = [
     "--window-size=1300,570",
@@ -53,3 +58,19 @@ class RateLimit(NamedTuple):
     gemini_2_0: float = 15 / 60
     discord: int = 50
     min_delay: float = 0.1
+
+
+class PayloadConfig(NamedTuple):
+    """Controls how much of the page state is sent to the vision model at
+    each agent step"""
+
+    screenshot_scale: float = 0.6
+    screenshot_format: str = "png"
+    screenshot_quality: int = 60
+    clip_viewport: bool = True
+    # pixels around the viewport whose elements are sent, browser_use's
+    # default if None
+    viewport_expansion: Optional[int] = None
+    prune_dom: bool = True
+    max_text_chars: int = 300
+    dedupe_state: bool = True
@@ -9,6 +9,7 @@ from urllib.parse import quote_plus
 from dotenv import load_dotenv
 from pymongo import MongoClient
 
+from llm_browser.src.tracing import tracer
 from llm_browser.src.utils import set_logging
 
 load_dotenv()
@@ -73,7 +74,8 @@ def save_to_db(
         coll = db[collection]
 
         if fp is None and data is not None:
-            coll.insert_one(data)
+            with tracer.span("mongo.write", collection=collection):
+                coll.insert_one(data)
             logger.info(f"Uploaded successfully to {collection=}")
             return
 
@@ -89,5 +91,6 @@ def save_to_db(
             raise ValueError("unsupported fp!")
 
         document = {**data, **content}
-        coll.insert_one(document)
+        with tracer.span("mongo.write", collection=collection):
+            coll.insert_one(document)
         logger.info(f"Uploaded successfully to {collection=}")
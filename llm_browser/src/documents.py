@@ -0,0 +1,177 @@
+"""Converts resumes and other documents to Markdown in batches, caching the
+output by the hash of each source file"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+from llm_browser.src.configs.config import documents_cache
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import get_converter, set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+convert_workers = int(os.environ.get("CONVERT_WORKERS", 1))
+
+
+def file_hash(path: Path | str) -> str:
+    """Returns the sha256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _start_worker() -> None:
+    # load the models once per worker rather than once per document
+    get_converter()
+    logger.info(f"converter {os.getpid()} started")
+
+
+def _convert(path: str) -> str:
+    result = get_converter().convert(path)
+    return result.document.export_to_markdown()
+
+
+def convert_documents(
+    paths: list[Path | str],
+    out_dir: Path | str = None,
+    workers: int = convert_workers,
+    cache_dir: Path = documents_cache,
+) -> dict[str, dict]:
+    """Converts documents to Markdown. Documents whose content was converted
+    before are read from the cache, the rest are spread over a process pool
+    where each worker keeps one converter.
+
+    Args
+    ---
+    - paths: the source documents
+    - out_dir: directory to save `<name>.md` files to, not saved if None
+    - workers: number of converter processes
+    - cache_dir: directory of the converted documents keyed by hash
+
+    Returns
+    ---
+    The hash and Markdown of each converted path
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    documents: dict[str, dict] = {}
+    pending: dict[str, str] = {}
+
+    for path in map(str, paths):
+        digest = file_hash(path)
+        cached = cache_dir / f"{digest}.md"
+        if cached.exists():
+            documents[path] = {"hash": digest, "markdown": cached.read_text()}
+        else:
+            pending[path] = digest
+
+    logger.info(
+        f"{len(documents)} of {len(documents) + len(pending)} documents "
+        "are cached"
+    )
+
+    def store(path: str, markdown: str) -> None:
+        digest = pending[path]
+        (cache_dir / f"{digest}.md").write_text(markdown)
+        documents[path] = {"hash": digest, "markdown": markdown}
+        logger.info(f"converted {path}")
+
+    workers = max(1, min(workers, len(pending)))
+    with tracer.span("documents.convert", documents=len(pending)):
+        if workers == 1:
+            for path in pending:
+                try:
+                    store(path, _convert(path))
+                except Exception as e:
+                    logger.exception(f"error converting {path}: {e}")
+        elif pending:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_start_worker,
+            ) as executor:
+                futures = {
+                    executor.submit(_convert, path): path for path in pending
+                }
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        store(path, future.result())
+                    except Exception as e:
+                        logger.exception(f"error converting {path}: {e}")
+
+    if out_dir is not None:
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for path, doc in documents.items():
+            (out_dir / f"{Path(path).stem}.md").write_text(doc["markdown"])
+
+    return documents
+
+
+def upload_resumes(documents: dict[str, dict], resume_type: str = None):
+    """Saves converted resumes to the `resumes` collection. Resumes are keyed
+    by their hash so that unchanged files are not duplicated.
+
+    Args
+    ---
+    - documents: the output of `convert_documents`
+    - resume_type: the `type` of the resumes, defaults to each file's name
+    """
+    db_name = os.environ.get("_MONGO_DB")
+    client = get_mongodb_client()
+
+    with client:
+        coll = client[db_name]["resumes"]
+        for path, doc in documents.items():
+            coll.update_one(
+                {"hash": doc["hash"]},
+                {
+                    "$set": {
+                        "type": resume_type or Path(path).stem,
+                        "resume": doc["markdown"],
+                        "source": Path(path).name,
+                        "updated_at": datetime.now(tz=timezone.utc),
+                    }
+                },
+                upsert=True,
+            )
+
+    logger.info(f"uploaded {len(documents)} resumes")
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Converts documents to Markdown")
+    parser.add_argument("paths", help="documents to convert", nargs="+")
+    parser.add_argument("--out-dir", help="directory to save to", type=str)
+    parser.add_argument(
+        "--workers",
+        help="number of converter processes",
+        type=int,
+        default=convert_workers,
+    )
+    parser.add_argument(
+        "--upload",
+        help="save the documents to the resumes collection",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--type", help="type of the uploaded resumes", type=str
+    )
+    args = parser.parse_args()
+
+    documents = convert_documents(
+        args.paths, out_dir=args.out_dir, workers=args.workers
+    )
+    if args.upload:
+        upload_resumes(documents, resume_type=args.type)
@@ -0,0 +1,245 @@
+"""Strips boilerplate from scraped role descriptions before they are sent to
+the LLM. Paragraphs repeated across many roles, such as equal opportunity
+statements, benefits and company blurbs, are learnt from their hash
+frequencies and removed."""
+
+import hashlib
+import logging
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import estimate_tokens, set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+compress_roles_enabled = bool(int(os.environ.get("COMPRESS_ROLES", 1)))
+role_token_cap = int(os.environ.get("ROLE_TOKEN_CAP", 800))
+boilerplate_min_count = int(os.environ.get("BOILERPLATE_MIN_COUNT", 3))
+
+COLLECTION = "boilerplate"
+# the hashes of the descriptions already counted
+DOCS_COLLECTION = "boilerplate_docs"
+
+# paragraphs shorter than this are headings or bullets and never learnt
+MIN_PARAGRAPH_CHARS = 40
+
+# text added by the job boards' widgets rather than the employer
+UI_TEXT = re.compile(
+    r"^\s*(show more|show less|see more|see less|…\s*more|report this "
+    r"(listing|job))\s*$",
+    flags=re.IGNORECASE | re.MULTILINE,
+)
+
+
+def normalize(text: str) -> str:
+    """Removes widget text and collapses whitespace, keeping line breaks"""
+    text = UI_TEXT.sub("", text)
+    lines = [
+        re.sub(r"[ \t ]+", " ", line).strip() for line in text.split("\n")
+    ]
+    return re.sub(r"\n{2,}", "\n", "\n".join(lines)).strip()
+
+
+def paragraph_key(paragraph: str) -> str:
+    """Hashes a paragraph ignoring case, punctuation and spacing"""
+    words = re.sub(r"[^a-z0-9]+", " ", paragraph.lower()).strip()
+    return hashlib.sha1(words.encode()).hexdigest()[:16]
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cuts a text to roughly `max_tokens` tokens on a word boundary"""
+    if max_tokens is None or estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max_tokens * 4].rsplit(" ", 1)[0]
+    return cut + " ..."
+
+
+class Compressor:
+    """Learns which paragraphs are boilerplate from how many distinct
+    descriptions they appear in, and strips them. Each description is counted
+    once, however many times it is scraped or scored.
+
+    Args
+    ---
+    - min_count: descriptions a paragraph must appear in to be boilerplate
+    - max_tokens: the token cap of each description
+    - persist: whether the paragraph counts are kept in the database so that
+    they accumulate across runs
+    """
+
+    def __init__(
+        self,
+        min_count: int = boilerplate_min_count,
+        max_tokens: int = role_token_cap,
+        persist: bool = True,
+    ):
+        self.min_count = min_count
+        self.max_tokens = max_tokens
+        self.persist = persist
+        self.counts: Counter = Counter()
+        # the keys of the descriptions counted by this process
+        self.learnt: set[str] = set()
+        self._loaded = False
+
+    def _load(self) -> None:
+        if self._loaded or not self.persist:
+            return
+        self._loaded = True
+        client = get_mongodb_client()
+        with client:
+            coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+            for doc in coll.find({}, {"count": 1}):
+                self.counts[doc["_id"]] += doc["count"]
+        logger.info(f"loaded {len(self.counts)} paragraph counts")
+
+    def _unseen(self, keys: list[str]) -> set[str]:
+        """Records description keys in the database and returns those that
+        were not there yet, so that concurrent workers count each once"""
+        learnt_at = datetime.now(timezone.utc)
+        client = get_mongodb_client()
+        with client:
+            coll = client[os.environ.get("_MONGO_DB")][DOCS_COLLECTION]
+            result = coll.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": k},
+                        {"$setOnInsert": {"learnt_at": learnt_at}},
+                        upsert=True,
+                    )
+                    for k in keys
+                ],
+                ordered=False,
+            )
+        return {keys[i] for i in result.upserted_ids}
+
+    def learn(self, texts: list[str]) -> None:
+        """Counts the distinct long paragraphs of each text not counted
+        before"""
+        self._load()
+        docs = {}
+        for text in texts:
+            text = normalize(text)
+            key = paragraph_key(text)
+            if key not in self.learnt:
+                docs.setdefault(key, text)
+        if not docs:
+            return
+        self.learnt.update(docs)
+        if self.persist:
+            new = self._unseen(list(docs))
+            docs = {k: t for k, t in docs.items() if k in new}
+
+        seen = Counter()
+        for text in docs.values():
+            seen.update(
+                {
+                    paragraph_key(p)
+                    for p in text.split("\n")
+                    if len(p) >= MIN_PARAGRAPH_CHARS
+                }
+            )
+        self.counts.update(seen)
+
+        if self.persist and seen:
+            client = get_mongodb_client()
+            with client:
+                coll = client[os.environ.get("_MONGO_DB")][COLLECTION]
+                coll.bulk_write(
+                    [
+                        UpdateOne(
+                            {"_id": k}, {"$inc": {"count": n}}, upsert=True
+                        )
+                        for k, n in seen.items()
+                    ],
+                    ordered=False,
+                )
+
+    def is_boilerplate(self, paragraph: str) -> bool:
+        return (
+            len(paragraph) >= MIN_PARAGRAPH_CHARS
+            and self.counts[paragraph_key(paragraph)] >= self.min_count
+        )
+
+    def compress(self, text: str) -> str:
+        """Normalizes a text, drops its boilerplate and caps its tokens"""
+        kept = [
+            p
+            for p in normalize(text).split("\n")
+            if not self.is_boilerplate(p)
+        ]
+        return truncate("\n".join(kept), self.max_tokens)
+
+    @staticmethod
+    def text_fields(roles: list[dict]) -> list[tuple[int, str]]:
+        """The (index, key) of the long text fields of roles"""
+        return [
+            (i, k)
+            for i, role in enumerate(roles)
+            for k, v in role.items()
+            if isinstance(v, str) and len(v) >= MIN_PARAGRAPH_CHARS
+        ]
+
+    def learn_roles(self, roles: list[dict]) -> None:
+        """Learns from the long text fields of roles"""
+        self.learn([roles[i][k] for i, k in self.text_fields(roles)])
+
+    def compress_roles(self, roles: list[dict]) -> tuple[list[dict], int, int]:
+        """Compresses the long text fields of roles. Learning is left to
+        `learn_roles`, called once per scrape.
+
+        Returns
+        ---
+        The compressed roles and their estimated tokens before and after
+        """
+        compressed = [dict(role) for role in roles]
+        for i, k in self.text_fields(roles):
+            compressed[i][k] = self.compress(roles[i][k])
+
+        before = sum(estimate_tokens(str(r)) for r in roles)
+        after = sum(estimate_tokens(str(r)) for r in compressed)
+        return compressed, before, after
+
+
+compressor = Compressor()
+
+
+def compress_roles(roles: list[dict], compressor: Compressor = compressor):
+    """Compresses roles before scoring and records the saving in a
+    `compress` span
+
+    Returns
+    ---
+    The compressed roles
+    """
+    if not roles or not all(isinstance(r, dict) for r in roles):
+        return roles
+
+    with tracer.span("compress", roles=len(roles)):
+        compressed, before, after = compressor.compress_roles(roles)
+        tracer.set_attributes(tokens_before=before, tokens_after=after)
+
+    saved = 1 - after / before if before else 0
+    logger.info(
+        f"compressed {len(roles)} roles from ~{before} to ~{after} tokens "
+        f"({saved:.0%} saved)"
+    )
+    return compressed
+
+
+def learn_roles(roles: list[dict], compressor: Compressor = compressor):
+    """Counts the paragraphs of a scrape's roles once, before they are
+    compressed for each profile"""
+    if not roles or not all(isinstance(r, dict) for r in roles):
+        return
+    try:
+        compressor.learn_roles(roles)
+    except PyMongoError as e:
+        logger.warning(f"boilerplate counts not updated: {e}")
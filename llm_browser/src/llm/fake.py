@@ -0,0 +1,138 @@
+"""Deterministic fake chat model for benchmarking without paid APIs"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from llm_browser.src.utils import estimate_tokens
+
+DEFAULT_RESPONSE = """\
+# Data Engineer
+Example Corp
+Score: 8/10. Strong overlap on Python, SQL and Airflow.
+
+# Analytics Engineer
+Sample Ltd
+Score: 7/10. Good fit on dbt and data modelling.
+"""
+
+
+class FakeProviderError(Exception):
+    """Raised by the fake model to simulate a provider failure"""
+
+    status_code = 500
+
+
+class FakeRateLimitError(FakeProviderError):
+    """Raised by the fake model to simulate a 429 response"""
+
+    status_code = 429
+
+
+class FakeChatModel(BaseChatModel):
+    """A chat model that returns a canned response after a configurable
+    latency. Failures are drawn from a seeded generator so that runs are
+    reproducible.
+
+    Args
+    ---
+    - model: the name reported as the model
+    - response: the content returned on every successful call
+    - latency: mean latency of a call in seconds
+    - jitter: maximum deviation from `latency` in seconds
+    - prompt_tokens: input tokens reported, estimated from messages if None
+    - completion_tokens: output tokens reported
+    - error_rate: probability (0-1) of raising a `FakeProviderError`
+    - rate_limit_rate: probability (0-1) of raising a `FakeRateLimitError`
+    - rpm: requests per minute after which every call returns a 429
+    - seed: seed for the random generator
+    """
+
+    model: str = "fake-chat"
+    response: str = DEFAULT_RESPONSE
+    latency: float = 0.5
+    jitter: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: int = 256
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    rpm: Optional[int] = None
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: deque = PrivateAttr(default_factory=deque)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _draw(self) -> float:
+        """Decides the outcome of a call and returns its delay in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] > 60:
+                self._calls.popleft()
+            self._calls.append(now)
+
+            if self.rpm is not None and len(self._calls) > self.rpm:
+                raise FakeRateLimitError(f"exceeded {self.rpm} rpm")
+
+            outcome = self._rng.random()
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+
+        if outcome < self.rate_limit_rate:
+            raise FakeRateLimitError("429 Resource has been exhausted")
+        if outcome < self.rate_limit_rate + self.error_rate:
+            raise FakeProviderError("500 Internal error encountered")
+
+        return max(delay, 0.0)
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        input_tokens = self.prompt_tokens
+        if input_tokens is None:
+            input_tokens = sum(
+                estimate_tokens(str(m.content)) for m in messages
+            )
+
+        message = AIMessage(
+            content=self.response,
+            response_metadata={"model_name": self.model},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": self.completion_tokens,
+                "total_tokens": input_tokens + self.completion_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._draw())
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._draw())
+        return self._result(messages)
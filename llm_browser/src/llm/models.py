@@ -8,6 +8,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 
+from llm_browser.src.llm.fake import FakeChatModel
+
 load_dotenv()
 
 host = os.environ.get("_OLLAMA_HOST")
@@ -22,4 +24,9 @@ models = {
     ),
     "gemini-vision": ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite"),
     "gemini-text": ChatGoogleGenerativeAI(model="gemini-2.0-flash"),
+    "fake": FakeChatModel(
+        latency=float(os.environ.get("FAKE_LLM_LATENCY", 0.5)),
+        error_rate=float(os.environ.get("FAKE_LLM_ERROR_RATE", 0)),
+        rate_limit_rate=float(os.environ.get("FAKE_LLM_429_RATE", 0)),
+    ),
 }
@@ -3,11 +3,39 @@
 import json
 import logging
 
-from llm_browser.src.utils import post_notification, set_logging
+from pydantic import ValidationError
+
+from llm_browser.src.llm.schemas import Role, validate_roles
+from llm_browser.src.tracing import tracer
+from llm_browser.src.utils import extract_json, post_notification, set_logging
 
 set_logging()
 logger = logging.getLogger(__name__)
 
+REPAIR_PROMPT = """The text below was meant to be a JSON list of roles that \
+matches this JSON schema:
+
+{schema}
+
+It could not be used because: {error}
+
+Return only the corrected JSON list, without any explanation. Keep every \
+role and value that is present in the text and do not invent new ones."""
+
+
+def model_name(model) -> str:
+    """Returns the name of a LangChain model"""
+    return getattr(model, "model", None) or getattr(model, "model_name", "")
+
+
+def token_usage(msg) -> dict:
+    """Extracts the token counts reported with an LLM response"""
+    usage = getattr(msg, "usage_metadata", None) or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+    }
+
 
 def query_llm(data: dict, prompt: str, model) -> str:
     """Queries an LLM model
@@ -24,7 +52,9 @@ def query_llm(data: dict, prompt: str, model) -> str:
     """
     logger.info("querying llm...")
     messages = [("system", prompt), ("human", json.dumps(data))]
-    msg = model.invoke(messages)
+    with tracer.span("llm.score", model=model_name(model)):
+        msg = model.invoke(messages)
+        tracer.set_attributes(**token_usage(msg))
     return msg.content
 
 
@@ -44,5 +74,45 @@ def filter_query(data: str, prompt: str, model, title: str):
     """
     logger.info("filtering jobs...")
     messages = [("system", prompt), ("human", json.dumps(data))]
-    msg = model.invoke(messages)
+    with tracer.span("llm.filter", model=model_name(model)):
+        msg = model.invoke(messages)
+        tracer.set_attributes(**token_usage(msg))
     return msg.content, title
+
+
+def parse_roles(text: str, model=None, retries: int = 1) -> list[dict]:
+    """Parses the roles in LLM output and validates them against the role
+    schema. When parsing fails, the model is asked to repair the output
+    instead of rerunning the task that produced it.
+
+    Args
+    ---
+    - text: the LLM output
+    - model: the LangChain model used for repairs, no repair if None
+    - retries: maximum number of repair calls
+
+    Returns
+    ---
+    The validated roles
+    """
+    schema = json.dumps(Role.model_json_schema())
+
+    for attempt in range(retries + 1):
+        try:
+            return validate_roles(extract_json(text or ""))
+        except (ValueError, ValidationError) as e:
+            if model is None or attempt == retries:
+                raise ValueError(f"could not parse roles: {e}") from e
+            error = str(e)
+
+        logger.warning(f"repairing llm output: {error[:200]}")
+        messages = [
+            ("system", REPAIR_PROMPT.format(schema=schema, error=error)),
+            ("human", text or ""),
+        ]
+        with tracer.span(
+            "llm.repair", model=model_name(model), retries=attempt + 1
+        ):
+            msg = model.invoke(messages)
+            tracer.set_attributes(**token_usage(msg))
+        text = msg.content
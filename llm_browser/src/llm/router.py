@@ -0,0 +1,274 @@
+"""Routes LLM requests to the fastest healthy provider, hedging slow requests
+and skipping failing providers"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import Optional
+
+from llm_browser.src.llm.query import model_name
+from llm_browser.src.tracing import percentile, tracer
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+llm_routes = os.environ.get("LLM_ROUTES")
+llm_fallback = os.environ.get("LLM_FALLBACK", "ollama")
+hedge_requests = bool(int(os.environ.get("LLM_HEDGE", 1)))
+hedge_percentile = float(os.environ.get("LLM_HEDGE_PERCENTILE", 95))
+
+
+class ModelStats:
+    """Rolling latency and error rate of a model with a circuit breaker. The
+    circuit opens after `failure_threshold` consecutive failures and lets one
+    trial request through once `cooldown` seconds have passed. Other requests
+    skip the model until the trial succeeds, which closes the circuit, or
+    fails, which opens it for another `cooldown`.
+
+    Args
+    ---
+    - window: number of recent calls the statistics cover
+    - failure_threshold: consecutive failures that open the circuit
+    - cooldown: seconds before an open circuit is tried again
+    """
+
+    def __init__(
+        self, window: int = 50, failure_threshold: int = 3, cooldown=60.0
+    ):
+        self.calls: deque[tuple[float, bool]] = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # whether the trial request of a half-open circuit is in flight
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Takes the right to send a request: always while the circuit is
+        closed, and only for the trial request once it is half-open"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or not self._cooled_down():
+                return False
+            self.probing = True
+            return True
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.calls.append((latency, ok))
+            self.probing = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self.opened_at >= self.cooldown
+
+    @property
+    def available(self) -> bool:
+        """Whether the circuit is closed or ready for a trial request"""
+        if self.opened_at is None:
+            return True
+        return not self.probing and self._cooled_down()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(not ok for _, ok in self.calls) / len(self.calls)
+
+    def latency(self, q: float = 50) -> Optional[float]:
+        """The q-th percentile latency of successful calls"""
+        latencies = [t for t, ok in self.calls if ok]
+        return percentile(latencies, q) if latencies else None
+
+    def score(self) -> float:
+        """Expected cost of a call, lower is better. Models without any
+        successful call score 0 so that they are tried."""
+        latency = self.latency(50)
+        if latency is None:
+            return 0.0
+        return latency * (1 + 4 * self.error_rate)
+
+
+class LLMRouter:
+    """Sends each request to the healthy model with the lowest expected
+    latency. When hedging, a request that takes longer than the percentile
+    latency of its model is also sent to the next best model and the first
+    response wins. Failed requests move on to the next model and finally to
+    the fallback model. Can be used wherever a LangChain model is invoked.
+
+    Args
+    ---
+    - models: the LangChain models to route between, by name
+    - fallback: the model used when every other model failed
+    - hedge: whether to hedge slow requests
+    - hedge_percentile: percentile latency after which a request is hedged
+    - min_hedge_delay: seconds to wait before hedging at the least
+    - min_samples: successful calls needed before a model is hedged
+    """
+
+    def __init__(
+        self,
+        models: dict,
+        fallback=None,
+        hedge: bool = hedge_requests,
+        hedge_percentile: float = hedge_percentile,
+        min_hedge_delay: float = 1.0,
+        min_samples: int = 5,
+        **stats_kwargs,
+    ):
+        self.models = dict(models)
+        self.fallback = fallback
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.stats = {name: ModelStats(**stats_kwargs) for name in self.models}
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * len(self.models) + 2,
+            thread_name_prefix="llm-router",
+        )
+
+    @property
+    def model(self) -> str:
+        return "router:" + ",".join(self.models)
+
+    def ranked(self) -> list[str]:
+        """Returns the available models, best first. Ties keep the order the
+        models were given in."""
+        names = [n for n in self.models if self.stats[n].available]
+        return sorted(names, key=lambda n: self.stats[n].score())
+
+    def _call(self, name: str, messages, **kwargs):
+        start = time.perf_counter()
+        try:
+            msg = self.models[name].invoke(messages, **kwargs)
+        except Exception:
+            self.stats[name].record(time.perf_counter() - start, ok=False)
+            raise
+        self.stats[name].record(time.perf_counter() - start, ok=True)
+        return msg
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        stats = self.stats[name]
+        if not self.hedge or len(stats.calls) < self.min_samples:
+            return None
+        latency = stats.latency(self.hedge_percentile)
+        if latency is None:
+            return None
+        return max(latency, self.min_hedge_delay)
+
+    def invoke(self, messages, **kwargs):
+        """Invokes the best model, hedging and failing over as configured
+
+        Returns
+        ---
+        The response of the first model that succeeded
+        """
+        queue = self.ranked()
+        tried: list[str] = []
+        futures: dict[Future, str] = {}
+        hedged = False
+        error = None
+
+        def submit() -> bool:
+            while queue:
+                name = queue.pop(0)
+                if name not in tried and self.stats[name].acquire():
+                    tried.append(name)
+                    future = self._executor.submit(
+                        self._call, name, messages, **kwargs
+                    )
+                    futures[future] = name
+                    return True
+            return False
+
+        submit()
+        while futures:
+            delay = None
+            if not hedged and len(futures) == 1 and queue:
+                delay = self._hedge_delay(next(iter(futures.values())))
+
+            done, _ = wait_futures(
+                futures, timeout=delay, return_when=FIRST_COMPLETED
+            )
+            if not done:
+                logger.info(f"hedging slow request to {tried[-1]}")
+                hedged = submit()
+                continue
+
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    msg = future.result()
+                except Exception as e:
+                    logger.warning(f"{name} failed: {e}")
+                    error = e
+                    continue
+                tracer.set_attributes(
+                    model=name, retries=len(tried) - 1, hedged=hedged
+                )
+                return msg
+
+            if not futures:
+                submit()
+
+        if self.fallback is not None:
+            logger.warning(
+                f"every model failed, using {model_name(self.fallback)}"
+            )
+            tracer.set_attributes(
+                model=model_name(self.fallback), retries=len(tried)
+            )
+            return self.fallback.invoke(messages, **kwargs)
+        raise error or RuntimeError("no model is available")
+
+    def report(self) -> dict:
+        """Summarises the latency, errors and circuit state of each model"""
+        return {
+            name: {
+                "calls": len(s.calls),
+                "p50_sec": s.latency(50),
+                "p95_sec": s.latency(95),
+                "error_rate": s.error_rate,
+                "available": s.available,
+            }
+            for name, s in self.stats.items()
+        }
+
+
+def build_router(
+    models: dict, routes: str = llm_routes, fallback: str = llm_fallback
+) -> Optional[LLMRouter]:
+    """Creates a router from a comma separated list of model names
+
+    Args
+    ---
+    - models: every configured model, by name
+    - routes: the names of the models to route between, e.g.
+    `gemini-text,openai,anthropic`
+    - fallback: the name of the model used when every route failed
+
+    Returns
+    ---
+    The router, or None if no routes are given
+    """
+    if not routes:
+        return None
+    names = [n.strip() for n in routes.split(",") if n.strip()]
+    return LLMRouter(
+        {n: models[n] for n in names},
+        fallback=models.get(fallback) if fallback else None,
+    )
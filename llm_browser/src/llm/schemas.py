@@ -0,0 +1,48 @@
+"""Schemas of the structured output expected from LLMs"""
+
+from typing import Any, Optional
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+Text = Optional[str | list[str]]
+
+
+class Role(BaseModel):
+    """A role extracted from a job listing by the browsing agent. No field
+    is required and fields outside the schema are allowed, since the prompt
+    does not fix the keys the agent uses."""
+
+    model_config = ConfigDict(extra="allow")
+
+    job_title: Text = None
+    location: Text = None
+    company_name: Text = None
+    company_description: Text = None
+    role_requirements: Text = None
+    skills_required: Text = None
+    experience_required: Text = None
+
+
+roles_adapter = TypeAdapter(list[Role])
+
+
+def validate_roles(data: Any) -> list[dict]:
+    """Validates parsed LLM output against the role schema
+
+    Args
+    ---
+    - data: a list of roles, a single role or an object with a `roles` list
+
+    Returns
+    ---
+    The parsed roles, unchanged
+
+    Raises
+    ---
+    - pydantic.ValidationError: if a role is not an object or one of its
+    known fields is not text
+    """
+    if isinstance(data, dict):
+        data = data.get("roles", [data])
+    roles_adapter.validate_python(data)
+    return list(data)
@@ -0,0 +1,209 @@
+"""In-memory stand-in for the parts of pymongo used by the queue, checkpoints,
+counters and results, so that the benchmark and the tests run without a
+MongoDB server"""
+
+import copy
+import threading
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+COMPARISONS = {
+    "$ne": lambda value, arg: value != arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$in": lambda value, arg: value in arg,
+}
+
+
+def get_path(doc: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(doc, dict) or key not in doc:
+            return None
+        doc = doc[key]
+    return doc
+
+
+def set_path(doc: dict, path: str, value) -> None:
+    *parents, key = path.split(".")
+    for parent in parents:
+        doc = doc.setdefault(parent, {})
+    doc[key] = value
+
+
+def matches(doc: dict, filter: dict) -> bool:
+    for key, condition in filter.items():
+        if key == "$or":
+            if not any(matches(doc, f) for f in condition):
+                return False
+            continue
+        value = get_path(doc, key)
+        if isinstance(condition, dict) and condition:
+            if not all(
+                COMPARISONS[op](value, arg) for op, arg in condition.items()
+            ):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def apply_update(doc: dict, update: dict, inserted: bool) -> None:
+    for path, value in update.get("$set", {}).items():
+        set_path(doc, path, value)
+    for path, value in update.get("$inc", {}).items():
+        set_path(doc, path, (get_path(doc, path) or 0) + value)
+    if inserted:
+        for path, value in update.get("$setOnInsert", {}).items():
+            set_path(doc, path, value)
+
+
+class MemoryCollection:
+    def __init__(self):
+        self.docs: list[dict] = []
+        self.unique: list[str] = []
+        self._lock = threading.RLock()
+
+    def create_index(self, keys: list[tuple], unique: bool = False) -> None:
+        if unique:
+            self.unique.extend(key for key, _ in keys)
+
+    def insert_one(self, document: dict):
+        with self._lock:
+            document.setdefault("_id", ObjectId())
+            self._check_unique(document)
+            self.docs.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+    def find(self, filter: dict = None, projection: dict = None):
+        with self._lock:
+            return [
+                copy.deepcopy(d) for d in self.docs if matches(d, filter or {})
+            ]
+
+    def find_one(self, filter: dict = None):
+        docs = self.find(filter)
+        return docs[0] if docs else None
+
+    def count_documents(self, filter: dict) -> int:
+        return len(self.find(filter))
+
+    def _check_unique(self, doc: dict) -> None:
+        for key in self.unique:
+            if any(
+                d is not doc and d.get(key) == doc.get(key) for d in self.docs
+            ):
+                raise DuplicateKeyError(f"duplicate {key}: {doc.get(key)}")
+
+    def _update(self, filter: dict, update: dict, upsert: bool, many: bool):
+        """Returns the matched count and the _id of an upserted document"""
+        with self._lock:
+            docs = [d for d in self.docs if matches(d, filter)]
+            if not many:
+                docs = docs[:1]
+            for doc in docs:
+                apply_update(doc, update, inserted=False)
+            if docs or not upsert:
+                return len(docs), None
+
+            doc = {
+                k: v
+                for k, v in filter.items()
+                if not k.startswith("$") and not isinstance(v, dict)
+            }
+            doc.setdefault("_id", ObjectId())
+            apply_update(doc, update, inserted=True)
+            self._check_unique(doc)
+            self.docs.append(doc)
+            return 0, doc["_id"]
+
+    def update_one(self, filter: dict, update: dict, upsert: bool = False):
+        matched, upserted_id = self._update(filter, update, upsert, False)
+        return SimpleNamespace(
+            matched_count=matched,
+            modified_count=matched,
+            upserted_id=upserted_id,
+        )
+
+    def update_many(self, filter: dict, update: dict):
+        matched, _ = self._update(filter, update, False, True)
+        return SimpleNamespace(matched_count=matched, modified_count=matched)
+
+    def find_one_and_update(
+        self,
+        filter: dict,
+        update: dict,
+        sort: list[tuple] = None,
+        return_document: bool = ReturnDocument.BEFORE,
+    ):
+        with self._lock:
+            docs = [d for d in self.docs if matches(d, filter)]
+            for key, direction in reversed(sort or []):
+                docs.sort(key=lambda d: d.get(key), reverse=direction < 0)
+            if not docs:
+                return None
+            before = copy.deepcopy(docs[0])
+            apply_update(docs[0], update, inserted=False)
+            if return_document == ReturnDocument.AFTER:
+                return copy.deepcopy(docs[0])
+            return before
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        upserted_ids, modified, errors = {}, 0, []
+        for i, op in enumerate(operations):
+            try:
+                matched, upserted_id = self._update(
+                    op._filter, op._doc, op._upsert, False
+                )
+            except DuplicateKeyError as e:
+                errors.append({"index": i, "errmsg": str(e)})
+                if ordered:
+                    break
+                continue
+            modified += matched
+            if upserted_id is not None:
+                upserted_ids[i] = upserted_id
+        if errors:
+            raise BulkWriteError(
+                {
+                    "nUpserted": len(upserted_ids),
+                    "nModified": modified,
+                    "writeErrors": errors,
+                }
+            )
+        return SimpleNamespace(
+            upserted_count=len(upserted_ids),
+            modified_count=modified,
+            upserted_ids=upserted_ids,
+        )
+
+
+class MemoryDatabase(dict):
+    def __missing__(self, name: str) -> MemoryCollection:
+        collection = self[name] = MemoryCollection()
+        return collection
+
+
+class MemoryMongoClient(dict):
+    """Survives `with` blocks and `close` so that the code under test can
+    open it as often as it opens real clients"""
+
+    def __missing__(self, name: str) -> MemoryDatabase:
+        db = self[name] = MemoryDatabase()
+        return db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def close(self) -> None:
+        pass
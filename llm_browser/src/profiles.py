@@ -0,0 +1,160 @@
+"""Scores scraped roles against several resumes at once. A TF-IDF similarity
+matrix of roles x resumes is computed locally so that only the promising
+pairs are sent to the LLM."""
+
+import hashlib
+import logging
+import math
+import os
+import re
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.utils import WEB_HOOK, set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+min_similarity = float(os.environ.get("PROFILE_MIN_SIMILARITY", 0.05))
+top_k = int(os.environ.get("PROFILE_TOP_K", 20))
+
+STOPWORDS = set(
+    """a an and are as at be by for from has have in is it its of on or our
+    that the their this to we will with you your who what work role team
+    experience years""".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases a text and splits it into words, keeping terms such as
+    `c++`, `c#` and `node.js`"""
+    words = re.findall(r"[a-z][a-z0-9+#.]*[a-z0-9+#]|[a-z]", text.lower())
+    return [w for w in words if w not in STOPWORDS and len(w) > 1]
+
+
+def role_text(role: dict | str) -> str:
+    if isinstance(role, str):
+        return role
+    return " ".join(str(v) for v in role.values() if v)
+
+
+class FeatureCache:
+    """Term counts of texts keyed by their hash, shared by every profile and
+    url so that each role is tokenized once per process. Only the local
+    similarity work is cached: each profile still scores its selected roles
+    in its own LLM call, since the scores depend on its resume.
+
+    Args
+    ---
+    - maxsize: number of texts kept, the least recently used are evicted
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._counts: OrderedDict[str, Counter] = OrderedDict()
+        self.hits = self.misses = 0
+
+    def counts(self, text: str) -> Counter:
+        key = hashlib.sha1(text.encode()).hexdigest()
+        if key in self._counts:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return self._counts[key]
+
+        self.misses += 1
+        counts = self._counts[key] = Counter(tokenize(text))
+        if len(self._counts) > self.maxsize:
+            self._counts.popitem(last=False)
+        return counts
+
+
+feature_cache = FeatureCache()
+
+
+def relevance_matrix(
+    roles: list[dict | str],
+    resumes: list[str],
+    cache: FeatureCache = feature_cache,
+) -> np.ndarray:
+    """Computes the cosine similarity of the TF-IDF vectors of every role and
+    resume. The IDF is fitted on the roles and resumes given.
+
+    Returns
+    ---
+    A matrix of shape (roles, resumes) with values between 0 and 1
+    """
+    docs = [cache.counts(role_text(r)) for r in roles]
+    docs += [cache.counts(r) for r in resumes]
+    if not roles or not resumes:
+        return np.zeros((len(roles), len(resumes)))
+
+    vocab = {term: i for i, term in enumerate({t for d in docs for t in d})}
+    tf = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    for row, counts in enumerate(docs):
+        for term, count in counts.items():
+            tf[row, vocab[term]] = 1 + math.log(count)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1 + len(docs)) / (1 + df)) + 1
+    tfidf = tf * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf /= np.where(norms == 0, 1, norms)
+
+    return tfidf[: len(roles)] @ tfidf[len(roles) :].T
+
+
+def select_pairs(
+    matrix: np.ndarray,
+    min_similarity: float = min_similarity,
+    top_k: int = top_k,
+) -> list[list[int]]:
+    """Selects the promising roles of each resume
+
+    Args
+    ---
+    - matrix: the output of `relevance_matrix`
+    - min_similarity: the similarity below which a pair is dropped
+    - top_k: the maximum number of roles kept per resume
+
+    Returns
+    ---
+    The indices of the selected roles for each resume, best first
+    """
+    order = np.argsort(-matrix, axis=0, kind="stable")[:top_k]
+    return [
+        [int(i) for i in order[:, j] if matrix[i, j] >= min_similarity]
+        for j in range(matrix.shape[1])
+    ]
+
+
+def get_profiles(types: list[str] = None) -> list[dict]:
+    """Retrieves the resumes to score roles against
+
+    Args
+    ---
+    - types: the `type` of the resumes to use, all resumes if None
+
+    Returns
+    ---
+    The type, resume and webhook of each profile. A resume's `webhook` field
+    routes its results to its own channel.
+    """
+    db_name = os.environ.get("_MONGO_DB")
+    query = {"type": {"$in": types}} if types else {}
+
+    client = get_mongodb_client()
+    with client:
+        docs = list(client[db_name]["resumes"].find(query))
+
+    profiles = [
+        {
+            "type": doc["type"],
+            "resume": doc["resume"],
+            "webhook": doc.get("webhook") or WEB_HOOK,
+        }
+        for doc in docs
+    ]
+    logger.info(f"scoring against {[p['type'] for p in profiles]}")
+    return profiles
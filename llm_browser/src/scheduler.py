@@ -0,0 +1,130 @@
+"""Schedules each task on its own interval and skips unchanged listings"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from playwright.async_api import async_playwright
+
+from llm_browser.src.browser.display import (
+    close_browser,
+    launch_browser,
+    new_context,
+)
+from llm_browser.src.browser.scrapers import listing_fingerprint
+from llm_browser.src.configs.config import linkedin_state
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+default_interval = int(os.environ.get("SCHEDULE_INTERVAL", 720))
+
+
+class Scheduler:
+    """Tracks when each task of the context collection is next due. A task's
+    interval in minutes is read from its `interval` field and defaults to
+    `SCHEDULE_INTERVAL`. The last fingerprint and run time of every url are
+    kept in the `schedule` collection so that restarts keep the schedule.
+
+    Args
+    ---
+    - context_name: the collection holding the tasks
+    - interval: default interval in minutes
+    """
+
+    def __init__(
+        self,
+        context_name: str = os.environ.get("CONTEXT_NAME"),
+        interval: int = default_interval,
+    ):
+        self.context_name = context_name
+        self.interval = interval
+        self.db_name = os.environ.get("_MONGO_DB")
+        self.tasks: dict[str, dict] = {}
+        self.state: dict[str, dict] = {}
+
+        client = get_mongodb_client()
+        with client:
+            for doc in client[self.db_name]["schedule"].find():
+                self.state[doc["url"]] = doc
+
+    def refresh(self) -> None:
+        """Reloads the tasks so that added or removed searches are picked up"""
+        client = get_mongodb_client()
+        with client:
+            docs = client[self.db_name][self.context_name].find()
+            self.tasks = {doc["url"]: doc for doc in docs}
+
+    def next_run(self, url: str) -> float:
+        """Returns the timestamp a url is next due"""
+        last_run = self.state.get(url, {}).get("checked_at", 0)
+        minutes = self.tasks[url].get("interval") or self.interval
+        return last_run + minutes * 60
+
+    def due(self) -> list[dict]:
+        """Returns the tasks that are due, most overdue first"""
+        now = time.time()
+        urls = [u for u in self.tasks if self.next_run(u) <= now]
+        return [self.tasks[u] for u in sorted(urls, key=self.next_run)]
+
+    def seconds_until_next(self) -> float:
+        if not self.tasks:
+            return self.interval * 60
+        return max(0, min(map(self.next_run, self.tasks)) - time.time())
+
+    def fingerprint(self, url: str) -> Optional[str]:
+        """Returns the fingerprint of the last listing that was processed"""
+        return self.state.get(url, {}).get("fingerprint")
+
+    def record(
+        self, url: str, fingerprint: Optional[str], changed: bool
+    ) -> None:
+        """Records that a url was checked
+
+        Args
+        ---
+        - url: the url checked
+        - fingerprint: the fingerprint of its listing
+        - changed: whether the listing changed and the task ran
+        """
+        now = time.time()
+        update = {"url": url, "checked_at": now}
+        if changed:
+            update.update(fingerprint=fingerprint, ran_at=now)
+
+        self.state.setdefault(url, {}).update(update)
+        client = get_mongodb_client()
+        with client:
+            client[self.db_name]["schedule"].update_one(
+                {"url": url}, {"$set": update}, upsert=True
+            )
+
+
+def fetch_fingerprints(urls: list[str]) -> dict[str, Optional[str]]:
+    """Fingerprints the listing of each url using a single browser"""
+
+    async def run() -> dict[str, Optional[str]]:
+        fingerprints = {}
+        async with async_playwright() as p:
+            browser = await launch_browser(p, urls[0] if urls else None)
+            context = await new_context(
+                browser,
+                storage_state=(
+                    linkedin_state if linkedin_state.exists() else None
+                ),
+            )
+            page = await context.new_page()
+            for url in urls:
+                try:
+                    fingerprints[url] = await listing_fingerprint(page, url)
+                except Exception as e:
+                    logger.exception(f"error fingerprinting {url}: {e}")
+                    fingerprints[url] = None
+            await close_browser(browser)
+        return fingerprints
+
+    return asyncio.run(run())
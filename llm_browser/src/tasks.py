@@ -8,3 +8,21 @@ class TaskType(Enum):
 
     BROWSE = "browse"
     SCRAPE = "scrape"
+
+
+class Stage(Enum):
+    """Enum representing the stages a url goes through during a run"""
+
+    SCRAPED = "scraped"
+    SCORED = "scored"
+    SAVED = "saved"
+    POSTED = "posted"
+
+
+class TaskStatus(Enum):
+    """Enum representing the status of a task in the work queue"""
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
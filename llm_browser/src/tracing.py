@@ -0,0 +1,227 @@
+"""Timed spans and per-run metrics for the scraping and LLM pipeline"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from llm_browser.src.configs.config import results_dir
+
+logger = logging.getLogger(__name__)
+
+_run_id: ContextVar[Optional[str]] = ContextVar("run_id", default=None)
+_span: ContextVar[Optional[dict]] = ContextVar("span", default=None)
+
+COUNTER_ATTRIBUTES = ["input_tokens", "output_tokens", "retries"]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Computes the q-th percentile (0-100) of values using linear
+    interpolation between the closest ranks"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Tracer:
+    """Records timed spans grouped by the run they belong to. Spans started
+    outside of a run are not recorded."""
+
+    def __init__(self):
+        self._spans: dict[str, list[dict]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self, run_id: str):
+        """Attributes the spans started within the block to a run"""
+        token = _run_id.set(run_id)
+        try:
+            yield run_id
+        finally:
+            _run_id.reset(token)
+
+    @property
+    def run_id(self) -> Optional[str]:
+        """The run the current spans are attributed to"""
+        return _run_id.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Times the enclosed block
+
+        Args
+        ---
+        - name: the operation, e.g. `browser.launch` or `llm.score`
+        - attributes: details such as url, model, token counts and retries
+        """
+        run_id = _run_id.get()
+        record = {
+            "name": name,
+            "start": time.time(),
+            "duration": 0.0,
+            "status": "ok",
+            "attributes": attributes,
+        }
+        token = _span.set(record)
+        start = time.perf_counter()
+
+        try:
+            yield record
+        except BaseException as e:
+            record["status"] = "error"
+            record["attributes"]["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration"] = time.perf_counter() - start
+            _span.reset(token)
+            if run_id is not None:
+                with self._lock:
+                    self._spans[run_id].append(record)
+
+    def set_attributes(self, **attributes) -> None:
+        """Adds attributes to the innermost active span"""
+        record = _span.get()
+        if record is not None:
+            record["attributes"].update(attributes)
+
+    def spans(self, run_id: str) -> list[dict]:
+        with self._lock:
+            return list(self._spans.get(run_id, []))
+
+    def extend(self, run_id: str, spans: list[dict]) -> None:
+        """Adds spans recorded elsewhere, e.g. in a worker process"""
+        with self._lock:
+            self._spans[run_id].extend(spans)
+
+    def clear(self, run_id: str) -> None:
+        with self._lock:
+            self._spans.pop(run_id, None)
+
+    def summary(self, run_id: str) -> dict:
+        """Aggregates the spans of a run by operation
+
+        Returns
+        ---
+        A document with the count, errors, total and percentile durations of
+        each operation as well as token and retry totals
+        """
+        spans = self.spans(run_id)
+        grouped = defaultdict(list)
+        for s in spans:
+            grouped[s["name"]].append(s)
+
+        operations = {}
+        for name, items in grouped.items():
+            durations = [s["duration"] for s in items]
+            operations[name] = {
+                "count": len(items),
+                "errors": sum(s["status"] == "error" for s in items),
+                "total_sec": sum(durations),
+                "p50_sec": percentile(durations, 50),
+                "p95_sec": percentile(durations, 95),
+                "max_sec": max(durations),
+            }
+            for attr in COUNTER_ATTRIBUTES:
+                total = sum(s["attributes"].get(attr) or 0 for s in items)
+                if total:
+                    operations[name][attr] = total
+
+        totals = {
+            attr: sum(s["attributes"].get(attr) or 0 for s in spans)
+            for attr in COUNTER_ATTRIBUTES
+        }
+
+        return {
+            "run_id": run_id,
+            "spans": len(spans),
+            "operations": operations,
+            "totals": totals,
+        }
+
+    def to_json(self, run_id: str) -> str:
+        return json.dumps(
+            {"summary": self.summary(run_id), "spans": self.spans(run_id)},
+            indent=2,
+            default=str,
+        )
+
+    def to_prometheus(self, run_id: str) -> str:
+        """Renders the summary of a run in the Prometheus text format"""
+        summary = self.summary(run_id)
+        prefix = "llm_browser"
+        lines = [
+            f"# HELP {prefix}_span_duration_seconds Duration of operations",
+            f"# TYPE {prefix}_span_duration_seconds summary",
+        ]
+
+        for name, op in summary["operations"].items():
+            labels = f'run_id="{run_id}",span="{name}"'
+            for q in (50, 95):
+                lines.append(
+                    f"{prefix}_span_duration_seconds"
+                    f'{{{labels},quantile="0.{q}"}} {op[f"p{q}_sec"]:.6f}'
+                )
+            lines.append(
+                f"{prefix}_span_duration_seconds_sum{{{labels}}} "
+                f"{op['total_sec']:.6f}"
+            )
+            lines.append(
+                f"{prefix}_span_duration_seconds_count{{{labels}}} "
+                f"{op['count']}"
+            )
+
+        lines += [
+            f"# HELP {prefix}_span_errors_total Failed operations",
+            f"# TYPE {prefix}_span_errors_total counter",
+        ]
+        for name, op in summary["operations"].items():
+            lines.append(
+                f'{prefix}_span_errors_total{{run_id="{run_id}",'
+                f'span="{name}"}} {op["errors"]}'
+            )
+
+        for attr, total in summary["totals"].items():
+            lines += [
+                f"# TYPE {prefix}_{attr}_total counter",
+                f'{prefix}_{attr}_total{{run_id="{run_id}"}} {total}',
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, run_id: str, fmt: str = "json") -> Path:
+        """Writes the metrics of a run to the results directory
+
+        Args
+        ---
+        - run_id: the run to export
+        - fmt: either `json` or `prometheus`
+        """
+        metrics_dir = results_dir / "metrics"
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+
+        if fmt == "prometheus":
+            fp = metrics_dir / f"{run_id}.prom"
+            content = self.to_prometheus(run_id)
+        elif fmt == "json":
+            fp = metrics_dir / f"{run_id}.json"
+            content = self.to_json(run_id)
+        else:
+            raise ValueError(f"unsupported metrics format: {fmt}")
+
+        with open(fp, mode="w") as f:
+            f.write(content)
+
+        logger.info(f"metrics saved to {fp.resolve()}")
+        return fp
+
+
+tracer = Tracer()
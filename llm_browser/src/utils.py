@@ -1,6 +1,7 @@
 """Truly generic helper functions"""
 
 import functools
+import hashlib
 import json
 import logging
 import os
@@ -10,10 +11,10 @@ from pathlib import Path
 from typing import Any, Callable, Tuple
 
 import requests
-from docling.document_converter import DocumentConverter
 from dotenv import load_dotenv
 
 from llm_browser.src.configs.config import RateLimit
+from llm_browser.src.tracing import tracer
 
 load_dotenv()
 
@@ -39,6 +40,16 @@ def chunk_string(input_string, max_length):
     return chunks
 
 
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of LLM tokens in a string (~4 chars each)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def url_key(url: str) -> str:
+    """Returns a short, filesystem safe key of a url"""
+    return hashlib.sha1(url.encode()).hexdigest()[:16]
+
+
 def split_string(input_string: str, sep: str):
     chunks = input_string.split(sep)
     return chunks
@@ -65,10 +76,11 @@ def post_response(content: str, webhook: str, title: str):
     chunks = split_string(post, sep="\n\n")
     delay = (1 / rate_limit.discord) + rate_limit.min_delay
 
-    for chunk in chunks:
-        json_result = {"content": chunk}
-        msg_resp = requests.post(url=webhook, json=json_result)
-        time.sleep(delay)
+    with tracer.span("discord.post", title=title, chunks=len(chunks)):
+        for chunk in chunks:
+            json_result = {"content": chunk}
+            msg_resp = requests.post(url=webhook, json=json_result)
+            time.sleep(delay)
 
 
 def post_notification(webhook: str = WEB_HOOK):
@@ -76,17 +88,19 @@ def post_notification(webhook: str = WEB_HOOK):
 
     Args
     ---
-    - webhook: the webhook to post a message to.
+    - webhook: the webhook to post a message to. A `webhook` keyword argument
+    passed to the decorated function overrides it for that call.
     """
 
     def decorator(func: Callable[..., Tuple[str, str]]):
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
+            hook = kwargs.pop("webhook", None) or webhook
             result, title = func(*args, **kwargs)
 
             # post result to webhook
-            post_response(content=result, webhook=webhook, title=title)
+            post_response(content=result, webhook=hook, title=title)
 
             return result
 
@@ -95,18 +109,130 @@ def post_notification(webhook: str = WEB_HOOK):
     return decorator
 
 
+def _parse_json_at(text: str, start: int) -> Any:
+    """Parses the JSON object or array opening at `start` in a single pass,
+    see `extract_json`. Raises `ValueError` if it cannot be parsed."""
+    closers = {"{": "}", "[": "]"}
+    chars: list[str] = []
+    stack: list[str] = []
+    # the output and open brackets after each complete value in a container
+    boundaries: list[tuple[int, list[str]]] = []
+    in_string = escaped = False
+
+    for ch in text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch in "\n\r\t":
+                ch = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}[ch]
+            chars.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in closers:
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack or closers[stack[-1]] != ch:
+                break
+            while chars and chars[-1].isspace():
+                chars.pop()
+            if chars and chars[-1] == ",":
+                chars.pop()
+            stack.pop()
+            chars.append(ch)
+            if not stack:
+                break
+            boundaries.append((len(chars), list(stack)))
+            continue
+        elif ch == ",":
+            boundaries.append((len(chars), list(stack)))
+        chars.append(ch)
+
+    if not stack:
+        candidates = [(len(chars), stack)]
+    else:
+        # truncated output, close it at the last complete value
+        if in_string:
+            chars.append('"')
+        candidates = [(len(chars), stack)] + boundaries[::-1]
+
+    for length, open_brackets in candidates:
+        partial = "".join(chars[:length]).rstrip().rstrip(",")
+        partial += "".join(closers[b] for b in reversed(open_brackets))
+        try:
+            return json.loads(partial)
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("could not parse json")
+
+
+def extract_json(text: str) -> Any:
+    """Extracts the first JSON object or array from LLM output. A fenced code
+    block is preferred, otherwise each `{` or `[` is tried in turn so that
+    brackets in the prose before the JSON are skipped. An array of plain
+    values, e.g. `[0, 1]` in "a score in [0, 1]", is only returned when
+    no object or array of objects follows it. Trailing commas and raw
+    newlines in strings are removed and truncated output is closed at the
+    last complete value.
+
+    Args
+    ---
+    - text: the LLM output
+
+    Returns
+    ---
+    The parsed JSON
+    """
+    starts = [m.start() for m in re.finditer(r"[\[{]", text)]
+    fence = re.search(r"```(?:json)?\s*([\[{])", text)
+    if fence:
+        starts.insert(0, fence.start(1))
+
+    fallback = None
+    for start in starts:
+        try:
+            value = _parse_json_at(text, start)
+        except ValueError:
+            continue
+        if isinstance(value, dict) or any(
+            isinstance(v, (dict, list)) for v in value
+        ):
+            return value
+        if fallback is None:
+            fallback = value
+    if fallback is not None:
+        return fallback
+
+    # JSON that was itself escaped as a string, e.g. {\"key\": 1}
+    if '\\"' in text:
+        return extract_json(re.sub(r"\\n\s*", " ", text).replace('\\"', '"'))
+    raise ValueError("could not parse json")
+
+
 def string_to_dict(texts: list[str]):
+    """Returns the JSON parsed from the first text that contains any"""
     for text in texts:
         try:
-            text = text.split("```json")[1].split("```")[0].strip()
-            fixed_json = re.sub(r"(\\n|\n)\s*|\\", "", text)
-            json_res: dict = json.loads(fixed_json)
-            return json_res
-        except Exception as e:
+            return extract_json(text)
+        except (ValueError, json.JSONDecodeError):
             continue
     raise ValueError("could not parse json")
 
 
+@functools.cache
+def get_converter():
+    """Returns the process' document converter, created on first use because
+    loading docling's models is slow"""
+    from docling.document_converter import DocumentConverter
+
+    return DocumentConverter()
+
+
 def convert_document(sp: Path | str, fp: Path | str):
     """Converts a document to AI-ready format.
 
@@ -115,7 +241,7 @@ def convert_document(sp: Path | str, fp: Path | str):
     - sp: path to the source document
     - fp: path to save the result
     """
-    converter = DocumentConverter()
+    converter = get_converter()
     result = converter.convert(sp)
     file = result.document.export_to_markdown()
 
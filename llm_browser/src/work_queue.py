@@ -0,0 +1,273 @@
+"""Lease-based task queue on MongoDB shared by any number of workers"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from llm_browser.src.database import get_mongodb_client
+from llm_browser.src.tasks import TaskStatus
+from llm_browser.src.utils import set_logging
+
+set_logging()
+logger = logging.getLogger(__name__)
+
+visibility_timeout = int(os.environ.get("QUEUE_VISIBILITY_TIMEOUT", 900))
+max_attempts = int(os.environ.get("QUEUE_MAX_ATTEMPTS", 3))
+
+
+def _now() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+class LeaseLost(RuntimeError):
+    """Raised when a worker's lease on a task expired or was taken by another
+    worker, so that it stops before saving or posting duplicate results"""
+
+
+class WorkQueue:
+    """Queue of urls stored in the `task_queue` collection. A worker claims a
+    task by atomically leasing it. A lease that is not renewed by heartbeats
+    expires after the visibility timeout, and the task can then be claimed by
+    another worker until it runs out of attempts.
+
+    Args
+    ---
+    - collection: the collection holding the queue
+    - visibility_timeout: seconds a lease lasts without a heartbeat
+    - max_attempts: claims allowed before a task is marked as failed
+    """
+
+    def __init__(
+        self,
+        collection: str = "task_queue",
+        visibility_timeout: int = visibility_timeout,
+        max_attempts: int = max_attempts,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.client = get_mongodb_client()
+        self.coll = self.client[os.environ.get("_MONGO_DB")][collection]
+        self.coll.create_index([("url", ASCENDING)], unique=True)
+        self.coll.create_index(
+            [("status", ASCENDING), ("available_at", ASCENDING)]
+        )
+
+    def close(self) -> None:
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def enqueue(self, tasks: list[tuple], batch_id: str) -> int:
+        """Adds tasks to the queue, resetting those already in it unless they
+        are currently leased
+
+        Args
+        ---
+        - tasks: tuples of url, title and task name
+        - batch_id: identifies this round of tasks, used to checkpoint them
+
+        Returns
+        ---
+        The number of tasks queued
+        """
+        now = _now()
+        operations = [
+            UpdateOne(
+                {"url": url, "status": {"$ne": TaskStatus.LEASED.value}},
+                {
+                    "$set": {
+                        "title": title,
+                        "task": task,
+                        "batch_id": batch_id,
+                        "status": TaskStatus.PENDING.value,
+                        "attempts": 0,
+                        "available_at": now,
+                        "error": None,
+                    }
+                },
+                upsert=True,
+            )
+            for url, title, task in tasks
+        ]
+        if not operations:
+            return 0
+
+        try:
+            result = self.coll.bulk_write(operations, ordered=False)
+            queued = result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            # leased tasks fail the upsert on the unique url index
+            details = e.details
+            queued = details["nUpserted"] + details["nModified"]
+            skipped = len(details["writeErrors"])
+            logger.info(f"skipped {skipped} tasks that are being processed")
+
+        logger.info(f"queued {queued} tasks in {batch_id=}")
+        return queued
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """Leases the next available task, including tasks whose lease expired
+        because their worker died
+
+        Returns
+        ---
+        The claimed task or None if the queue is empty
+        """
+        now = _now()
+        self.coll.update_many(
+            {
+                "status": TaskStatus.LEASED.value,
+                "lease_expires": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {"$set": {"status": TaskStatus.FAILED.value}},
+        )
+
+        return self.coll.find_one_and_update(
+            {
+                "$or": [
+                    {
+                        "status": TaskStatus.PENDING.value,
+                        "available_at": {"$lte": now},
+                    },
+                    {
+                        "status": TaskStatus.LEASED.value,
+                        "lease_expires": {"$lt": now},
+                    },
+                ],
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {
+                    "status": TaskStatus.LEASED.value,
+                    "worker_id": worker_id,
+                    "claimed_at": now,
+                    "lease_expires": now
+                    + timedelta(seconds=self.visibility_timeout),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def unfinished(self) -> int:
+        """The number of tasks that may still be claimed: pending ones,
+        including those delayed by a backoff, and leased ones that could be
+        returned to the queue"""
+        return self.coll.count_documents(
+            {
+                "status": {
+                    "$in": [
+                        TaskStatus.PENDING.value,
+                        TaskStatus.LEASED.value,
+                    ]
+                },
+                "attempts": {"$lt": self.max_attempts},
+            }
+        )
+
+    def _update_lease(self, task: dict, update: dict) -> bool:
+        result = self.coll.update_one(
+            {
+                "_id": task["_id"],
+                "worker_id": task["worker_id"],
+                "status": TaskStatus.LEASED.value,
+            },
+            {"$set": update},
+        )
+        return result.matched_count == 1
+
+    def heartbeat(self, task: dict) -> bool:
+        """Extends the lease of a task
+
+        Returns
+        ---
+        False if the lease was lost to another worker
+        """
+        expires = _now() + timedelta(seconds=self.visibility_timeout)
+        return self._update_lease(task, {"lease_expires": expires})
+
+    def complete(self, task: dict) -> bool:
+        """Marks a leased task as done"""
+        return self._update_lease(
+            task, {"status": TaskStatus.DONE.value, "finished_at": _now()}
+        )
+
+    def fail(self, task: dict, error: str, delay: int = 0) -> bool:
+        """Returns a task to the queue after `delay` seconds, or marks it as
+        failed once it ran out of attempts"""
+        if task["attempts"] >= self.max_attempts:
+            update = {"status": TaskStatus.FAILED.value, "error": error}
+        else:
+            update = {
+                "status": TaskStatus.PENDING.value,
+                "available_at": _now() + timedelta(seconds=delay),
+                "error": error,
+            }
+        return self._update_lease(task, update)
+
+
+class Heartbeat:
+    """Renews the lease of a task in a background thread while it runs. Once
+    a renewal finds the lease taken, or no renewal succeeded for the
+    visibility timeout, the lease is lost and `check` raises `LeaseLost`.
+
+    Example
+    ---
+    ```
+    with Heartbeat(queue, task) as heartbeat:
+        do_work(task)
+        heartbeat.check()
+        queue.complete(task)
+    ```
+    """
+
+    def __init__(self, queue: WorkQueue, task: dict):
+        self.queue = queue
+        self.task = task
+        self.interval = queue.visibility_timeout / 3
+        self.lost = threading.Event()
+        self._renewed = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.task):
+                    logger.warning(f"lost the lease on {self.task['url']}")
+                    self.lost.set()
+                    return
+                self._renewed = time.monotonic()
+            except Exception as e:
+                logger.exception(f"heartbeat failed: {e}")
+
+    @property
+    def expired(self) -> bool:
+        """Whether the lease was lost or may have expired unrenewed"""
+        unrenewed = time.monotonic() - self._renewed
+        return self.lost.is_set() or unrenewed > self.queue.visibility_timeout
+
+    def check(self) -> None:
+        """Raises `LeaseLost` if the lease expired"""
+        if self.expired:
+            raise LeaseLost(f"lost the lease on {self.task['url']}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
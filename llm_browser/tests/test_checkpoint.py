@@ -0,0 +1,68 @@
+import pytest
+
+from llm_browser.src import checkpoint
+from llm_browser.src.checkpoint import Checkpoint
+from llm_browser.src.memory_mongo import MemoryMongoClient
+from llm_browser.src.tasks import Stage
+
+URL = "https://example.com/jobs"
+RESULTS = [{"run_id": "scrape-1", "roles": [{"title": "Engineer"}]}]
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """The clients opened by the checkpoints, all backed by one database"""
+    client = MemoryMongoClient()
+    opened = []
+
+    def get_mongodb_client():
+        opened.append(client)
+        return client
+
+    monkeypatch.setenv("_MONGO_DB", "test")
+    monkeypatch.setattr(checkpoint, "get_mongodb_client", get_mongodb_client)
+    return opened
+
+
+def test_mark_and_done(clients):
+    with Checkpoint("run-1") as progress:
+        assert not progress.done(URL, Stage.SCRAPED)
+        assert progress.results(URL) is None
+
+        progress.mark(URL, Stage.SCRAPED, results=RESULTS)
+        progress.mark(URL, Stage.SCORED, response="scored")
+
+        assert progress.done(URL, Stage.SCRAPED)
+        assert progress.done(URL, Stage.SCORED)
+        assert not progress.done(URL, Stage.POSTED)
+        assert progress.results(URL) == RESULTS
+        assert progress.get(URL)["response"] == "scored"
+
+    # one client for the whole checkpoint
+    assert len(clients) == 1
+    doc = clients[0]["test"]["checkpoints"].find_one({"url": URL})
+    assert doc["run_id"] == "run-1"
+    assert set(doc["stages"]) == {"scraped", "scored"}
+
+
+def test_resume(clients):
+    with Checkpoint("run-1") as progress:
+        progress.mark(URL, Stage.SCRAPED, results=RESULTS)
+        progress.mark(f"{URL}/2", Stage.POSTED)
+    with Checkpoint("run-2") as other:
+        other.mark(URL, Stage.POSTED)
+
+    with Checkpoint("run-1", resume=True) as resumed:
+        assert resumed.results(URL) == RESULTS
+        assert not resumed.done(URL, Stage.POSTED)
+        assert resumed.done(f"{URL}/2", Stage.POSTED)
+
+        # the resumed run picks up where it stopped
+        resumed.mark(URL, Stage.POSTED)
+    assert Checkpoint("run-1", resume=True).done(URL, Stage.POSTED)
+
+    # a new run starts from scratch and a worker loads its url only
+    assert Checkpoint("run-1").results(URL) is None
+    only = Checkpoint("run-1", resume=True, urls=[f"{URL}/2"])
+    assert only.results(URL) is None
+    assert only.done(f"{URL}/2", Stage.POSTED)
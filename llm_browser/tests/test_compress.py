@@ -0,0 +1,55 @@
+from llm_browser.src.llm.compress import Compressor, normalize, truncate
+
+EEO = (
+    "We are an equal opportunity employer and value diversity. All qualified "
+    "applicants will receive consideration for employment."
+)
+
+
+def test_normalize_removes_widget_text():
+    text = "Build   pipelines\n\n\n  with Spark  \nShow more\n"
+    assert normalize(text) == "Build pipelines\nwith Spark"
+
+
+def test_compressor_strips_repeated_paragraphs():
+    roles = [
+        {
+            "title": f"Data Engineer {i}",
+            "description": f"Build pipelines in Spark for team number {i}.\n"
+            f"\n{EEO}\nShow more",
+        }
+        for i in range(3)
+    ]
+    compressor = Compressor(min_count=3, max_tokens=None, persist=False)
+    compressor.learn_roles(roles)
+    compressed, before, after = compressor.compress_roles(roles)
+
+    assert compressed[1]["description"] == (
+        "Build pipelines in Spark for team number 1."
+    )
+    assert compressed[1]["title"] == "Data Engineer 1"
+    assert EEO in roles[1]["description"]
+    assert after < before
+
+
+def test_compressor_counts_each_description_once():
+    role = {
+        "title": "Data Engineer",
+        "description": f"Build pipelines in Spark for the payments team.\n"
+        f"\n{EEO}",
+    }
+    compressor = Compressor(min_count=3, max_tokens=None, persist=False)
+    for _ in range(3):
+        compressor.learn_roles([role, dict(role)])
+        compressed, _, _ = compressor.compress_roles([role])
+
+    assert compressed[0]["description"] == role["description"].replace(
+        "\n\n", "\n"
+    )
+    assert len(compressor.learnt) == 1
+
+
+def test_truncate_caps_tokens():
+    text = "word " * 100
+    assert len(truncate(text, max_tokens=10)) <= 44
+    assert truncate("short", max_tokens=10) == "short"
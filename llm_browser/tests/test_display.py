@@ -0,0 +1,73 @@
+import os
+import socket
+
+import pytest
+
+from llm_browser.src.browser import display
+from llm_browser.src.browser.display import (
+    HEADED,
+    HEADLESS,
+    XVFB,
+    ProcessUsage,
+    launch_options,
+    listening_pid,
+    mode_for,
+    resolve_mode,
+)
+
+POLICY = "linkedin.com=xvfb, jobs.google.com=headed,google.com=headless"
+
+
+def test_mode_for_uses_most_specific_domain():
+    assert mode_for("https://www.linkedin.com/jobs", POLICY) == XVFB
+    assert mode_for("https://jobs.google.com/x", POLICY) == HEADED
+    assert mode_for("https://www.google.com/search", POLICY) == HEADLESS
+    assert mode_for("https://example.com", POLICY, default=HEADED) == HEADED
+
+    with pytest.raises(ValueError):
+        mode_for("https://example.com", "example.com=visible")
+
+
+def test_resolve_mode_falls_back(monkeypatch):
+    monkeypatch.delenv("DISPLAY", raising=False)
+    monkeypatch.setattr(display.sys, "platform", "linux")
+
+    monkeypatch.setattr(display.shutil, "which", lambda _: "/usr/bin/Xvfb")
+    assert resolve_mode(HEADED) == XVFB
+
+    monkeypatch.setattr(display.shutil, "which", lambda _: None)
+    assert resolve_mode(HEADED) == HEADLESS
+    assert resolve_mode(XVFB) == HEADLESS
+
+    monkeypatch.setenv("DISPLAY", ":0")
+    assert resolve_mode(XVFB) == HEADED
+
+
+def test_stealth_launch_options():
+    options = launch_options(HEADLESS, args=["--enable-automation", "--a"])
+
+    assert options["headless"] is True
+    assert "--enable-automation" not in options["args"]
+    assert "--enable-automation" in options["ignore_default_args"]
+    assert "--headless=new" in options["args"]
+    assert launch_options(HEADED, args=["--a"])["headless"] is False
+
+
+def test_process_usage_samples_process_tree():
+    usage = ProcessUsage({os.getpid()})
+    usage.sample()
+    summary = usage.summary()
+
+    assert summary["peak_rss_mb"] > 0
+    assert summary["cpu_sec"] > 0
+
+
+def test_listening_pid_finds_local_endpoint():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        port = server.getsockname()[1]
+
+        assert listening_pid(f"http://127.0.0.1:{port}") == os.getpid()
+    assert listening_pid(f"http://127.0.0.1:{port}") is None
+    assert listening_pid("ws://browser.internal:9222/devtools") is None
@@ -0,0 +1,28 @@
+from llm_browser.src import documents
+
+
+def test_convert_documents_uses_cache(tmp_path, monkeypatch):
+    converted = []
+
+    def convert(path):
+        converted.append(path)
+        return f"# {path}"
+
+    monkeypatch.setattr(documents, "_convert", convert)
+    sources = []
+    for name, content in [("a.pdf", b"resume a"), ("b.pdf", b"resume b")]:
+        source = tmp_path / name
+        source.write_bytes(content)
+        sources.append(source)
+
+    cache_dir = tmp_path / "cache"
+    first = documents.convert_documents(
+        sources, out_dir=tmp_path / "out", workers=1, cache_dir=cache_dir
+    )
+    second = documents.convert_documents(
+        sources, workers=1, cache_dir=cache_dir
+    )
+
+    assert len(converted) == 2
+    assert first == second
+    assert (tmp_path / "out" / "a.md").read_text() == f"# {sources[0]}"
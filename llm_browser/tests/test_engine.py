@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from llm_browser.src.browser.engine import LoopRunner
+from llm_browser.src.tracing import tracer
+
+
+@pytest.fixture
+def runner():
+    runner = LoopRunner()
+    yield runner
+    runner.close()
+
+
+def test_run_keeps_tracer_context(runner):
+    async def scrape():
+        with tracer.span("scrape", url="https://test"):
+            await asyncio.sleep(0)
+        return tracer.run_id
+
+    with tracer.run("engine-test"):
+        assert runner.run(scrape()) == "engine-test"
+    assert [s["name"] for s in tracer.spans("engine-test")] == ["scrape"]
+    tracer.clear("engine-test")
+
+
+def test_run_cancels_on_timeout(runner):
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(TimeoutError):
+        runner.run(slow(), timeout=0.05)
+    runner.run(asyncio.sleep(0.05))
+    assert cancelled == [True]
+
+
+def test_iterate_yields_and_closes_early(runner):
+    closed = []
+
+    async def roles():
+        try:
+            for i in range(5):
+                await asyncio.sleep(0)
+                yield i
+        finally:
+            closed.append(True)
+
+    assert list(runner.iterate(roles())) == [0, 1, 2, 3, 4]
+
+    for i in runner.iterate(roles()):
+        if i == 1:
+            break
+    assert closed == [True, True]
+
+
+def test_iterate_timeout_cleans_up(runner):
+    closed = []
+
+    async def roles():
+        try:
+            yield 0
+            await asyncio.sleep(10)
+            yield 1
+        finally:
+            # cleanup that awaits, such as closing a page
+            await asyncio.sleep(0.1)
+            closed.append(True)
+
+    items = []
+    with pytest.raises(TimeoutError):
+        for i in runner.iterate(roles(), timeout=0.5):
+            items.append(i)
+    assert items == [0]
+    assert closed == [True]
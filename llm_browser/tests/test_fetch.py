@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from llm_browser.src.browser.fetch import (
+    HttpFetcher,
+    NeedsBrowser,
+    fetch_linkedin_public,
+)
+from llm_browser.src.browser.politeness import Politeness
+
+
+def card(job_id: int) -> str:
+    return f"""
+    <li><div class="base-search-card" data-entity-urn="urn:li:jobPosting:{job_id}">
+      <h3 class="base-search-card__title"> Engineer {job_id} </h3>
+      <h4 class="base-search-card__subtitle">Company {job_id}</h4>
+      <span class="job-search-card__location">Nairobi</span>
+    </div></li>"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    flaky = 0
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/jobs/search":
+            ul = "".join(card(i) for i in (1, 2))
+            self.reply(f'<ul class="jobs-search__results-list">{ul}</ul>')
+        elif url.path.endswith("seeMoreJobPostings/search"):
+            start = int(query["start"][0])
+            self.reply(card(2) + card(3) if start == 2 else "")
+        elif "/jobPosting/" in url.path:
+            job_id = url.path.rsplit("/", 1)[-1]
+            if job_id == "3" and StubHandler.flaky == 0:
+                StubHandler.flaky += 1
+                return self.reply("unavailable", status=503)
+            self.reply(
+                '<div class="description__text"><p>About the role '
+                f"{job_id}</p><button>Show more</button></div>"
+            )
+        elif url.path == "/jobs/rendered":
+            self.reply("<div id='root'></div><script>app()</script>")
+        else:
+            self.reply("", status=999)
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def fetch(url: str, **kwargs) -> list[dict]:
+    fetcher = HttpFetcher(retries=1, controllers=Politeness(min_delay=0))
+
+    async def run():
+        try:
+            return await fetch_linkedin_public(url, fetcher=fetcher, **kwargs)
+        finally:
+            await fetcher.aclose()
+
+    return asyncio.run(run())
+
+
+def test_fetch_linkedin_public(stub_server):
+    roles = fetch(f"{stub_server}/jobs/search?keywords=python")
+
+    assert [r["title"] for r in roles] == [
+        "Engineer 1",
+        "Engineer 2",
+        "Engineer 3",
+    ]
+    assert roles[0]["company"] == "Company 1"
+    assert roles[0]["location"] == "Nairobi"
+    # the posting that failed once was retried
+    assert roles[2]["description"].startswith("About the role 3")
+
+    assert len(fetch(f"{stub_server}/jobs/search?q=x", limit=1)) == 1
+
+
+def test_fetch_needs_browser(stub_server):
+    with pytest.raises(NeedsBrowser):
+        fetch(f"{stub_server}/jobs/rendered")
+    with pytest.raises(NeedsBrowser):
+        fetch(f"{stub_server}/jobs/challenge")
+
+
+def test_challenge_backs_off_the_domain(stub_server):
+    controllers = Politeness(min_delay=0)
+    fetcher = HttpFetcher(retries=0, controllers=controllers)
+
+    async def run():
+        try:
+            return await fetcher.get(f"{stub_server}/jobs/challenge")
+        finally:
+            await fetcher.aclose()
+
+    assert asyncio.run(run()).status_code == 999
+    controller = controllers.for_url(stub_server)
+    assert controller.counts["throttled"] == 1
+    assert controller.counts["ok"] == 0
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from llm_browser.src.browser.har import (
+    RECORD,
+    REPLAY,
+    context_options,
+    har_path,
+    route_har,
+)
+
+URL = "https://www.linkedin.com/jobs/search?keywords=python"
+
+
+class FakeContext:
+    def __init__(self):
+        self.routes = []
+
+    async def route_from_har(self, path, not_found: str = "abort"):
+        self.routes.append((path, not_found))
+
+
+def test_context_options_record_only(tmp_path):
+    options = context_options(URL, RECORD, tmp_path)
+    assert options == {
+        "record_har_path": str(har_path(URL, tmp_path)),
+        "record_har_mode": "full",
+    }
+    assert options["record_har_path"].endswith(".zip")
+    assert har_path(URL, tmp_path).parent.is_dir()
+
+    assert context_options(URL, REPLAY, tmp_path) == {}
+    assert context_options(URL, None, tmp_path) == {}
+
+
+def test_route_har_replays_recorded_urls(tmp_path):
+    context = FakeContext()
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(route_har(context, URL, REPLAY, tmp_path))
+
+    path = har_path(URL, tmp_path)
+    path.write_bytes(b"")
+    asyncio.run(route_har(context, URL, REPLAY, tmp_path))
+    assert context.routes == [(path, "abort")]
+
+    # recording and plain runs use the network
+    asyncio.run(route_har(context, URL, RECORD, tmp_path))
+    asyncio.run(route_har(context, URL, None, tmp_path))
+    assert len(context.routes) == 1
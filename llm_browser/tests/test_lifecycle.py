@@ -0,0 +1,104 @@
+import asyncio
+import os
+
+import psutil
+import pytest
+
+from llm_browser.src.browser import lifecycle
+from llm_browser.src.browser.lifecycle import ManagedContext, renderer_rss
+
+
+class FakePage:
+    url = "https://example.com/jobs?page=3"
+    closed = False
+
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, storage_state=None):
+        self.storage_state_ = storage_state or {"cookies": ["session"]}
+        self.closed = False
+        self.pages = []
+
+    async def new_page(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+    async def storage_state(self):
+        return self.storage_state_
+
+    async def close(self):
+        self.closed = True
+
+
+def test_renderer_rss_counts_only_renderers():
+    # the test process is not a renderer
+    assert renderer_rss({psutil.Process(os.getpid())}) == 0
+
+
+def test_recycle_carries_session_over(monkeypatch):
+    opened = []
+
+    async def new_context(browser, **options):
+        opened.append(FakeContext(options.get("storage_state")))
+        return opened[-1]
+
+    monkeypatch.setattr(lifecycle, "new_context", new_context)
+    monkeypatch.setattr(lifecycle, "browser_processes", lambda _: set())
+
+    async def run():
+        context = ManagedContext(None, max_navigations=2, max_rss_mb=None)
+        await context.start()
+        assert not context.needs_recycle()
+
+        context.navigations = 2
+        assert context.needs_recycle()
+        await context.recycle()
+        await context.close()
+        return context
+
+    context = asyncio.run(run())
+    assert len(opened) == 2 and opened[0].closed and opened[1].closed
+    assert opened[1].storage_state_ == {"cookies": ["session"]}
+    assert context.navigations == 0
+    assert context.report()["recycles"] == 1
+
+
+def test_har_recording_disables_recycling():
+    context = ManagedContext(None, record_har_path="a.har")
+    context.navigations = 10**6
+    assert not context.needs_recycle()
+
+
+def test_reopen_navigates_through_the_scraper(monkeypatch):
+    opened = []
+
+    async def new_context(browser, **options):
+        opened.append(FakeContext(options.get("storage_state")))
+        return opened[-1]
+
+    monkeypatch.setattr(lifecycle, "new_context", new_context)
+    visited = []
+
+    async def navigate(page, url):
+        visited.append(url)
+        if len(visited) > 1:
+            raise RuntimeError("blocked")
+
+    async def run():
+        context = ManagedContext(None, max_rss_mb=None)
+        await context._open()
+        page = await context.reopen(FakePage(), navigate)
+        assert not page.closed
+        with pytest.raises(RuntimeError):
+            await context.reopen(page, navigate)
+
+    asyncio.run(run())
+    assert visited == [FakePage.url] * 2
+    # the page opened for a reload that failed is closed
+    assert opened[-1].pages[0].closed
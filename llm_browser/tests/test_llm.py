@@ -6,7 +6,10 @@ import pytest
 import requests
 from dotenv import load_dotenv
 
+from llm_browser.src.llm.fake import FakeChatModel, FakeRateLimitError
 from llm_browser.src.llm.models import models
+from llm_browser.src.llm.query import parse_roles
+from llm_browser.src.llm.router import LLMRouter, ModelStats
 from llm_browser.src.utils import set_logging
 
 load_dotenv()
@@ -53,3 +56,97 @@ def test_ollama_langchain():
     logger.info(f"{model_name} LLM answer: {answer}")
     logger.info(f"Response time: {end - start:.2f} seconds")
     assert answer.__contains__("Rayleigh scattering")
+
+
+def test_fake_model_is_deterministic():
+    messages = [("system", "Score the roles."), ("human", "roles: []")]
+    outcomes = []
+    for _ in range(2):
+        model = FakeChatModel(latency=0, rate_limit_rate=0.3, seed=42)
+        run = []
+        for _ in range(20):
+            try:
+                msg = model.invoke(messages)
+                run.append(msg.usage_metadata["output_tokens"])
+            except FakeRateLimitError as e:
+                run.append(e.status_code)
+        outcomes.append(run)
+
+    assert outcomes[0] == outcomes[1]
+    assert 429 in outcomes[0]
+
+
+def test_fake_model_rpm():
+    model = FakeChatModel(latency=0, rpm=3)
+    for _ in range(3):
+        model.invoke([("human", "hello")])
+    with pytest.raises(FakeRateLimitError):
+        model.invoke([("human", "hello")])
+
+
+def test_parse_roles_repairs_output():
+    roles = '[{"job_title": "Data Engineer", "location": "Remote"}]'
+    model = FakeChatModel(latency=0, response=roles)
+
+    assert parse_roles(roles + " trailing text") == [
+        {"job_title": "Data Engineer", "location": "Remote"}
+    ]
+    # keys outside the schema are kept without a repair
+    assert parse_roles('[{"title": "Data Engineer", "salary": "90k"}]') == [
+        {"title": "Data Engineer", "salary": "90k"}
+    ]
+    assert parse_roles('[{"job_title": {"name": "x"}}]', model=model) == [
+        {"job_title": "Data Engineer", "location": "Remote"}
+    ]
+    assert parse_roles('["not a role"]', model=model) == [
+        {"job_title": "Data Engineer", "location": "Remote"}
+    ]
+    with pytest.raises(ValueError):
+        parse_roles("no roles at all")
+
+
+def test_router_fails_over_and_opens_circuit():
+    broken = FakeChatModel(model="broken", latency=0, error_rate=1.0)
+    healthy = FakeChatModel(model="healthy", latency=0, response="ok")
+    router = LLMRouter(
+        {"broken": broken, "healthy": healthy}, failure_threshold=2
+    )
+
+    for _ in range(3):
+        assert router.invoke([("human", "hello")]).content == "ok"
+
+    assert not router.stats["broken"].available
+    assert router.ranked() == ["healthy"]
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    stats = ModelStats(failure_threshold=1, cooldown=60)
+    assert stats.acquire() and stats.acquire()
+    stats.record(0.1, ok=False)
+    assert not stats.acquire()
+
+    stats.cooldown = 0
+    assert stats.acquire()
+    # every other request waits for the trial
+    assert not stats.acquire()
+    assert not stats.available
+
+    # a failed trial opens the circuit again, a successful one closes it
+    stats.record(0.1, ok=False)
+    assert stats.acquire()
+    stats.record(0.1, ok=True)
+    assert stats.acquire() and stats.acquire()
+
+
+def test_router_hedges_slow_requests():
+    slow = FakeChatModel(model="slow", latency=0.05, response="slow")
+    fast = FakeChatModel(model="fast", latency=0, response="fast")
+    router = LLMRouter(
+        {"slow": slow, "fast": fast}, min_hedge_delay=0.01, min_samples=3
+    )
+    for _ in range(3):
+        router.stats["slow"].record(0.01, ok=True)
+    router.stats["fast"].record(1.0, ok=True)
+
+    assert router.ranked()[0] == "slow"
+    assert router.invoke([("human", "hello")]).content == "fast"
@@ -0,0 +1,73 @@
+import base64
+import io
+
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+from PIL import Image
+
+from llm_browser.src.browser.payload import (
+    downscale,
+    image_tokens,
+    media_type,
+    prune_tree,
+)
+
+
+def element(tag: str, children: list, visible=True, index=None):
+    node = DOMElementNode(
+        is_visible=visible,
+        parent=None,
+        tag_name=tag,
+        xpath=f"//{tag}",
+        attributes={},
+        children=children,
+        highlight_index=index,
+    )
+    for child in children:
+        child.parent = node
+    return node
+
+
+def text(value: str, visible=True) -> DOMTextNode:
+    return DOMTextNode(is_visible=visible, parent=None, text=value)
+
+
+def png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_prune_tree_keeps_interactive_elements():
+    button = element("button", [text("Apply")], index=0)
+    hidden_link = element("a", [text("Jobs", visible=False)], index=1)
+    root = element(
+        "body",
+        [
+            element("div", [element("span", [button])]),
+            element("script", [text("app()")]),
+            element("div", [text("   ")], visible=False),
+            element("iframe", [element("button", [], index=2)]),
+            element("p", [text("x" * 50)]),
+            hidden_link,
+        ],
+    )
+
+    assert prune_tree(root, max_text_chars=10)
+    assert [c.tag_name for c in root.children] == ["div", "iframe", "p", "a"]
+    assert root.children[0].children[0].children == [button]
+    assert root.children[2].children[0].text == "x" * 10 + "..."
+    # interactive elements are kept even when empty
+    assert hidden_link.children == []
+
+
+def test_downscale_and_image_tokens():
+    screenshot = png(1000, 600)
+
+    scaled = downscale(screenshot, scale=0.5, fmt="png", quality=60)
+    assert media_type(scaled) == "image/png"
+    assert image_tokens(scaled) == (500, 300, 500 * 300 // 750)
+
+    jpeg = downscale(screenshot, scale=1, fmt="jpeg", quality=60)
+    assert media_type(jpeg) == "image/jpeg"
+    assert image_tokens(jpeg)[:2] == (1000, 600)
+    assert base64.b64decode(jpeg)[:2] == b"\xff\xd8"
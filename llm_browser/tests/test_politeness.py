@@ -0,0 +1,65 @@
+import asyncio
+import pickle
+
+import pytest
+
+from llm_browser.src.browser import politeness
+from llm_browser.src.browser.politeness import (
+    CAPTCHA,
+    THROTTLED,
+    CaptchaError,
+    DomainController,
+    Politeness,
+    request_slot,
+)
+
+
+def test_controller_backs_off_and_ramps_up():
+    controller = DomainController(
+        "linkedin.com", max_concurrency=4, min_delay=0, slow_seconds=5
+    )
+    assert controller.try_acquire() == 0
+    controller.release(blocked=THROTTLED, retry_after=30)
+    assert controller.limit == 2
+    assert controller.cooldown() > 25
+    assert controller.try_acquire() > 25
+
+    controller.cooldown_until = 0
+    for _ in range(2):
+        assert controller.try_acquire() == 0
+    assert controller.try_acquire() > 0  # both slots are taken
+    controller.release(latency=1)
+    controller.release(latency=1)
+    assert controller.limit == 3
+
+    controller.try_acquire()
+    controller.release(latency=6)
+    assert controller.limit == 1
+    assert controller.report()["slow"] == 1
+
+
+def test_controller_spaces_request_starts():
+    controller = DomainController("google.com", min_delay=5)
+    assert controller.try_acquire() == 0
+    assert 4 < controller.try_acquire() <= 5
+
+
+def test_captcha_fails_fast(monkeypatch):
+    monkeypatch.setattr(politeness, "captcha_cooldown", 120)
+    controllers = Politeness(min_delay=0)
+
+    async def run():
+        async with request_slot("https://www.google.com/x", controllers):
+            raise CaptchaError("https://www.google.com/x")
+
+    with pytest.raises(CaptchaError):
+        asyncio.run(run())
+
+    controller = controllers.for_url("https://google.com/y")
+    assert controller.in_flight == 0
+    assert controller.report()[CAPTCHA] == 1
+    assert controller.cooldown() > 100
+
+    # crosses the process boundary of the pool
+    error = pickle.loads(pickle.dumps(CaptchaError("https://google.com")))
+    assert error.kind == CAPTCHA and error.url == "https://google.com"
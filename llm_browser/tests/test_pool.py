@@ -0,0 +1,151 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from llm_browser.src.browser import pool
+from llm_browser.src.browser.politeness import (
+    THROTTLED,
+    BlockedError,
+    Politeness,
+)
+
+MB = 1024 * 1024
+
+
+def test_worker_count(monkeypatch):
+    monkeypatch.setattr(pool.os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(
+        pool.psutil,
+        "virtual_memory",
+        lambda: SimpleNamespace(available=4096 * MB),
+    )
+
+    assert pool.worker_count(4, jobs=10, memory_mb=512) == 4
+    # capped by the jobs, the cores and the memory in turn
+    assert pool.worker_count(4, jobs=2, memory_mb=512) == 2
+    assert pool.worker_count(16, jobs=20, memory_mb=256) == 8
+    assert pool.worker_count(4, jobs=10, memory_mb=2048) == 2
+    # at least one worker runs whatever is left
+    assert pool.worker_count(4, jobs=10, memory_mb=8192) == 1
+    assert pool.worker_count(0, jobs=0) == 1
+
+
+class FakeBrowser:
+    def __init__(self, url: str, mode: str = None):
+        self.page = SimpleNamespace(url="https://www.linkedin.com/login")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def new_context(self):
+        async def new_page():
+            return self.page
+
+        return SimpleNamespace(new_page=new_page)
+
+
+@pytest.mark.parametrize("logged_in", [True, False])
+def test_login_state_saved_only_when_logged_in(
+    monkeypatch, tmp_path, logged_in
+):
+    saved = []
+    monkeypatch.setattr(pool, "linkedin_state", tmp_path / "state.json")
+    monkeypatch.setattr(pool, "SyncBrowser", FakeBrowser)
+    monkeypatch.setattr(pool, "login_linkedin", lambda page: logged_in)
+    monkeypatch.setattr(pool, "save_login_state", saved.append)
+
+    pool.ensure_login_state()
+
+    assert len(saved) == int(logged_in)
+
+
+def test_recent_login_state_is_reused(monkeypatch, tmp_path):
+    state = tmp_path / "state.json"
+    state.write_text("{}")
+    monkeypatch.setattr(pool, "linkedin_state", state)
+    monkeypatch.setattr(pool, "SyncBrowser", None)
+
+    pool.ensure_login_state()
+
+
+class ThreadExecutor(ThreadPoolExecutor):
+    """Runs the pool's jobs in threads so that the test can fake the
+    workers' browsers"""
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        super().__init__(max_workers, initializer=initializer)
+
+
+def start_fake_worker() -> None:
+    pool._worker["context"] = SimpleNamespace(needs_recycle=lambda: False)
+
+
+calls = Counter()
+
+
+def scrape(browser_context, url_content: tuple, run_id: str) -> str:
+    url = url_content[0]
+    calls[url] += 1
+    if "blocked" in url or ("flaky" in url and calls[url] == 1):
+        raise BlockedError(url, THROTTLED)
+    if "broken" in url:
+        raise ValueError(url)
+    if "partial" in url and (calls[url] == 1 or "always" in url):
+        return f"{run_id}: partial"
+    return f"{run_id}: {url}"
+
+
+def is_partial(result: str) -> bool:
+    return result.endswith("partial")
+
+
+def test_run_sharded(monkeypatch):
+    monkeypatch.setattr(pool, "ProcessPoolExecutor", ThreadExecutor)
+    monkeypatch.setattr(pool, "_worker", {})
+    monkeypatch.setattr(pool, "_start_worker", start_fake_worker)
+    monkeypatch.setattr(pool, "ensure_login_state", lambda mode: None)
+    monkeypatch.setattr(pool, "Politeness", lambda: Politeness(min_delay=0))
+    monkeypatch.setattr(pool, "max_block_attempts", 2)
+    calls.clear()
+
+    urls = [
+        "https://a.example/ok",
+        "https://b.example/flaky",
+        "https://c.example/blocked",
+        "https://d.example/broken",
+        "https://a.example/ok2",
+        "https://e.example/partial",
+        "https://f.example/always-partial",
+    ]
+    jobs = [
+        {"url_content": (url, "title", "scrape"), "run_id": f"run-{i}"}
+        for i, url in enumerate(urls)
+    ]
+
+    done = {
+        job["run_id"]: result
+        for job, result, spans in pool.run_sharded(
+            scrape, jobs, workers=2, retry=is_partial
+        )
+    }
+
+    # the flaky job is retried, the blocked one given up on after two tries
+    # and the broken one dropped. Partial results are retried and the last
+    # attempt is kept.
+    assert done == {
+        "run-0": "run-0: https://a.example/ok",
+        "run-1": "run-1: https://b.example/flaky",
+        "run-4": "run-4: https://a.example/ok2",
+        "run-5": "run-5: https://e.example/partial",
+        "run-6": "run-6: partial",
+    }
+    assert calls["https://b.example/flaky"] == 2
+    assert calls["https://c.example/blocked"] == 2
+    assert calls["https://d.example/broken"] == 1
+    assert calls["https://e.example/partial"] == 2
+    assert calls["https://f.example/always-partial"] == 2
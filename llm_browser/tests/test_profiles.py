@@ -0,0 +1,35 @@
+from llm_browser.src.profiles import (
+    FeatureCache,
+    relevance_matrix,
+    select_pairs,
+    tokenize,
+)
+
+ROLES = [
+    {"title": "Data Engineer", "description": "Spark, Airflow and SQL"},
+    {"title": "Frontend Developer", "description": "React, CSS and node.js"},
+    {"title": "Chef", "description": "Cook pastries in a busy kitchen"},
+]
+RESUMES = [
+    "Data engineer building Airflow and Spark pipelines in SQL",
+    "Frontend developer shipping React apps with node.js",
+]
+
+
+def test_tokenize_keeps_technical_terms():
+    assert tokenize("C++, C# and Node.js for the team") == [
+        "c++",
+        "c#",
+        "node.js",
+    ]
+
+
+def test_relevance_matrix_selects_matching_roles():
+    cache = FeatureCache()
+    matrix = relevance_matrix(ROLES, RESUMES, cache=cache)
+
+    assert matrix.shape == (3, 2)
+    assert select_pairs(matrix, min_similarity=0.1, top_k=5) == [[0], [1]]
+
+    relevance_matrix(ROLES, RESUMES[:1], cache=cache)
+    assert cache.hits == 4
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+from llm_browser.src.browser.replay import _to_step, steps_from_history
+
+XPATH = "html/body/div[2]/button"
+
+
+class Action:
+    def __init__(self, **params):
+        self.params = params
+
+    def model_dump(self, exclude_none: bool = False) -> dict:
+        return self.params
+
+
+def history_item(actions: list, results: list, elements: list = None):
+    return SimpleNamespace(
+        model_output=SimpleNamespace(action=actions),
+        result=results,
+        state=SimpleNamespace(interacted_element=elements),
+    )
+
+
+def ok(error: str = None):
+    return SimpleNamespace(error=error)
+
+
+def test_to_step():
+    element = SimpleNamespace(xpath=XPATH)
+
+    assert _to_step("go_to_url", {"url": "https://x"}, None) == {
+        "action": "goto",
+        "url": "https://x",
+    }
+    assert _to_step("click_element", {"index": 3}, element) == {
+        "action": "click",
+        "xpath": XPATH,
+    }
+    assert _to_step("input_text", {"text": "python"}, element)["text"] == (
+        "python"
+    )
+    assert _to_step("scroll_up", {}, None) == {
+        "action": "scroll",
+        "amount": -1000,
+    }
+    assert _to_step("wait", {}, None) == {"action": "wait", "seconds": 3}
+    # clicks without an element cannot be replayed
+    assert _to_step("click_element", {"index": 3}, None) is None
+    assert _to_step("switch_tab", {"page_id": 1}, None) is None
+
+
+def test_steps_from_history_skips_failed_and_passive_actions():
+    element = SimpleNamespace(xpath=XPATH)
+    history = SimpleNamespace(
+        history=[
+            history_item(
+                [Action(go_to_url={"url": "https://x"})], [ok()], [None]
+            ),
+            # no model output, e.g. a step that failed to parse
+            SimpleNamespace(model_output=None),
+            history_item(
+                [
+                    Action(click_element={"index": 1}),
+                    Action(click_element={"index": 2}),
+                    Action(extract_content={"goal": "roles"}),
+                ],
+                [ok("not clickable"), ok(), ok()],
+                [None, element, None],
+            ),
+            history_item([Action(done={"text": "[]"})], [ok()]),
+        ]
+    )
+
+    assert steps_from_history(history) == [
+        {"action": "goto", "url": "https://x"},
+        {"action": "click", "xpath": XPATH},
+    ]
+
+
+def test_steps_from_history_rejects_unsupported_actions():
+    history = SimpleNamespace(
+        history=[history_item([Action(switch_tab={"page_id": 1})], [ok()])]
+    )
+    assert steps_from_history(history) is None
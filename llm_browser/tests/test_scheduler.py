@@ -0,0 +1,116 @@
+import pytest
+
+from llm_browser.src import scheduler
+from llm_browser.src.browser.scrapers import listing_keys
+from llm_browser.src.memory_mongo import MemoryMongoClient
+from llm_browser.src.scheduler import Scheduler
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = MemoryMongoClient()
+    monkeypatch.setenv("_MONGO_DB", "test")
+    monkeypatch.setattr(scheduler, "get_mongodb_client", lambda: client)
+    monkeypatch.setattr(scheduler.time, "time", lambda: NOW)
+    return client
+
+
+def make_scheduler(client, tasks: list[dict], state: list[dict] = ()):
+    client["test"]["tasks"].docs.extend(tasks)
+    client["test"]["schedule"].docs.extend(state)
+    schedule = Scheduler("tasks", interval=60)
+    schedule.refresh()
+    return schedule
+
+
+def test_next_run_uses_the_task_interval(client):
+    schedule = make_scheduler(
+        client,
+        [{"url": "a"}, {"url": "b", "interval": 10}, {"url": "new"}],
+        [
+            {"url": "a", "checked_at": NOW - HOUR},
+            {"url": "b", "checked_at": NOW - HOUR},
+        ],
+    )
+
+    assert schedule.next_run("a") == NOW
+    assert schedule.next_run("b") == NOW - HOUR + 600
+    # a url never checked is due straight away
+    assert schedule.next_run("new") == 3600
+
+
+def test_due_most_overdue_first(client):
+    schedule = make_scheduler(
+        client,
+        [
+            {"url": "later", "interval": 120},
+            {"url": "overdue", "interval": 10},
+            {"url": "now"},
+            {"url": "never"},
+        ],
+        [
+            {"url": "later", "checked_at": NOW - HOUR},
+            {"url": "overdue", "checked_at": NOW - HOUR},
+            {"url": "now", "checked_at": NOW - HOUR},
+        ],
+    )
+
+    assert [t["url"] for t in schedule.due()] == ["never", "overdue", "now"]
+
+
+def test_seconds_until_next(client):
+    schedule = make_scheduler(
+        client,
+        [{"url": "a"}, {"url": "b", "interval": 90}],
+        [
+            {"url": "a", "checked_at": NOW - 20 * 60},
+            {"url": "b", "checked_at": NOW},
+        ],
+    )
+    assert schedule.seconds_until_next() == 40 * 60
+
+    schedule.record("a", "abc", changed=True)
+    assert schedule.seconds_until_next() == HOUR
+
+    client["test"]["tasks"].docs.clear()
+    schedule.refresh()
+    assert schedule.seconds_until_next() == HOUR
+
+
+def test_record_keeps_the_last_processed_fingerprint(client):
+    schedule = make_scheduler(client, [{"url": "a"}])
+
+    schedule.record("a", "first", changed=True)
+    schedule.record("a", "second", changed=False)
+
+    assert schedule.fingerprint("a") == "first"
+    assert schedule.next_run("a") == NOW + HOUR
+    doc = client["test"]["schedule"].find_one({"url": "a"})
+    assert doc["fingerprint"] == "first"
+    assert doc["checked_at"] == NOW
+
+    # the schedule survives a restart
+    assert Scheduler("tasks", interval=60).fingerprint("a") == "first"
+
+
+def test_listing_keys_ignore_tracking_and_navigation():
+    url = "https://example.com/careers"
+    hrefs = [
+        "https://example.com/careers?page=2",
+        "https://example.com/about",
+        "https://example.com/jobs/123?utm_source=feed",
+        "https://example.com/jobs/123#apply",
+        "https://boards.example.org/acme/jobs/456/",
+        "mailto:jobs@example.com",
+        "javascript:void(0)",
+        None,
+    ]
+
+    assert listing_keys(hrefs, url) == [
+        "example.com/jobs/123",
+        "boards.example.org/acme/jobs/456",
+    ]
+    assert listing_keys(hrefs[:2], url) == []
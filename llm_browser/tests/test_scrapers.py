@@ -6,13 +6,16 @@ import requests
 from bson import ObjectId
 from dotenv import load_dotenv
 from playwright.async_api import async_playwright
-from playwright.sync_api import sync_playwright
 
+from llm_browser.src.browser.display import HEADLESS
+from llm_browser.src.browser.engine import SyncBrowser, loop_runner
+from llm_browser.src.browser.fireflies import write_transcript
 from llm_browser.src.browser.scrapers import (
     fetch_google,
     fetch_linkedin,
     fetch_linkedin_async,
     fetch_linkedin_logged_out,
+    iter_job_cards,
 )
 from llm_browser.src.configs.config import ROOT_DIR, browser_args
 from llm_browser.src.database import get_mongodb_client
@@ -20,15 +23,14 @@ from llm_browser.src.database import get_mongodb_client
 load_dotenv()
 
 
-@pytest.mark.skip(reason="requires xvfb to work in headless")
 def test_headless(
     url: str = "https://arh.antoinevastel.com/bots/areyouheadless",
 ):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True, args=browser_args)
-        page = browser.new_page()
-        page.goto(url=url, wait_until="networkidle")
-        answer = page.locator("#res").text_content()
+    with SyncBrowser(url, mode=HEADLESS) as browser:
+        context = browser.new_context()
+        page = loop_runner.run(context.new_page())
+        loop_runner.run(page.goto(url=url, wait_until="networkidle"))
+        answer = loop_runner.run(page.locator("#res").text_content())
         assert answer == "You are not Chrome headless"
 
 
@@ -153,8 +155,7 @@ def test_fetch_linkedin(loggedin=[True], limit=2):
         docs = collection.find({"_id": {"$in": ids}})
         urls = [doc["url"] for doc in docs]
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, args=browser_args)
+    with SyncBrowser() as browser:
         context = browser.new_context()
 
         for url in urls:
@@ -173,3 +174,51 @@ def test_fetch_linkedin(loggedin=[True], limit=2):
 
             assert all([k in result_keys for k in keys_])
             assert len(item["description"]) > len("About us") * 5
+
+
+def test_write_transcript(tmp_path):
+    paragraph = (
+        '<div class="paragraph-root"><span class="name">Ann</span>'
+        '<span class="sc-871c1b8d-0">01:02</span>'
+        '<div class="transcript-sentence">Hello <b>there</b></div></div>'
+    )
+    html = f"<html><body><div>{paragraph * 3}</div></body></html>"
+    fp = tmp_path / "meeting.txt"
+
+    assert write_transcript(html, fp) == 3
+    assert fp.read_text() == "Ann - 01:02\nHello there\n\n" * 3
+
+
+def test_iter_job_cards_keeps_partial_results():
+    card = (
+        '<li><a class="job-card-container__link"><strong>{}</strong></a>'
+        '<div class="artdeco-entity-lockup__subtitle"><span>Acme</span></div>'
+        '<ul class="artdeco-entity-lockup__caption"><li><span>Nairobi</span>'
+        "</li></ul></li>"
+    )
+    html = (
+        '<div class="scaffold-layout__list"><div><ul>'
+        + "".join(card.format(f"Data Engineer {i}") for i in range(3))
+        + "</ul></div></div><button>View next page</button>"
+        '<div class="jobs-box__html-content" id="job-details">'
+        + "Build pipelines with Spark and Airflow. " * 5
+        + "</div>"
+    )
+
+    with SyncBrowser(mode=HEADLESS) as browser:
+        context = browser.new_context()
+        page = loop_runner.run(context.new_page())
+        loop_runner.run(page.set_content(html))
+
+        roles = []
+        with pytest.raises(Exception):
+            for role in iter_job_cards(page, url="https://test", snapshot=0):
+                roles.append(role)
+                if len(roles) == 2:
+                    loop_runner.run(page.close())
+
+    assert [r["title"] for r in roles] == [
+        "Data Engineer 0",
+        "Data Engineer 1",
+    ]
+    assert roles[0]["company"] == "Acme"
@@ -0,0 +1,60 @@
+import asyncio
+
+from llm_browser.src.browser import display, server
+from llm_browser.src.browser.display import (
+    HEADLESS,
+    close_browser,
+    launch_browser,
+)
+from llm_browser.src.browser.server import BrowserSupervisor
+
+
+class FakeBrowser:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self):
+        self.browser = FakeBrowser()
+
+    async def connect_over_cdp(self, endpoint):
+        return self.browser
+
+
+class FakePlaywright:
+    chromium = FakeChromium()
+
+
+def test_supervisor_command(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "chromium_executable", lambda: "chrome")
+    supervisor = BrowserSupervisor(
+        port=9333, mode=HEADLESS, profile_dir=tmp_path
+    )
+    command, _ = supervisor.command()
+
+    assert command[0] == "chrome"
+    assert "--remote-debugging-port=9333" in command
+    assert f"--user-data-dir={tmp_path}" in command
+    assert "--headless=new" in command
+    assert supervisor.endpoint == "http://127.0.0.1:9333"
+    assert not supervisor.healthy()
+
+
+def test_launch_browser_attaches_over_cdp(monkeypatch):
+    monkeypatch.setattr(display, "browser_cdp_mode", HEADLESS)
+    p = FakePlaywright()
+
+    async def run():
+        browser = await launch_browser(
+            p, mode=HEADLESS, cdp_url="http://127.0.0.1:9222"
+        )
+        assert display.browser_mode_of(browser) == HEADLESS
+        await close_browser(browser)
+        return browser
+
+    browser = asyncio.run(run())
+    assert browser is p.chromium.browser and browser.closed
+    assert display.resource_report()["cdp"]["sessions"] >= 1
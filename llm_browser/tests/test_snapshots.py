@@ -0,0 +1,40 @@
+import json
+
+from llm_browser.src.browser.snapshots import (
+    INDEX,
+    extract_url,
+    save_snapshot,
+)
+
+URL = "https://www.linkedin.com/jobs/search/?keywords=data%20engineer"
+
+LISTING = """<html><body><div class="scaffold-layout__list"><div><ul>
+<li><a class="job-card-container__link"><strong>Data Engineer</strong></a>
+<div class="artdeco-entity-lockup__subtitle"><span>Acme</span></div>
+<ul class="artdeco-entity-lockup__caption"><li><span>Remote</span></li></ul>
+</li>
+<li><a class="job-card-container__link"><strong>ML Engineer</strong></a></li>
+</ul></div></div></body></html>"""
+
+DETAIL = """<html><body><div class="jobs-box__html-content" id="job-details">
+Build <b>pipelines</b></div></body></html>"""
+
+
+def test_reextract_from_snapshots(tmp_path):
+    save_snapshot(LISTING, URL, kind="listing", run_id="run", root=tmp_path)
+    save_snapshot(
+        DETAIL, URL, kind="detail", index=0, run_id="run", root=tmp_path
+    )
+
+    with open(tmp_path / "run" / INDEX) as f:
+        entries = [json.loads(line) for line in f]
+
+    roles = extract_url(URL, str(tmp_path / "run"), entries)
+    assert roles == [
+        {
+            "title": "Data Engineer",
+            "company": "Acme",
+            "location": "Remote",
+            "description": "Build pipelines",
+        }
+    ]
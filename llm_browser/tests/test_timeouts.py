@@ -0,0 +1,121 @@
+import pytest
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from llm_browser.src.browser import timeouts
+from llm_browser.src.browser.timeouts import (
+    BUCKETS,
+    Histogram,
+    TimeoutController,
+)
+
+URL = "https://www.linkedin.com/jobs/search"
+
+
+def test_histogram_quantile():
+    histogram = Histogram()
+    for ms in [100] * 98 + [2000, 2000]:
+        histogram.add(ms)
+
+    assert histogram.total == 100
+    assert 100 <= histogram.quantile(50) < 130
+    assert 2000 <= histogram.quantile(99) < 2500
+    assert histogram.add(10**9) == len(BUCKETS) - 1
+
+
+def test_timeout_adapts_after_min_samples():
+    controller = TimeoutController(
+        min_samples=10, margin=2, min_ms=500, max_ms=20000, persist=False
+    )
+    for _ in range(9):
+        controller.record(URL, "details", 1000)
+    assert controller.timeout(URL, "details", 30000) == 30000
+
+    controller.record(URL, "details", 1000)
+    timeout = controller.timeout(URL, "details", 30000)
+    assert 2000 <= timeout < 2500
+    # other domains and actions keep their defaults
+    assert controller.timeout("https://google.com", "details", 30000) == 30000
+    assert controller.timeout(URL, "listing", 30000) == 30000
+
+    for _ in range(100):
+        controller.record(URL, "details", 10**6)
+    assert controller.timeout(URL, "details", 30000) == 20000
+
+
+def test_measure_counts_timeouts_at_their_timeout():
+    controller = TimeoutController(persist=False)
+    with controller.measure(URL, "apply", 10000) as timeout:
+        assert timeout == 10000
+
+    with pytest.raises(PlaywrightTimeoutError):
+        with controller.measure(URL, "apply", 10000):
+            raise PlaywrightTimeoutError("timed out")
+
+    histogram = controller.histograms[controller.key(URL, "apply")]
+    assert histogram.total == 2 and histogram.timeouts == 1
+    assert histogram.quantile(100) >= 10000
+
+
+def test_timeout_grows_back_when_waits_time_out():
+    controller = TimeoutController(
+        min_samples=20, margin=1.5, min_ms=1000, max_ms=60000, persist=False
+    )
+    for _ in range(20):
+        controller.record(URL, "listing", 100)
+    assert controller.timeout(URL, "listing", 30000) == 1000
+
+    for _ in range(1000):
+        with pytest.raises(PlaywrightTimeoutError):
+            with controller.measure(URL, "listing"):
+                raise PlaywrightTimeoutError("timed out")
+    assert controller.timeout(URL, "listing", 30000) == 60000
+
+    # a few timeouts among many fast waits leave the timeout low
+    controller = TimeoutController(min_samples=20, min_ms=100, persist=False)
+    for _ in range(1000):
+        controller.record(URL, "listing", 100)
+    controller.record(URL, "listing", 1000, timed_out=True)
+    assert controller.timeout(URL, "listing", 30000) < 1000
+
+
+class FakeClient(dict):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeCollection(list):
+    def find(self):
+        return iter(self)
+
+
+def test_load_merges_saved_histograms(monkeypatch):
+    key = TimeoutController.key(URL, "details")
+    coll = FakeCollection([{"_id": key, "counts": {"3": 5}, "timeouts": 2}])
+    client = FakeClient({None: {"latency": coll}})
+    monkeypatch.delenv("_MONGO_DB", raising=False)
+    monkeypatch.setattr(timeouts, "get_mongodb_client", lambda: client)
+
+    controller = TimeoutController()
+    controller.load()
+    controller.record(URL, "details", BUCKETS[3])
+
+    histogram = controller.histograms[key]
+    assert histogram.counts[3] == 6 and histogram.timeouts == 2
+    # only the counts recorded by this process are saved
+    assert controller._pending[key].total == 1
+
+
+def test_missing_database_falls_back_to_defaults(monkeypatch):
+    def unconfigured():
+        raise TypeError("quote_from_bytes() expected bytes")
+
+    monkeypatch.setattr(timeouts, "get_mongodb_client", unconfigured)
+    controller = TimeoutController(min_samples=1)
+    controller.load()
+    with controller.measure(URL, "listing", 15000) as timeout:
+        assert timeout == 15000
+    controller.save()
+    assert controller.histograms[controller.key(URL, "listing")].total == 1
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from llm_browser.src.tracing import Tracer, percentile
+
+
+def test_spans_are_grouped_by_run():
+    tracer = Tracer()
+
+    with tracer.span("navigate", url="https://example.com"):
+        pass
+
+    with tracer.run("run-1"):
+        for tokens in [100, 200]:
+            with tracer.span("llm.score", model="fake"):
+                tracer.set_attributes(input_tokens=tokens)
+        with pytest.raises(ValueError):
+            with tracer.span("mongo.write", collection="results"):
+                raise ValueError("boom")
+
+    summary = tracer.summary("run-1")
+    assert summary["spans"] == 3
+    assert summary["operations"]["llm.score"]["count"] == 2
+    assert summary["operations"]["mongo.write"]["errors"] == 1
+    assert summary["totals"]["input_tokens"] == 300
+    assert tracer.summary(None)["spans"] == 0
+
+
+def test_exports():
+    tracer = Tracer()
+    with tracer.run("run-2"):
+        with tracer.span("discord.post", chunks=2):
+            pass
+
+    prometheus = tracer.to_prometheus("run-2")
+    assert 'span="discord.post"' in prometheus
+    assert "llm_browser_span_duration_seconds_count" in prometheus
+
+    exported = json.loads(tracer.to_json("run-2"))
+    assert exported["spans"][0]["attributes"]["chunks"] == 2
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 95) == pytest.approx(4.8)
@@ -0,0 +1,44 @@
+import pytest
+
+from llm_browser.src.utils import extract_json, string_to_dict
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (
+            '```json\n[{"job_title": "Data Engineer"}]\n```',
+            [{"job_title": "Data Engineer"}],
+        ),
+        (
+            'Roles found: {"a": [1, 2,],} Hope this helps {"b": 1}',
+            {"a": [1, 2]},
+        ),
+        ('{"a": "first line\nsecond line"}', {"a": "first line\nsecond line"}),
+        ('{\\"a\\": 1,\\n \\"b\\": \\"x\\"}', {"a": 1, "b": "x"}),
+        # brackets in the prose before the JSON are skipped
+        ('Result (score in [0,1]):\n{"score": 0.5}', {"score": 0.5}),
+        ('Here [is] the data: [{"a": 1}]', [{"a": 1}]),
+        ('Scores in [0, 1]:\n```json\n{"score": 1}\n```', {"score": 1}),
+        ("Scores: [0, 1]", [0, 1]),
+    ],
+)
+def test_extract_json(text, expected):
+    assert extract_json(text) == expected
+
+
+def test_extract_truncated_json():
+    text = '[{"job_title": "A", "location": "Remote"}, {"job_title": "B", "lo'
+    assert extract_json(text) == [
+        {"job_title": "A", "location": "Remote"},
+        {"job_title": "B"},
+    ]
+
+    text = '[{"job_title": "A"}, {"job_title": "B", "location": "Nair'
+    assert extract_json(text)[1]["location"] == "Nair"
+
+
+def test_string_to_dict():
+    assert string_to_dict(["no json", '```json\n{"x": 1}\n```']) == {"x": 1}
+    with pytest.raises(ValueError):
+        string_to_dict(["no json", "[unclosed"])
@@ -0,0 +1,135 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from llm_browser.src import work_queue
+from llm_browser.src.memory_mongo import MemoryMongoClient
+from llm_browser.src.tasks import TaskStatus
+from llm_browser.src.work_queue import Heartbeat, LeaseLost, WorkQueue
+
+TASKS = [("https://example.com/jobs", "Jobs", "scrape")]
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    client = MemoryMongoClient()
+    monkeypatch.setenv("_MONGO_DB", "test")
+    monkeypatch.setattr(work_queue, "get_mongodb_client", lambda: client)
+    monkeypatch.setattr(work_queue, "_now", clock)
+    return clock
+
+
+def make_queue(tasks=TASKS, **kwargs) -> WorkQueue:
+    queue = WorkQueue(**kwargs)
+    queue.enqueue(tasks, batch_id="batch")
+    return queue
+
+
+def test_enqueue_skips_leased_tasks(clock):
+    queue = make_queue()
+    task = queue.claim("a")
+
+    assert queue.enqueue(TASKS, batch_id="next") == 0
+    assert queue.coll.find_one()["status"] == TaskStatus.LEASED.value
+    assert queue.complete(task)
+    assert queue.enqueue(TASKS, batch_id="next") == 1
+    assert queue.claim("a")["batch_id"] == "next"
+
+
+def test_claim_has_one_winner(clock):
+    queue = make_queue()
+    barrier = threading.Barrier(2)
+    claimed = {}
+
+    def claim(worker_id: str) -> None:
+        barrier.wait()
+        claimed[worker_id] = queue.claim(worker_id)
+
+    threads = [threading.Thread(target=claim, args=(w,)) for w in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [w for w, task in claimed.items() if task is not None]
+    assert len(winners) == 1
+    assert claimed[winners[0]]["worker_id"] == winners[0]
+    assert claimed[winners[0]]["attempts"] == 1
+
+
+def test_expired_lease_is_reclaimed(clock):
+    queue = make_queue(visibility_timeout=60)
+    first = queue.claim("a")
+    assert queue.claim("b") is None
+
+    clock.advance(61)
+    second = queue.claim("b")
+    assert second["worker_id"] == "b" and second["attempts"] == 2
+
+    # the first worker can no longer renew or complete the task
+    assert not queue.heartbeat(first)
+    assert not queue.complete(first)
+    assert queue.complete(second)
+    assert queue.coll.find_one()["status"] == TaskStatus.DONE.value
+
+
+def test_failed_task_is_dead_lettered(clock):
+    queue = make_queue(max_attempts=2)
+    queue.fail(queue.claim("a"), error="boom")
+    assert queue.unfinished() == 1
+
+    queue.fail(queue.claim("a"), error="boom again")
+    doc = queue.coll.find_one()
+    assert doc["status"] == TaskStatus.FAILED.value
+    assert doc["error"] == "boom again"
+    assert queue.claim("a") is None
+    assert queue.unfinished() == 0
+
+
+def test_expired_lease_without_attempts_is_dead_lettered(clock):
+    queue = make_queue(max_attempts=1, visibility_timeout=60)
+    queue.claim("a")
+    clock.advance(61)
+
+    assert queue.claim("b") is None
+    assert queue.coll.find_one()["status"] == TaskStatus.FAILED.value
+
+
+def test_fail_delays_the_retry(clock):
+    queue = make_queue()
+    queue.fail(queue.claim("a"), error="blocked", delay=300)
+
+    assert queue.claim("a") is None
+    # the delayed task keeps workers that exit when empty waiting
+    assert queue.unfinished() == 1
+
+    clock.advance(301)
+    assert queue.claim("a")["attempts"] == 2
+
+
+def test_heartbeat_exposes_lost_lease(clock):
+    queue = make_queue(visibility_timeout=60)
+    task = queue.claim("a")
+    heartbeat = Heartbeat(queue, task)
+    heartbeat.check()
+
+    clock.advance(61)
+    queue.claim("b")
+    heartbeat.interval = 0.01
+    with heartbeat:
+        assert heartbeat.lost.wait(1)
+    with pytest.raises(LeaseLost):
+        heartbeat.check()